@@ -0,0 +1,173 @@
+"""Academic years, and archival of closed years out of the live tables.
+
+A year runs from the 1st of ACADEMIC_YEAR_START_MONTH and is named by the
+calendar year it starts in (2025 is the 2025-26 session). Archiving a
+closed year moves its settled Results, TeacherAttendance and payments into
+the Archived* tables, keeping their ids, and packs its StudentAttendance
+into StudentAttendanceMonth rows; still-pending results and pending or
+partial payments stay live. Hot pages then only ever scan open years, while balances, counters,
+exam summaries, payment histories and ledger exports union the archive in.
+"""
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .attendance_archive import pack_month
+from .counters import forget_recent_payments
+from .models import (
+    AcademicYear, ArchivedResult, ArchivedStudentPayment, ArchivedTeacherAttendance, ArchivedTeacherPayment,
+    Result, StudentPayment, TeacherAttendance, TeacherPayment
+)
+from .page_cache import invalidate_public_pages
+from .results import RESULT_PICKERS_CACHE_KEY
+
+
+ARCHIVE_BATCH_SIZE = 1000
+UNSETTLED_PAYMENT_STATUSES = ['Pending', 'Partial']
+
+# live model -> its archive table, the date that places a row in a year and the rows that never leave
+ARCHIVE_TABLES = {
+    Result: {
+        'archive': ArchivedResult,
+        'date_field': 'exam_date',
+        'keep_live': Q(verification_status='Pending'),
+    },
+    TeacherAttendance: {
+        'archive': ArchivedTeacherAttendance,
+        'date_field': 'date',
+        'keep_live': Q(),
+    },
+    StudentPayment: {
+        'archive': ArchivedStudentPayment,
+        'date_field': 'payment_date',
+        'keep_live': Q(status__in=UNSETTLED_PAYMENT_STATUSES),
+    },
+    TeacherPayment: {
+        'archive': ArchivedTeacherPayment,
+        'date_field': 'payment_date',
+        'keep_live': Q(status__in=UNSETTLED_PAYMENT_STATUSES),
+    },
+}
+
+PAYMENT_HISTORY_FIELDS = ['id', 'month', 'year', 'paid_amount', 'due_amount', 'payment_mode', 'payment_date', 'status']
+
+
+class ArchiveError(ValueError):
+    """Raised when asked to archive a year that is not closed yet"""
+
+
+def academic_year(day=None):
+    """Start year of the academic year containing `day` (today by default)"""
+    day = day or timezone.localdate()
+    start_month = getattr(settings, 'ACADEMIC_YEAR_START_MONTH', 4)
+    return day.year if day.month >= start_month else day.year - 1
+
+
+def academic_year_range(start_year):
+    """(first day, last day) of the academic year starting in start_year"""
+    start_month = getattr(settings, 'ACADEMIC_YEAR_START_MONTH', 4)
+    return date(start_year, start_month, 1), date(start_year + 1, start_month, 1) - timedelta(days=1)
+
+
+def _year_months(start_year):
+    first, _ = academic_year_range(start_year)
+    for offset in range(12):
+        month = first.month - 1 + offset
+        yield first.year + month // 12, month % 12 + 1
+
+
+# ===================== ARCHIVAL =====================
+
+@dataclass
+class ArchiveReport:
+    start_year: int
+    moved: dict = field(default_factory=dict)     # {table: rows moved}
+
+    def summary(self):
+        label = AcademicYear(start_year=self.start_year).label
+        moved = ', '.join(f'{count} {table}' for table, count in self.moved.items())
+        return f'{label} archived: {moved or "nothing to move"}'
+
+
+def _move_rows(rows, archive, start_year, batch_size):
+    """Copy rows into the archive table with their ids, then delete them, batch_size at a time.
+
+    Each batch is deleted with one plain SQL DELETE: an archived row has
+    moved, not changed, so the signals that adjust counters, balances and
+    summaries must not fire for it.
+    """
+    fields = [f.attname for f in archive._meta.concrete_fields if f.name != 'academic_year']
+    table = connection.ops.quote_name(rows.model._meta.db_table)
+    pk_column = connection.ops.quote_name(rows.model._meta.pk.column)
+    moved = 0
+    while True:
+        batch = list(rows.order_by('pk').values(*fields)[:batch_size])
+        if not batch:
+            return moved
+        archive.objects.bulk_create([archive(**row, academic_year=start_year) for row in batch])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE {pk_column} IN ({", ".join(["%s"] * len(batch))})',
+                [row['id'] for row in batch],
+            )
+        moved += len(batch)
+
+
+def archive_academic_year(start_year, batch_size=ARCHIVE_BATCH_SIZE):
+    """Move a closed academic year out of the live tables in one transaction; returns an ArchiveReport.
+
+    Running it again for the same year moves anything added since, such
+    as back-dated entries.
+    """
+    if start_year >= academic_year():
+        raise ArchiveError(f'{AcademicYear(start_year=start_year).label} is not closed yet')
+    first, last = academic_year_range(start_year)
+    report = ArchiveReport(start_year=start_year)
+
+    with transaction.atomic():
+        for model, spec in ARCHIVE_TABLES.items():
+            rows = model.objects.filter(**{f"{spec['date_field']}__range": (first, last)})
+            rows = rows.exclude(spec['keep_live'])
+            table = str(model._meta.verbose_name_plural)
+            report.moved[table] = _move_rows(rows, spec['archive'], start_year, batch_size)
+        report.moved['student attendance records'] = sum(
+            pack_month(year, month)[0] for year, month in _year_months(start_year)
+        )
+
+        year, _ = AcademicYear.objects.select_for_update().get_or_create(start_year=start_year)
+        for table, count in report.moved.items():
+            year.archived_rows[table] = year.archived_rows.get(table, 0) + count
+        year.archived_at = timezone.now()
+        year.save()
+
+        # SQL deletes send no signals; drop what was cached from the moved rows
+        cache.delete(RESULT_PICKERS_CACHE_KEY)
+        forget_recent_payments()
+        invalidate_public_pages()
+    return report
+
+
+# ===================== HISTORICAL READS =====================
+
+def with_archive(model, fields, *filters, **lookups):
+    """values() of matching rows from the live table and its archive together, as one UNION ALL.
+
+    Order the result by names in `fields`, e.g. .order_by('-payment_date', '-id').
+    """
+    archive = ARCHIVE_TABLES[model]['archive']
+    live = model.objects.filter(*filters, **lookups).order_by().values(*fields)
+    return live.union(archive.objects.filter(*filters, **lookups).order_by().values(*fields), all=True)
+
+
+def total_with_archive(model, field_name, *filters, **lookups):
+    """Sum of one column over matching live and archived rows"""
+    total = Decimal('0')
+    for table in (model, ARCHIVE_TABLES[model]['archive']):
+        total += table.objects.filter(*filters, **lookups).aggregate(total=Sum(field_name))['total'] or 0
+    return total
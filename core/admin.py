@@ -2,7 +2,7 @@ from django.contrib import admin
 from .models import (
     SchoolClass, Subject, Admin, Teacher, Student,
     TeacherPayment, StudentPayment, TeacherAttendance, StudentAttendance,
-    Notice, Event, Exam
+    Notice, Event, Exam, Holiday, AbsenceAlert, PromotionBatch, AcademicYear
 )
 
 
@@ -86,3 +86,27 @@ class ExamAdmin(admin.ModelAdmin):
     list_display = ['exam_name', 'school_class', 'subject', 'exam_date', 'exam_time', 'room_no']
     list_filter = ['school_class', 'exam_date']
     search_fields = ['exam_name']
+
+
+@admin.register(Holiday)
+class HolidayAdmin(admin.ModelAdmin):
+    list_display = ['date', 'name']
+    search_fields = ['name']
+
+
+@admin.register(AbsenceAlert)
+class AbsenceAlertAdmin(admin.ModelAdmin):
+    list_display = ['student', 'days', 'started_on', 'last_absent_on', 'resolved_on']
+    list_filter = ['resolved_on']
+    search_fields = ['student__name']
+
+
+@admin.register(PromotionBatch)
+class PromotionBatchAdmin(admin.ModelAdmin):
+    list_display = ['label', 'status', 'promoted', 'graduated', 'held_back', 'applied_at', 'rolled_back_at']
+    list_filter = ['status']
+
+
+@admin.register(AcademicYear)
+class AcademicYearAdmin(admin.ModelAdmin):
+    list_display = ['start_year', 'archived_at', 'archived_rows']
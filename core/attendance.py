@@ -0,0 +1,530 @@
+"""Attendance write service shared by the student and teacher registers"""
+import calendar
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, ExpressionWrapper, F, FilteredRelation, FloatField, Q, Sum
+from django.db.models.functions import Coalesce, ExtractDay, NullIf
+
+from .academic_years import academic_year, academic_year_range
+from .attendance_archive import month_range, save_packed_days, status_on, unpack
+from .models import (
+    AbsenceAlert, AbsenceStreak, Holiday, SchoolClass, Student, StudentAttendance, StudentAttendanceMonth,
+    StudentAttendanceSummary, TeacherAttendance
+)
+
+
+ATTENDANCE_STATUSES = [status for status, _ in StudentAttendance.STATUS_CHOICES]
+
+
+class RegisterError(ValueError):
+    """Raised when a POSTed register contains invalid entries"""
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('; '.join(errors))
+
+
+def read_register(data, person_ids, prefix='status_'):
+    """Collect {person_id: status} from POSTed `status_<id>` fields.
+
+    Blank entries are treated as "not marked" and skipped. Any unknown status
+    invalidates the whole register so nothing is half-written.
+    """
+    register = {}
+    errors = []
+    for person_id in person_ids:
+        status = data.get(f'{prefix}{person_id}')
+        if not status:
+            continue
+        if status not in ATTENDANCE_STATUSES:
+            errors.append(f'Invalid status "{status}" for #{person_id}')
+            continue
+        register[person_id] = status
+    if errors:
+        raise RegisterError(errors)
+    return register
+
+
+def _upsert_register(model, person_field, attendance_date, register):
+    """Insert-or-update a whole register in one statement"""
+    rows = [
+        model(**{f'{person_field}_id': person_id, 'date': attendance_date, 'status': status})
+        for person_id, status in register.items()
+    ]
+    if rows:
+        model.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=[person_field, 'date'],
+            update_fields=['status'],
+        )
+    return len(rows)
+
+
+def save_student_register(attendance_date, register):
+    """Write {student_id: status} for a date, keyed on (student, date)"""
+    if not register:
+        return 0
+    with transaction.atomic():
+        remaining = register
+        if may_be_packed(attendance_date.year, attendance_date.month):
+            remaining = save_packed_days(attendance_date, register)
+        _upsert_register(StudentAttendance, 'student', attendance_date, remaining)
+        refresh_attendance_summaries(attendance_date.year, attendance_date.month, list(register))
+        if attendance_date < date.today():
+            rewind_absence_streaks(attendance_date, list(register))
+    invalidate_daily_board(attendance_date)
+    return len(register)
+
+
+def save_teacher_register(attendance_date, register):
+    """Write {teacher_id: status} for a date, keyed on (teacher, date)"""
+    if not register:
+        return 0
+    with transaction.atomic():
+        return _upsert_register(TeacherAttendance, 'teacher', attendance_date, register)
+
+
+# ===================== READERS =====================
+
+def may_be_packed(year, month):
+    """Only months before the current one are ever packed (see pack_attendance)"""
+    today = date.today()
+    return (year, month) < (today.year, today.month)
+
+
+def iter_student_statuses(first, last, students=None):
+    """Yield (student_id, date, status) for every marked day in [first, last].
+
+    Reads StudentAttendance and, for months that may be packed, the
+    StudentAttendanceMonth rows, so callers see one history wherever it
+    is stored. `students` optionally narrows it to a Student queryset or
+    a list of student ids.
+    """
+    rows = StudentAttendance.objects.filter(date__range=(first, last))
+    if students is not None:
+        rows = rows.filter(student__in=students)
+    yield from rows.order_by().values_list('student_id', 'date', 'status').iterator()
+
+    months = [
+        (year, month)
+        for year in range(first.year, last.year + 1)
+        for month in range(1, 13)
+        if (first.year, first.month) <= (year, month) <= (last.year, last.month) and may_be_packed(year, month)
+    ]
+    if not months:
+        return
+    period = Q()
+    for year, month in months:
+        period |= Q(year=year, month=month)
+    packed = StudentAttendanceMonth.objects.filter(period)
+    if students is not None:
+        packed = packed.filter(student__in=students)
+    for student_id, year, month, marked, statuses in packed.values_list(
+        'student_id', 'year', 'month', 'marked', 'statuses'
+    ).iterator():
+        for day, status in unpack(marked, statuses).items():
+            when = date(year, month, day)
+            if first <= when <= last:
+                yield student_id, when, status
+
+
+# ===================== DAILY BOARD =====================
+
+BOARD_TIMEOUT = 60 * 60 * 24
+STATUS_KEYS = {'Present': 'present', 'Absent': 'absent', 'Leave': 'leave', 'Half Day': 'half_day'}
+
+
+def _board_key(day):
+    return f'attendance-board:{day.isoformat()}'
+
+
+def invalidate_daily_board(day):
+    cache.delete(_board_key(day))
+
+
+def daily_board(day):
+    """Every class's attendance counts for a date, cached until attendance for that date changes.
+
+    One GROUP BY over classes joined to their active students and to
+    those students' attendance rows for the date only (a filtered join,
+    so no other day's rows are scanned). Days of months that may be
+    packed also count their StudentAttendanceMonth rows. Classes with
+    students but no rows are reported as not yet marked.
+    """
+    board = cache.get(_board_key(day))
+    if board is not None:
+        return board
+
+    marked = Q(student__is_active=True, day_attendance__isnull=False)
+    counts = {
+        key: Count('day_attendance', filter=Q(student__is_active=True, day_attendance__status=status))
+        for status, key in STATUS_KEYS.items()
+    }
+    classes = SchoolClass.objects.annotate(
+        day_attendance=FilteredRelation('student__attendance', condition=Q(student__attendance__date=day)),
+    ).annotate(
+        students=Count('student', filter=Q(student__is_active=True)),
+        marked=Count('day_attendance', filter=marked),
+        **counts,
+    ).order_by('class_name', 'section').values('id', 'class_name', 'section', 'students', 'marked', *counts)
+
+    classes = {row['id']: row for row in classes}
+    if may_be_packed(day.year, day.month):
+        packed = StudentAttendanceMonth.objects.filter(
+            year=day.year, month=day.month, student__is_active=True, student__student_class__isnull=False
+        ).values_list('student__student_class_id', 'marked', 'statuses')
+        for class_id, marked, bits in packed:
+            status = status_on(marked, bits, day.day)
+            if status:
+                classes[class_id]['marked'] += 1
+                classes[class_id][STATUS_KEYS[status]] += 1
+
+    rows = []
+    totals = dict.fromkeys(['students', 'marked', *counts], 0)
+    for row in classes.values():
+        row['unmarked'] = row['students'] - row['marked']
+        row['not_started'] = row['students'] > 0 and row['marked'] == 0
+        rows.append(row)
+        for key in totals:
+            totals[key] += row[key]
+    board = {
+        'classes': rows,
+        'totals': totals,
+        'pending_classes': [row for row in rows if row['not_started']],
+    }
+    cache.set(_board_key(day), board, BOARD_TIMEOUT)
+    return board
+
+
+# ===================== MONTHLY REGISTER =====================
+
+STATUS_CODES = {'Present': 'P', 'Absent': 'A', 'Leave': 'L', 'Half Day': 'H'}
+
+
+def month_statuses(class_id, year, month):
+    """{student_id: {day: status}} for one class and month.
+
+    One query for the row table, plus one for packed rows when the month
+    may have been packed.
+    """
+    first, last = month_range(year, month)
+    statuses = {}
+    rows = StudentAttendance.objects.filter(
+        student__student_class_id=class_id, date__range=(first, last)
+    ).order_by().values_list('student_id', ExtractDay('date'), 'status')
+    for student_id, day, status in rows:
+        statuses.setdefault(student_id, {})[day] = status
+    if may_be_packed(year, month):
+        packed = StudentAttendanceMonth.objects.filter(
+            student__student_class_id=class_id, year=year, month=month
+        ).values_list('student_id', 'marked', 'statuses')
+        for student_id, marked, bits in packed:
+            statuses.setdefault(student_id, {}).update(unpack(marked, bits))
+    return statuses
+
+
+@dataclass
+class RegisterMatrix:
+    year: int
+    month: int
+    days: list          # [(day number, weekday abbreviation, is_sunday)]
+    rows: list          # [{'student': ..., 'cells': [code], 'totals': {code: n}, 'present_days': x}]
+    day_totals: list    # [{code: n}] per day
+
+    @property
+    def title(self):
+        return f'{calendar.month_name[self.month]} {self.year}'
+
+    @property
+    def footer(self):
+        """[(status, [count per day])] for the per-day totals rows"""
+        return [
+            (status, [totals[code] or '' for totals in self.day_totals])
+            for status, code in STATUS_CODES.items()
+        ]
+
+    def csv_rows(self):
+        yield ['Student'] + [str(day) for day, _, _ in self.days] + list(STATUS_CODES.values()) + ['Present Days']
+        for row in self.rows:
+            yield (
+                [row['student'].name] + row['cells']
+                + [row['totals'][code] for code in STATUS_CODES.values()] + [row['present_days']]
+            )
+        for code in STATUS_CODES.values():
+            yield [f'Total {code}'] + [totals[code] for totals in self.day_totals]
+
+
+def monthly_register(class_id, year, month):
+    """Students x days matrix for a class, pivoted in memory from month_statuses()"""
+    days_in_month = calendar.monthrange(year, month)[1]
+    days = [
+        (day, calendar.day_abbr[calendar.weekday(year, month, day)][:2], calendar.weekday(year, month, day) == 6)
+        for day in range(1, days_in_month + 1)
+    ]
+    statuses = month_statuses(class_id, year, month)
+    students = Student.objects.filter(student_class_id=class_id, is_active=True).order_by('name', 'id')
+
+    codes = STATUS_CODES.values()
+    day_totals = [dict.fromkeys(codes, 0) for _ in days]
+    rows = []
+    for student in students:
+        marks = statuses.get(student.id, {})
+        cells = [''] * days_in_month
+        totals = dict.fromkeys(codes, 0)
+        for day, status in marks.items():
+            code = STATUS_CODES[status]
+            cells[day - 1] = code
+            totals[code] += 1
+            day_totals[day - 1][code] += 1
+        rows.append({
+            'student': student,
+            'cells': cells,
+            'totals': totals,
+            'present_days': totals['P'] + totals['H'] * 0.5,
+        })
+    return RegisterMatrix(year=year, month=month, days=days, rows=rows, day_totals=day_totals)
+
+
+# ===================== TERM ATTENDANCE =====================
+
+def refresh_attendance_summaries(year, month, student_ids=None):
+    """Recount StudentAttendanceSummary rows for one month from both attendance stores.
+
+    Marking a register recounts just the students on it, so the work is
+    bounded by a month of their rows however long the history gets.
+    Students left with no marked days lose their row. Returns the rows written.
+    """
+    first, last = month_range(year, month)
+    counts = {}
+    for student_id, _, status in iter_student_statuses(first, last, student_ids):
+        counts.setdefault(student_id, dict.fromkeys(STATUS_KEYS.values(), 0))[STATUS_KEYS[status]] += 1
+
+    stale = StudentAttendanceSummary.objects.filter(year=year, month=month).exclude(student_id__in=list(counts))
+    if student_ids is None:
+        stale.delete()
+    elif set(student_ids) - set(counts):
+        stale.filter(student_id__in=student_ids).delete()
+    if counts:
+        StudentAttendanceSummary.objects.bulk_create(
+            [
+                StudentAttendanceSummary(student_id=student_id, year=year, month=month, **student_counts)
+                for student_id, student_counts in counts.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['student', 'year', 'month'],
+            update_fields=[*STATUS_KEYS.values(), 'updated_at'],
+        )
+    return len(counts)
+
+
+def rebuild_attendance_summaries():
+    """Recount every month that has attendance or a summary; returns the rows written"""
+    months = {(day.year, day.month) for day in StudentAttendance.objects.dates('date', 'month')}
+    months.update(StudentAttendanceMonth.objects.values_list('year', 'month').distinct())
+    months.update(StudentAttendanceSummary.objects.values_list('year', 'month').distinct())
+    written = 0
+    for year, month in sorted(months):
+        with transaction.atomic():
+            written += refresh_attendance_summaries(year, month)
+    return written
+
+
+def term_start(today=None):
+    """First day of the academic year containing `today` (see core.academic_years)"""
+    return academic_year_range(academic_year(today))[0]
+
+
+def with_term_attendance(students, today=None):
+    """Annotate a Student queryset with term-to-date attendance from the monthly summaries.
+
+    Adds term_present/absent/leave/half_day, term_marked, term_attended
+    (half days count 0.5) and term_percentage (None before anything is
+    marked), all in the same query.
+    """
+    start = term_start(today)
+    in_term = (
+        Q(attendance_summaries__year__gt=start.year)
+        | Q(attendance_summaries__year=start.year, attendance_summaries__month__gte=start.month)
+    )
+    counts = {
+        f'term_{key}': Coalesce(Sum(f'attendance_summaries__{key}', filter=in_term), 0)
+        for key in STATUS_KEYS.values()
+    }
+    return students.annotate(**counts).annotate(
+        term_marked=F('term_present') + F('term_absent') + F('term_leave') + F('term_half_day'),
+        term_attended=ExpressionWrapper(F('term_present') + F('term_half_day') * 0.5, output_field=FloatField()),
+    ).annotate(
+        term_percentage=ExpressionWrapper(
+            F('term_attended') * 100.0 / NullIf(F('term_marked'), 0), output_field=FloatField()
+        ),
+    )
+
+
+def attendance_threshold():
+    return getattr(settings, 'ATTENDANCE_THRESHOLD', 75)
+
+
+def attendance_shortfall(threshold=None, class_id=None, today=None):
+    """Active students whose term-to-date attendance is below the threshold, lowest first"""
+    threshold = attendance_threshold() if threshold is None else threshold
+    students = Student.objects.filter(is_active=True).select_related('student_class')
+    if class_id:
+        students = students.filter(student_class_id=class_id)
+    return with_term_attendance(students, today).filter(
+        term_marked__gt=0, term_percentage__lt=threshold
+    ).order_by('term_percentage', 'name')
+
+
+# ===================== ABSENCE STREAKS =====================
+
+def absence_alert_days():
+    return getattr(settings, 'ABSENCE_ALERT_DAYS', 3)
+
+
+def rewind_absence_streaks(day, student_ids=None):
+    """Make streaks that already evaluated `day` re-evaluate the term on the next run.
+
+    Needed when attendance for a past day is changed or a holiday is
+    declared after the detector has run over it.
+    """
+    streaks = AbsenceStreak.objects.filter(through_date__gte=day)
+    if student_ids is not None:
+        streaks = streaks.filter(student_id__in=student_ids)
+    return streaks.update(through_date=None, current=0, started_on=None)
+
+
+@dataclass
+class AbsenceRun:
+    as_of: date
+    students: int = 0
+    school_days: int = 0
+    opened: int = 0
+    updated: int = 0
+    resolved: int = 0
+
+    def summary(self):
+        return (
+            f'Evaluated {self.students} students over {self.school_days} school days through {self.as_of}: '
+            f'{self.opened} new alerts, {self.updated} updated, {self.resolved} resolved'
+        )
+
+
+def detect_absence_streaks(as_of=None, min_days=None):
+    """Advance every active student's AbsenceStreak through `as_of` (default yesterday).
+
+    Each student is evaluated only from the day after their streak's
+    through_date, so a nightly run reads just the newly marked day(s);
+    students without state, or rewound by a late edit, start from the
+    beginning of the term. Sundays and Holidays are skipped, as are days a
+    student was not marked. Only Absent extends a streak; any other status
+    ends it. Streaks of min_days or more keep one open AbsenceAlert, which
+    is resolved once the streak ends.
+    """
+    as_of = as_of or date.today() - timedelta(days=1)
+    min_days = absence_alert_days() if min_days is None else min_days
+    run = AbsenceRun(as_of=as_of)
+    with transaction.atomic():
+        states = {
+            streak.student_id: streak
+            for streak in AbsenceStreak.objects.select_for_update().filter(student__is_active=True)
+        }
+        first_day = term_start(as_of)
+        starts = {}
+        for student_id in Student.objects.filter(is_active=True).values_list('id', flat=True):
+            state = states.get(student_id)
+            start = state.through_date + timedelta(days=1) if state and state.through_date else first_day
+            if start <= as_of:
+                starts.setdefault(start, []).append(student_id)
+        if not starts:
+            return run
+
+        earliest = min(starts)
+        holidays = set(Holiday.objects.filter(date__range=(earliest, as_of)).values_list('date', flat=True))
+        calendar_days = (earliest + timedelta(days=offset) for offset in range((as_of - earliest).days + 1))
+        school_days = [day for day in calendar_days if day.weekday() != 6 and day not in holidays]
+        run.school_days = len(school_days)
+
+        marks = {}
+        largest = max(starts, key=lambda start: len(starts[start]))
+        for start, student_ids in starts.items():
+            # The biggest group (normally everyone, from the day after the
+            # last run) is read by date alone rather than a long id list
+            group = None if start == largest else student_ids
+            for student_id, day, status in iter_student_statuses(start, as_of, group):
+                marks.setdefault(student_id, {})[day] = status
+
+        streaks = []
+        for start, student_ids in starts.items():
+            days = [day for day in school_days if day >= start]
+            for student_id in student_ids:
+                state = states.get(student_id)
+                current, started_on = (state.current, state.started_on) if state and state.through_date else (0, None)
+                last_absent_on = None
+                student_marks = marks.get(student_id, {})
+                for day in days:
+                    status = student_marks.get(day)
+                    if status is None:
+                        continue
+                    if status == 'Absent':
+                        current += 1
+                        started_on = started_on or day
+                        last_absent_on = day
+                    else:
+                        current, started_on = 0, None
+                streak = AbsenceStreak(
+                    student_id=student_id, through_date=as_of, current=current, started_on=started_on,
+                )
+                streak.last_absent_on = last_absent_on
+                streaks.append(streak)
+        run.students = len(streaks)
+        AbsenceStreak.objects.bulk_create(
+            streaks,
+            update_conflicts=True,
+            unique_fields=['student'],
+            update_fields=['through_date', 'current', 'started_on'],
+        )
+        _sync_absence_alerts(streaks, min_days, run)
+    return run
+
+
+def _sync_absence_alerts(streaks, min_days, run):
+    """Open, extend or resolve each evaluated student's AbsenceAlert"""
+    open_alerts = {
+        alert.student_id: alert
+        for alert in AbsenceAlert.objects.filter(
+            resolved_on__isnull=True, student_id__in=[streak.student_id for streak in streaks]
+        )
+    }
+    new_alerts, changed, resolved = [], [], []
+    for streak in streaks:
+        alert = open_alerts.get(streak.student_id)
+        last_absent_on = streak.last_absent_on or streak.through_date
+        if streak.current >= min_days and alert and alert.started_on == streak.started_on:
+            if alert.days != streak.current:
+                alert.days, alert.last_absent_on = streak.current, last_absent_on
+                changed.append(alert)
+            continue
+        if alert:
+            resolved.append(alert.id)
+        if streak.current >= min_days:
+            new_alerts.append(AbsenceAlert(
+                student_id=streak.student_id, started_on=streak.started_on, last_absent_on=last_absent_on,
+                days=streak.current,
+            ))
+    AbsenceAlert.objects.bulk_create(new_alerts)
+    if changed:
+        AbsenceAlert.objects.bulk_update(changed, ['days', 'last_absent_on'])
+    if resolved:
+        AbsenceAlert.objects.filter(id__in=resolved).update(resolved_on=run.as_of)
+    run.opened, run.updated, run.resolved = len(new_alerts), len(changed), len(resolved)
+
+
+def open_absence_alerts(class_id):
+    """Unresolved alerts for a class's active students, longest streak first (one query)"""
+    return AbsenceAlert.objects.filter(
+        resolved_on__isnull=True, student__student_class_id=class_id, student__is_active=True
+    ).select_related('student')
@@ -0,0 +1,142 @@
+"""Compact month-per-row storage for student attendance history.
+
+Each StudentAttendanceMonth row holds one student's month as a bitmask of
+marked days plus 2 bits per day for the status, replacing up to 31
+StudentAttendance rows. Months are moved between the two tables with
+pack_month()/unpack_month(); readers in core.attendance merge both, so
+callers never need to know where a month is stored.
+"""
+import calendar
+from datetime import date
+
+from django.db import connection, transaction
+
+from .models import StudentAttendance, StudentAttendanceMonth
+
+
+STATUS_BY_CODE = ['Present', 'Absent', 'Leave', 'Half Day']
+CODE_BY_STATUS = {status: code for code, status in enumerate(STATUS_BY_CODE)}
+
+
+def pack(day_statuses, marked=0, statuses=0):
+    """Fold {day: status} into (marked, statuses) bitmasks, on top of existing ones"""
+    for day, status in day_statuses.items():
+        shift = 2 * (day - 1)
+        marked |= 1 << (day - 1)
+        statuses = (statuses & ~(0b11 << shift)) | (CODE_BY_STATUS[status] << shift)
+    return marked, statuses
+
+
+def unpack(marked, statuses):
+    """{day: status} for every marked day"""
+    days = {}
+    day = 1
+    while marked:
+        if marked & 1:
+            days[day] = STATUS_BY_CODE[(statuses >> 2 * (day - 1)) & 0b11]
+        marked >>= 1
+        day += 1
+    return days
+
+
+def status_on(marked, statuses, day):
+    """Status of one day, or None if it was not marked"""
+    if not marked >> (day - 1) & 1:
+        return None
+    return STATUS_BY_CODE[(statuses >> 2 * (day - 1)) & 0b11]
+
+
+def month_range(year, month):
+    """(first day, last day) of a calendar month"""
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def pack_month(year, month, batch_size=1000):
+    """Move one month of StudentAttendance rows into packed rows, in one transaction.
+
+    Rows are merged into any packed row the student already has for the
+    month. Returns (rows packed, packed rows written).
+    """
+    first, last = month_range(year, month)
+    with transaction.atomic():
+        # Locked so a status changed mid-pack waits rather than being overwritten
+        rows = StudentAttendance.objects.select_for_update().filter(date__range=(first, last))
+        by_student = {}
+        packed_ids = []
+        for row_id, student_id, day, status in rows.order_by().values_list(
+            'id', 'student_id', 'date', 'status'
+        ).iterator():
+            by_student.setdefault(student_id, {})[day.day] = status
+            packed_ids.append(row_id)
+        if not by_student:
+            return 0, 0
+
+        existing = {
+            packed.student_id: packed
+            for packed in StudentAttendanceMonth.objects.select_for_update().filter(
+                year=year, month=month, student_id__in=list(by_student)
+            )
+        }
+        packed_rows = []
+        for student_id, days in by_student.items():
+            current = existing.get(student_id)
+            marked, statuses = pack(days, *(current.marked, current.statuses) if current else (0, 0))
+            packed_rows.append(StudentAttendanceMonth(
+                student_id=student_id, year=year, month=month, marked=marked, statuses=statuses,
+            ))
+        StudentAttendanceMonth.objects.bulk_create(
+            packed_rows,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['student', 'year', 'month'],
+            update_fields=['marked', 'statuses'],
+        )
+        # The days have moved, not changed: plain DELETEs of exactly the rows packed
+        # above, so the per-row delete signals (summaries, streaks) don't fire and
+        # a day marked since the read is left in place for the next pack
+        table = connection.ops.quote_name(StudentAttendance._meta.db_table)
+        pk_column = connection.ops.quote_name(StudentAttendance._meta.pk.column)
+        with connection.cursor() as cursor:
+            for start in range(0, len(packed_ids), batch_size):
+                ids = packed_ids[start:start + batch_size]
+                cursor.execute(f'DELETE FROM {table} WHERE {pk_column} IN ({", ".join(["%s"] * len(ids))})', ids)
+    return len(packed_ids), len(packed_rows)
+
+
+def unpack_month(year, month, batch_size=1000):
+    """Move one packed month back into StudentAttendance rows; returns the rows written"""
+    with transaction.atomic():
+        packed = StudentAttendanceMonth.objects.filter(year=year, month=month)
+        rows = [
+            StudentAttendance(student_id=student_id, date=date(year, month, day), status=status)
+            for student_id, marked, statuses in packed.values_list('student_id', 'marked', 'statuses').iterator()
+            for day, status in unpack(marked, statuses).items()
+        ]
+        StudentAttendance.objects.bulk_create(
+            rows,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['student', 'date'],
+            update_fields=['status'],
+        )
+        packed.delete()
+    return len(rows)
+
+
+def save_packed_days(attendance_date, register):
+    """Write register entries whose month is already packed into the packed rows.
+
+    Returns the part of the register that still belongs in StudentAttendance.
+    """
+    packed = {
+        row.student_id: row
+        for row in StudentAttendanceMonth.objects.select_for_update().filter(
+            year=attendance_date.year, month=attendance_date.month, student_id__in=list(register)
+        )
+    }
+    if not packed:
+        return register
+    for student_id, row in packed.items():
+        row.marked, row.statuses = pack({attendance_date.day: register[student_id]}, row.marked, row.statuses)
+    StudentAttendanceMonth.objects.bulk_update(packed.values(), ['marked', 'statuses'])
+    return {student_id: status for student_id, status in register.items() if student_id not in packed}
@@ -0,0 +1,115 @@
+"""Admin dashboard totals kept as running counters instead of per-request aggregates"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import (
+    ArchivedStudentPayment, ArchivedTeacherPayment, DashboardCounter, SchoolClass, Student, StudentPayment, Teacher,
+    TeacherPayment
+)
+
+
+def _paid(instance):
+    return instance.paid_amount if instance.status == 'Paid' else 0
+
+
+# model -> {counter name: contribution of one instance}
+COUNTER_SOURCES = {
+    StudentPayment: {
+        'total_revenue': _paid,
+        'pending_fees': lambda payment: int(payment.status == 'Pending'),
+    },
+    TeacherPayment: {
+        'total_spend': _paid,
+        'pending_salaries': lambda payment: int(payment.status == 'Pending'),
+    },
+    Student: {'total_students': lambda student: int(student.is_active)},
+    Teacher: {'total_teachers': lambda teacher: int(teacher.is_active)},
+    SchoolClass: {'total_classes': lambda school_class: 1},
+}
+
+RECENT_PAYMENTS_CACHE_KEY = 'dashboard:recent_payments'
+
+COUNTER_NAMES = [name for counters in COUNTER_SOURCES.values() for name in counters]
+
+# Fields each source's contribution depends on, for the pre-save snapshot
+SOURCE_FIELDS = {
+    StudentPayment: ['paid_amount', 'status'],
+    TeacherPayment: ['paid_amount', 'status'],
+    Student: ['is_active'],
+    Teacher: ['is_active'],
+    SchoolClass: [],
+}
+
+
+def contributions(instance):
+    """{counter name: value} this instance adds to the dashboard totals"""
+    return {name: Decimal(func(instance)) for name, func in COUNTER_SOURCES[type(instance)].items()}
+
+
+def adjust_counters(deltas):
+    """Add the given deltas to the stored counters with atomic UPDATE ... SET value = value + x"""
+    now = timezone.now()
+    for name, delta in deltas.items():
+        if delta:
+            DashboardCounter.objects.filter(name=name).update(value=F('value') + delta, updated_at=now)
+
+
+def reconcile_counters():
+    """Recompute every counter from the source tables; returns {name: (old, new)} for drifted ones"""
+    paid = Sum('paid_amount', filter=Q(status='Paid'))
+    pending = Count('id', filter=Q(status='Pending'))
+    fees = StudentPayment.objects.aggregate(total_revenue=paid, pending_fees=pending)
+    salaries = TeacherPayment.objects.aggregate(total_spend=paid, pending_salaries=pending)
+    # Archived academic years hold only settled payments, which still count towards the totals
+    fees['total_revenue'] = (fees['total_revenue'] or 0) + (
+        ArchivedStudentPayment.objects.aggregate(total=paid)['total'] or 0
+    )
+    salaries['total_spend'] = (salaries['total_spend'] or 0) + (
+        ArchivedTeacherPayment.objects.aggregate(total=paid)['total'] or 0
+    )
+    actual = {
+        **fees,
+        **salaries,
+        'total_students': Student.objects.filter(is_active=True).count(),
+        'total_teachers': Teacher.objects.filter(is_active=True).count(),
+        'total_classes': SchoolClass.objects.count(),
+    }
+
+    drift = {}
+    with transaction.atomic():
+        stored = dict(DashboardCounter.objects.select_for_update().values_list('name', 'value'))
+        for name in COUNTER_NAMES:
+            value = Decimal(actual[name] or 0)
+            if stored.get(name) != value:
+                drift[name] = (stored.get(name), value)
+                DashboardCounter.objects.update_or_create(name=name, defaults={'value': value})
+    return drift
+
+
+def dashboard_counters():
+    """All counters in one query, reconciling first if any are missing"""
+    values = dict(DashboardCounter.objects.values_list('name', 'value'))
+    if len(values) < len(COUNTER_NAMES):
+        reconcile_counters()
+        values = dict(DashboardCounter.objects.values_list('name', 'value'))
+    return values
+
+
+def forget_recent_payments():
+    cache.delete(RECENT_PAYMENTS_CACHE_KEY)
+
+
+def recent_payments(limit=5):
+    """Latest fee and salary payments, cached until a payment, student or teacher changes"""
+    recent = cache.get(RECENT_PAYMENTS_CACHE_KEY)
+    if recent is None:
+        recent = (
+            list(StudentPayment.objects.select_related('student').order_by('-payment_date')[:limit]),
+            list(TeacherPayment.objects.select_related('teacher').order_by('-payment_date')[:limit]),
+        )
+        cache.set(RECENT_PAYMENTS_CACHE_KEY, recent, None)
+    return recent
@@ -0,0 +1,226 @@
+"""Batch fee receipts, salary slips and ID card sheets for printing"""
+import base64
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+from glob import glob
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import F
+from django.template.loader import render_to_string
+
+from .academic_years import academic_year
+from .fees import month_filter
+from .images import id_card_thumbnails
+from .models import AcademicYear, SchoolInfo, Student, StudentPayment, TeacherPayment
+from .streaming import ZipStream
+from .workers import process_pool, worker_count
+
+
+# Bump when the receipt/slip templates change so cached copies are re-rendered
+DOCUMENT_VERSION = 1
+
+DOCUMENT_KINDS = {
+    'receipt': {
+        'template': 'admin_portal/fee_receipt.html',
+        'title': 'Fee Receipt',
+    },
+    'slip': {
+        'template': 'admin_portal/salary_slip.html',
+        'title': 'Salary Slip',
+    },
+}
+
+PAYMENT_FIELDS = [
+    'id', 'month', 'year', 'paid_amount', 'due_amount', 'payment_mode', 'payment_date', 'status', 'remarks',
+]
+
+
+def fee_receipt_rows(date_from, date_to):
+    """Collections (payments with a paid amount) made in the date range"""
+    return StudentPayment.objects.filter(
+        payment_date__range=(date_from, date_to), paid_amount__gt=0
+    ).order_by('payment_date', 'id').values(
+        *PAYMENT_FIELDS,
+        name=F('student__name'),
+        father_name=F('student__father_name'),
+        class_name=F('student__student_class__class_name'),
+        section=F('student__student_class__section'),
+    )
+
+
+def salary_slip_rows(month_number, year):
+    """Every salary row of a payroll month"""
+    return TeacherPayment.objects.filter(month_filter(month_number), year=year).order_by(
+        'teacher__name', 'id'
+    ).values(
+        *PAYMENT_FIELDS,
+        name=F('teacher__name'),
+        role=F('teacher__role'),
+        monthly_salary=F('teacher__monthly_salary'),
+    )
+
+
+def _school_header():
+    school = SchoolInfo.objects.first() or SchoolInfo()
+    return {'name': school.school_name, 'address': school.address, 'contact': school.contact_number}
+
+
+def _render_document(template_name, context):
+    return render_to_string(template_name, context)
+
+
+class DocumentCache:
+    """Rendered documents on disk under <kind>/<payment id>-<content hash>.html"""
+
+    def __init__(self, kind):
+        self.directory = os.path.join(settings.DOCUMENT_CACHE_DIR, kind)
+
+    @staticmethod
+    def fingerprint(context):
+        raw = json.dumps([DOCUMENT_VERSION, context], sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+    def path(self, payment_id, fingerprint):
+        return os.path.join(self.directory, f'{payment_id}-{fingerprint}.html')
+
+    def get(self, payment_id, fingerprint):
+        try:
+            with open(self.path(payment_id, fingerprint), encoding='utf-8') as cached:
+                return cached.read()
+        except FileNotFoundError:
+            return None
+
+    def set(self, payment_id, fingerprint, html):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(payment_id, fingerprint)
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(handle, 'w', encoding='utf-8') as temp:
+            temp.write(html)
+        os.replace(temp_path, path)
+        # Older renders of this payment are stale now. Another worker may be
+        # clearing them too, or may just have written its own render; a file
+        # that goes missing is only ever a cache miss for get().
+        for old in glob(os.path.join(self.directory, f'{payment_id}-*.html')):
+            if old != path:
+                try:
+                    os.remove(old)
+                except FileNotFoundError:
+                    pass
+
+
+def rendered_documents(kind, rows, workers=None):
+    """Yield (filename, html) per payment row, in order.
+
+    Cache hits are read from disk; misses are rendered in a process pool
+    (at most 2 x workers in flight) and written back to the cache.
+    """
+    spec = DOCUMENT_KINDS[kind]
+    cache = DocumentCache(kind)
+    school = _school_header()
+    workers = worker_count('DOCUMENT_RENDER_WORKERS', workers)
+    executor = process_pool(workers) if workers else None
+
+    def finish(row, fingerprint, output):
+        html = output
+        if not isinstance(output, str):
+            html = output.result()
+            cache.set(row['id'], fingerprint, html)
+        return f"{kind}-{row['id']:06d}.html", html
+
+    try:
+        pending = []
+        for row in rows:
+            context = {'payment': row, 'school': school}
+            fingerprint = cache.fingerprint(context)
+            html = cache.get(row['id'], fingerprint)
+            if html is None and executor is None:
+                html = _render_document(spec['template'], context)
+                cache.set(row['id'], fingerprint, html)
+            elif html is None:
+                html = executor.submit(_render_document, spec['template'], context)
+            pending.append((row, fingerprint, html))
+            if len(pending) >= max(workers, 1) * 2:
+                yield finish(*pending.pop(0))
+        for item in pending:
+            yield finish(*item)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _page_parts(title, template_name='admin_portal/documents_print.html'):
+    """The print wrapper split around where the documents go"""
+    marker = '<!--documents-->'
+    page = render_to_string(template_name, {'title': title, 'documents': marker})
+    head, foot = page.split(marker)
+    return head, foot
+
+
+def stream_print_document(title, documents):
+    """One printable HTML page holding every document, one per printed page"""
+    head, foot = _page_parts(title)
+    yield head
+    for _, html in documents:
+        yield html
+    yield foot
+
+
+def stream_documents_zip(title, documents):
+    """A ZIP with each document as its own printable HTML file"""
+    head, foot = _page_parts(title)
+    buffer = ZipStream()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for filename, html in documents:
+            archive.writestr(filename, head + html + foot)
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+# ===================== ID CARD SHEETS =====================
+
+# Portrait CR80 cards (54 x 85.6 mm) fit 3 x 3 on an A4 sheet
+ID_CARD_COLUMNS = 3
+ID_CARD_ROWS = 3
+
+
+def id_card_students(class_id=None):
+    """Active students in card order, with their class, in one query"""
+    students = Student.objects.filter(is_active=True).select_related('student_class')
+    if class_id:
+        students = students.filter(student_class_id=class_id)
+    return students.order_by('student_class__class_name', 'student_class__section', 'name', 'id')
+
+
+def _data_uri(name):
+    with default_storage.open(name, 'rb') as image:
+        return 'data:image/jpeg;base64,' + base64.b64encode(image.read()).decode('ascii')
+
+
+def stream_id_card_sheets(students, title='Student ID Cards'):
+    """One printable HTML document with ID_CARD_COLUMNS x ID_CARD_ROWS cards per A4 sheet.
+
+    Cards use the small card-sheet thumbnails embedded as data URIs (a
+    placeholder for any photo that has none yet, never the full photo), so
+    the document is a single self-contained download however many students
+    it holds. Sheets are rendered and yielded one at a time.
+    """
+    students = list(students)
+    thumbnails = id_card_thumbnails([student.photo.name for student in students if student.photo])
+    context = {'academic_year': AcademicYear(start_year=academic_year()).label}
+    head, foot = _page_parts(title, 'admin_portal/id_card_sheets.html')
+    yield head
+    per_sheet = ID_CARD_COLUMNS * ID_CARD_ROWS
+    pages = (len(students) + per_sheet - 1) // per_sheet
+    for page, first in enumerate(range(0, len(students), per_sheet), start=1):
+        cards = []
+        for student in students[first:first + per_sheet]:
+            thumbnail = thumbnails.get(student.photo.name) if student.photo else None
+            cards.append({'student': student, 'photo': _data_uri(thumbnail) if thumbnail else None})
+        yield render_to_string(
+            'admin_portal/id_card_sheet.html', {**context, 'cards': cards, 'page': page, 'pages': pages}
+        )
+    yield foot
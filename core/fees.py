@@ -0,0 +1,208 @@
+"""Fee ledger helpers: monthly invoice generation and student balances"""
+import calendar
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, ExtractMonth, ExtractYear, Greatest
+from django.utils import timezone
+
+from .counters import adjust_counters, forget_recent_payments
+from .models import MONTH_NAMES, ArchivedStudentPayment, FeeInvoiceRun, Student, StudentBalance, StudentPayment
+
+
+def month_filter(month_number):
+    """Match StudentPayment/TeacherPayment.month, stored as the full month name (see normalise_month)"""
+    return Q(month=MONTH_NAMES[month_number - 1])
+
+
+@dataclass
+class InvoiceReport:
+    month: str
+    year: int
+    created: int = 0
+    skipped: dict = field(default_factory=dict)   # reason -> count
+    already_completed: bool = False
+
+    def skip(self, reason, count=1):
+        if count:
+            self.skipped[reason] = self.skipped.get(reason, 0) + count
+
+    @property
+    def skipped_total(self):
+        return sum(self.skipped.values())
+
+    def summary(self):
+        if self.already_completed:
+            return f'Invoices for {self.month} {self.year} were already generated'
+        skipped = ', '.join(f'{count} {reason}' for reason, count in self.skipped.items()) or 'none'
+        return f'{self.created} invoices created for {self.month} {self.year}; skipped: {skipped}'
+
+
+def generate_fee_invoices(month_number, year, chunk_size=1000):
+    """Create the month's Pending StudentPayment rows for all active students.
+
+    Students are walked in id order in chunks; each chunk is one
+    transaction that inserts with bulk_create and advances the run's
+    resume point, so a crashed run picks up where it stopped. Students
+    who already have a row for the month are skipped, which together with
+    the one-run-per-month record makes the whole operation idempotent.
+    """
+    month = MONTH_NAMES[month_number - 1]
+    report = InvoiceReport(month=month, year=year)
+    run, _ = FeeInvoiceRun.objects.get_or_create(month=month, year=year)
+    if run.status == 'Completed':
+        report.already_completed = True
+        return report
+
+    month_start = date(year, month_number, 1)
+    month_end = date(year, month_number, calendar.monthrange(year, month_number)[1])
+    billed = StudentPayment.objects.filter(month_filter(month_number), year=year)
+
+    while True:
+        with transaction.atomic():
+            run = FeeInvoiceRun.objects.select_for_update().get(pk=run.pk)
+            if run.status == 'Completed':
+                break
+            chunk = list(
+                Student.objects.filter(is_active=True, id__gt=run.last_student_id)
+                .order_by('id').values_list('id', 'monthly_fee', 'admission_date')[:chunk_size]
+            )
+            if not chunk:
+                run.status = 'Completed'
+                run.finished_at = timezone.now()
+                run.save(update_fields=['status', 'finished_at'])
+                break
+
+            already_billed = set(
+                billed.filter(student_id__in=[student_id for student_id, _, _ in chunk])
+                .values_list('student_id', flat=True)
+            )
+            invoices = []
+            for student_id, monthly_fee, admission_date in chunk:
+                if student_id in already_billed:
+                    report.skip('already billed')
+                elif not monthly_fee:
+                    report.skip('no monthly fee')
+                elif admission_date > month_end:
+                    report.skip('admitted later')
+                else:
+                    invoices.append(StudentPayment(
+                        student_id=student_id,
+                        paid_amount=0,
+                        due_amount=monthly_fee,
+                        payment_date=month_start,
+                        status='Pending',
+                        month=month,
+                        year=year,
+                        remarks='Monthly fee invoice',
+                    ))
+            StudentPayment.objects.bulk_create(invoices)
+            # bulk_create skips the signals that keep the dashboard counters current
+            adjust_counters({'pending_fees': len(invoices)})
+            forget_recent_payments()
+            report.created += len(invoices)
+
+            run.last_student_id = chunk[-1][0]
+            run.created_count += len(invoices)
+            run.skipped_count += len(chunk) - len(invoices)
+            run.save(update_fields=['last_student_id', 'created_count', 'skipped_count'])
+    return report
+
+
+# ===================== BALANCES =====================
+
+BALANCE_FIELDS = ['months_billed', 'total_billed', 'total_paid', 'outstanding', 'months_owed', 'as_of', 'updated_at']
+
+
+def _billing_month(as_of=None):
+    as_of = as_of or timezone.localdate()
+    return as_of.replace(day=1)
+
+
+def refresh_balances(student_ids=None, as_of=None):
+    """Recompute StudentBalance for the given students (all when None).
+
+    Billed months (admission month through `as_of`, inclusive) and the sum
+    of paid amounts are both computed in the database in one query; the
+    rows are then written back with a single upsert. Returns the number of
+    balances written.
+    """
+    as_of = _billing_month(as_of)
+    # Payments from archived academic years still count towards what has been paid
+    paid, archived_paid = (
+        model.objects.filter(student=OuterRef('pk')).order_by().values('student').annotate(
+            total=Sum('paid_amount')
+        ).values('total')
+        for model in (StudentPayment, ArchivedStudentPayment)
+    )
+    months = (
+        (as_of.year - ExtractYear('admission_date')) * 12
+        + (as_of.month - ExtractMonth('admission_date')) + 1
+    )
+    students = Student.objects.filter(is_active=True)
+    if student_ids is not None:
+        students = students.filter(pk__in=student_ids)
+    rows = students.annotate(
+        months_billed=Greatest(months, Value(0)),
+        paid=(
+            Coalesce(Subquery(paid), Value(Decimal('0')), output_field=DecimalField())
+            + Coalesce(Subquery(archived_paid), Value(Decimal('0')), output_field=DecimalField())
+        ),
+    ).values_list('id', 'monthly_fee', 'months_billed', 'paid')
+
+    now = timezone.now()
+    balances = []
+    for student_id, monthly_fee, months_billed, total_paid in rows.iterator():
+        total_billed = monthly_fee * months_billed
+        outstanding = total_billed - Decimal(total_paid)
+        balances.append(StudentBalance(
+            student_id=student_id,
+            months_billed=months_billed,
+            total_billed=total_billed,
+            total_paid=total_paid,
+            outstanding=outstanding,
+            months_owed=(outstanding / monthly_fee).quantize(Decimal('0.01')) if monthly_fee else 0,
+            as_of=as_of,
+            updated_at=now,
+        ))
+
+    with transaction.atomic():
+        StudentBalance.objects.bulk_create(
+            balances,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['student'],
+            update_fields=BALANCE_FIELDS,
+        )
+        # Inactive or deleted students carry no running balance
+        stale = StudentBalance.objects.exclude(student__is_active=True)
+        if student_ids is not None:
+            stale = stale.filter(student_id__in=student_ids)
+        stale.delete()
+    return len(balances)
+
+
+def student_balance(student):
+    """The student's balance, recomputed first if missing or from an earlier month"""
+    balance = StudentBalance.objects.filter(student=student).first()
+    if balance is None or balance.as_of < _billing_month():
+        refresh_balances([student.pk])
+        balance = StudentBalance.objects.filter(student=student).first()
+    return balance
+
+
+def defaulters(min_months):
+    """Active students owing more than `min_months` months of fees"""
+    if StudentBalance.objects.filter(as_of__lt=_billing_month()).exists():
+        refresh_balances()
+    else:
+        # Students with no balance row yet, such as everyone enrolled before balances were kept
+        missing = list(Student.objects.filter(is_active=True, balance__isnull=True).values_list('pk', flat=True))
+        if missing:
+            refresh_balances(missing)
+    return StudentBalance.objects.filter(
+        months_owed__gt=min_months, student__is_active=True
+    ).select_related('student', 'student__student_class').order_by('-months_owed', 'student__name')
@@ -0,0 +1,319 @@
+"""Resized image derivatives generated with Pillow off the request path"""
+import io
+import logging
+import posixpath
+import re
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import GalleryImage, Student, Teacher
+from .page_cache import invalidate_public_pages
+from .workers import process_pool, worker_count
+
+
+logger = logging.getLogger(__name__)
+
+GALLERY_WIDTHS = (320, 640, 1280)
+DERIVATIVE_FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        workers = getattr(settings, 'IMAGE_DERIVATIVE_WORKERS', 2)
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='derivatives')
+    return _executor
+
+
+def build_derivatives(source_name, widths=GALLERY_WIDTHS, folder='derivatives'):
+    """Write resized WebP and JPEG copies of a stored image.
+
+    Widths larger than the original are skipped; the original is never
+    upscaled. Returns {format: {width: storage_name}}.
+    """
+    with default_storage.open(source_name, 'rb') as source:
+        original = ImageOps.exif_transpose(Image.open(source))
+        original.load()
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGBA' if 'transparency' in original.info else 'RGB')
+
+    directory, filename = posixpath.split(source_name)
+    stem = posixpath.splitext(filename)[0]
+    derivatives = {fmt: {} for fmt in DERIVATIVE_FORMATS}
+    for width in widths:
+        last = width >= original.width
+        width = min(width, original.width)
+        height = round(original.height * width / original.width)
+        resized = original.resize((width, height), Image.LANCZOS)
+        for fmt, options in DERIVATIVE_FORMATS.items():
+            image = resized.convert('RGB') if fmt == 'jpeg' else resized
+            buffer = io.BytesIO()
+            image.save(buffer, **options)
+            name = f'{directory}/{folder}/{stem}-{width}.{fmt}'
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            derivatives[fmt][str(width)] = default_storage.save(name, ContentFile(buffer.getvalue()))
+        if last:
+            break
+    return derivatives
+
+
+def generate_gallery_derivatives(image_id):
+    """Build derivatives for one GalleryImage and record them on the row"""
+    close_old_connections()
+    try:
+        gallery_image = GalleryImage.objects.get(pk=image_id)
+        derivatives = build_derivatives(gallery_image.image.name)
+        GalleryImage.objects.filter(pk=image_id).update(derivatives=derivatives)
+        invalidate_public_pages()
+        return derivatives
+    except Exception:
+        logger.exception('Could not build derivatives for gallery image %s', image_id)
+    finally:
+        close_old_connections()
+
+
+def queue_gallery_derivatives(image_id):
+    """Generate derivatives in the worker pool once the upload is committed"""
+    if not getattr(settings, 'IMAGE_DERIVATIVE_WORKERS', 2):
+        transaction.on_commit(lambda: generate_gallery_derivatives(image_id))
+    else:
+        transaction.on_commit(lambda: _get_executor().submit(generate_gallery_derivatives, image_id))
+
+
+def discard_gallery_derivatives(derivatives):
+    """Delete a removed gallery image's resized copies once the deletion is committed"""
+    names = [name for sizes in derivatives.values() for name in sizes.values()]
+    if names:
+        transaction.on_commit(lambda: _delete_files(names))
+
+
+# ===================== ID PHOTOS =====================
+
+# 3x the 120x140 px photo frame on the ID card, so photos print sharply
+ID_PHOTO_SIZE = (360, 420)
+# The copy embedded in batch-printed card sheets: the 19 x 22 mm frame at 300 dpi
+ID_CARD_THUMB_SIZE = (240, 280)
+# Portraits have the face above the middle, so crops keep a little more of the top
+ID_PHOTO_CENTERING = (0.5, 0.4)
+ID_PHOTO_FORMAT = {'format': 'JPEG', 'quality': 85, 'optimize': True}
+MAX_PHOTO_BYTES = 20 * 1024 * 1024
+PHOTO_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp', '.tif', '.tiff'}
+
+PHOTO_OWNERS = {'student': Student, 'teacher': Teacher}
+# student-12.jpg, Teacher_7.png, students/12.jpg
+PHOTO_NAME = re.compile(r'^(?:(?P<kind>student|teacher)s?[-_ ]*)?(?P<id>\d+)$', re.IGNORECASE)
+
+
+def id_photo(data, size=ID_PHOTO_SIZE):
+    """Crop image bytes to the ID card's aspect ratio, resize to `size` and return JPEG bytes"""
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(data)))
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    image = ImageOps.fit(image.convert('RGB'), size, Image.LANCZOS, centering=ID_PHOTO_CENTERING)
+    buffer = io.BytesIO()
+    image.save(buffer, **ID_PHOTO_FORMAT)
+    return buffer.getvalue()
+
+
+def _id_photo_with_thumbnail(data):
+    photo = id_photo(data)
+    return photo, id_photo(photo, ID_CARD_THUMB_SIZE)
+
+
+def id_card_thumbnail_name(photo_name):
+    """Storage name of a photo's card-sheet thumbnail, next to the photo"""
+    directory, filename = posixpath.split(photo_name)
+    return f'{directory}/idcard/{posixpath.splitext(filename)[0]}.jpg'
+
+
+def build_id_card_thumbnail(photo_name):
+    """Write the card-sheet thumbnail of a stored photo; returns its name, or None if the photo is unreadable"""
+    try:
+        with default_storage.open(photo_name, 'rb') as source:
+            thumbnail = id_photo(source.read(), ID_CARD_THUMB_SIZE)
+    except (FileNotFoundError, UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        logger.warning('Could not build an ID card thumbnail for %s', photo_name)
+        return None
+    return _replace_file(id_card_thumbnail_name(photo_name), thumbnail)
+
+
+def _replace_file(name, data):
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    return default_storage.save(name, ContentFile(data))
+
+
+def queue_id_card_thumbnail(photo_name):
+    """Build a photo's card-sheet thumbnail in the worker pool once the upload is committed"""
+    if not getattr(settings, 'IMAGE_DERIVATIVE_WORKERS', 2):
+        transaction.on_commit(lambda: _ensure_id_card_thumbnail(photo_name))
+    else:
+        transaction.on_commit(lambda: _get_executor().submit(_ensure_id_card_thumbnail, photo_name))
+
+
+def _ensure_id_card_thumbnail(photo_name):
+    if not default_storage.exists(id_card_thumbnail_name(photo_name)):
+        build_id_card_thumbnail(photo_name)
+
+
+def id_card_thumbnails(photo_names):
+    """{photo name: card-sheet thumbnail name, or None if it has none yet}.
+
+    Thumbnails are written when a photo is uploaded or imported (and for
+    older photos by migration 0019), so this only checks that they exist
+    and never resizes on the request path.
+    """
+    return {
+        name: thumbnail if default_storage.exists(thumbnail := id_card_thumbnail_name(name)) else None
+        for name in set(photo_names)
+    }
+
+
+def build_missing_id_card_thumbnails(photo_names, workers=None):
+    """Write the card-sheet thumbnails that are missing, in a process pool; returns how many were built"""
+    missing = [name for name in set(photo_names) if not default_storage.exists(id_card_thumbnail_name(name))]
+    workers = worker_count('PHOTO_IMPORT_WORKERS', workers)
+    if workers and len(missing) > 1:
+        with process_pool(workers) as executor:
+            built = list(executor.map(build_id_card_thumbnail, missing, chunksize=8))
+    else:
+        built = [build_id_card_thumbnail(name) for name in missing]
+    return len(list(filter(None, built)))
+
+
+def match_photo_name(path):
+    """(kind, id) for a ZIP member named by the student-<id>/teacher-<id> convention, else None.
+
+    The kind can also come from a students/ or teachers/ folder holding
+    files named just by id.
+    """
+    folder, filename = posixpath.split(path)
+    match = PHOTO_NAME.match(posixpath.splitext(filename)[0].strip())
+    if not match:
+        return None
+    kind = (match.group('kind') or '').lower()
+    if not kind:
+        folder_kind = posixpath.basename(folder).lower().rstrip('s')
+        kind = folder_kind if folder_kind in PHOTO_OWNERS else ''
+    return (kind, int(match.group('id'))) if kind else None
+
+
+@dataclass
+class PhotoReport:
+    dry_run: bool = False
+    attached: list = field(default_factory=list)    # [(filename, kind, person)]
+    unmatched: list = field(default_factory=list)   # [(filename, reason)]
+
+    def summary(self):
+        verb = 'would be attached' if self.dry_run else 'attached'
+        return f'{len(self.attached)} photos {verb}, {len(self.unmatched)} files not used'
+
+
+def _photo_members(archive, report):
+    """{(kind, id): ZipInfo} for members that follow the naming convention; the rest are reported"""
+    members = {}
+    for info in archive.infolist():
+        name = info.filename
+        basename = posixpath.basename(name)
+        if info.is_dir() or name.startswith('__MACOSX/') or basename.startswith('.'):
+            continue
+        if posixpath.splitext(basename)[1].lower() not in PHOTO_EXTENSIONS:
+            report.unmatched.append((name, 'not an image file'))
+        elif info.file_size > MAX_PHOTO_BYTES:
+            report.unmatched.append((name, 'larger than 20 MB'))
+        elif (key := match_photo_name(name)) is None:
+            report.unmatched.append((name, 'name is not student-<id> or teacher-<id>'))
+        elif key in members:
+            report.unmatched.append((name, f'another file is already used for {key[0]} #{key[1]}'))
+        else:
+            members[key] = info
+    return members
+
+
+def ingest_photo_zip(upload, dry_run=False, workers=None):
+    """Attach ID photos from a ZIP to the students and teachers its file names point at.
+
+    Names are matched against one query per kind, images are cropped and
+    resized by id_photo() in a process pool (at most 2 x workers in
+    flight) along with their card-sheet thumbnail, and each kind's rows
+    are updated with one bulk_update.
+    Replaced photo files are deleted once the update is committed.
+    """
+    report = PhotoReport(dry_run=dry_run)
+    with zipfile.ZipFile(upload) as archive:
+        members = _photo_members(archive, report)
+        people = {}
+        for kind, model in PHOTO_OWNERS.items():
+            ids = [person_id for member_kind, person_id in members if member_kind == kind]
+            people.update({(kind, person.pk): person for person in model.objects.filter(pk__in=ids)})
+        for (kind, person_id), info in list(members.items()):
+            if (kind, person_id) not in people:
+                report.unmatched.append((info.filename, f'no {kind} #{person_id}'))
+                del members[(kind, person_id)]
+        if dry_run:
+            report.attached = [(info.filename, kind, people[(kind, pk)]) for (kind, pk), info in members.items()]
+            return report
+
+        workers = worker_count('PHOTO_IMPORT_WORKERS', workers)
+        executor = process_pool(workers) if workers else None
+        processed = []
+        try:
+            pending = []
+            for key, info in members.items():
+                data = archive.read(info)
+                pending.append((key, info, executor.submit(_id_photo_with_thumbnail, data) if executor else data))
+                if len(pending) >= max(workers, 1) * 2:
+                    processed.append(_finish_photo(*pending.pop(0), executor, report))
+            processed.extend(_finish_photo(*item, executor, report) for item in pending)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    replaced = []
+    with transaction.atomic():
+        for key, info, (photo, thumbnail) in filter(None, processed):
+            person = people[key]
+            if person.photo:
+                replaced.extend([person.photo.name, id_card_thumbnail_name(person.photo.name)])
+            person.photo.save(f'{key[0]}-{key[1]}.jpg', ContentFile(photo), save=False)
+            _replace_file(id_card_thumbnail_name(person.photo.name), thumbnail)
+            report.attached.append((info.filename, key[0], person))
+        for kind, model in PHOTO_OWNERS.items():
+            updated = [person for filename, person_kind, person in report.attached if person_kind == kind]
+            if updated:
+                model.objects.bulk_update(updated, ['photo'])
+        transaction.on_commit(lambda: _delete_files(replaced))
+        # bulk_update skips the Student signal that refreshes the public pages
+        invalidate_public_pages()
+    return report
+
+
+def _delete_files(names):
+    for name in names:
+        if default_storage.exists(name):
+            default_storage.delete(name)
+
+
+def _finish_photo(key, info, output, executor, report):
+    try:
+        photos = output.result() if executor else _id_photo_with_thumbnail(output)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        report.unmatched.append((info.filename, 'not a readable image'))
+        return None
+    return key, info, photos
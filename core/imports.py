@@ -0,0 +1,335 @@
+"""Bulk Student/Teacher import from CSV or XLSX uploads.
+
+Rows are read as a stream, validated with the same ModelForms the add
+pages use, and written in chunks with bulk_create. Password hashing, the
+slow part of adding a person, runs in a process pool while later rows are
+still being validated.
+"""
+import codecs
+import csv
+import posixpath
+import re
+import zipfile
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from xml.etree import ElementTree
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from .attendance import invalidate_daily_board
+from .counters import adjust_counters
+from .fees import refresh_balances
+from .forms import StudentForm, TeacherForm
+from .models import SchoolClass, Student, Subject, Teacher
+from .page_cache import invalidate_public_pages
+from .workers import process_pool, worker_count
+
+
+IMPORT_CHUNK_SIZE = 500
+
+IMPORT_KINDS = {
+    'student': {
+        'model': Student,
+        'form': StudentForm,
+        'class_field': 'student_class',
+        'date_field': 'admission_date',
+        'password_required': False,
+        'columns': [
+            'name', 'father_name', 'class', 'section', 'address', 'email', 'mobile', 'admission_date',
+            'monthly_fee', 'is_active', 'password',
+        ],
+    },
+    'teacher': {
+        'model': Teacher,
+        'form': TeacherForm,
+        'class_field': 'class_section',
+        'date_field': 'joining_date',
+        'password_required': True,
+        'columns': [
+            'name', 'father_name', 'email', 'mobile', 'address', 'aadhar_no', 'qualification', 'role',
+            'joining_date', 'subjects', 'class', 'section', 'monthly_salary', 'is_active', 'password',
+        ],
+    },
+}
+
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'inactive'}
+
+# What a malformed upload raises while its rows are being read
+UNREADABLE_FILE_ERRORS = (UnicodeDecodeError, csv.Error, zipfile.BadZipFile, KeyError, ElementTree.ParseError)
+
+
+# ===================== READERS =====================
+
+def _header(name):
+    return re.sub(r'\s+', '_', str(name or '').strip().lower())
+
+
+def read_csv_rows(upload):
+    """Yield {column: value} dicts from an uploaded CSV, decoded as it is read"""
+    lines = codecs.iterdecode(upload, 'utf-8-sig')
+    reader = csv.reader(lines)
+    header = [_header(name) for name in next(reader, [])]
+    for values in reader:
+        if any(value.strip() for value in values):
+            yield dict(zip(header, values))
+
+
+_SHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+
+def _column_index(reference):
+    index = 0
+    for letter in re.match(r'[A-Z]+', reference).group():
+        index = index * 26 + ord(letter) - 64
+    return index - 1
+
+
+def _first_sheet_path(archive):
+    workbook = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+    rel_id = workbook.find(f'{_SHEET_NS}sheets/{_SHEET_NS}sheet').get(f'{_REL_NS}id')
+    rels = ElementTree.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    target = next(rel.get('Target') for rel in rels.iter(f'{_PKG_REL_NS}Relationship') if rel.get('Id') == rel_id)
+    return target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+
+
+def read_xlsx_rows(upload):
+    """Yield {column: value} dicts from the first sheet of an uploaded XLSX.
+
+    The sheet XML is parsed incrementally, so memory stays flat however
+    many rows the workbook has. Every value comes back as text.
+    """
+    with zipfile.ZipFile(upload) as archive:
+        shared = []
+        if 'xl/sharedStrings.xml' in archive.namelist():
+            with archive.open('xl/sharedStrings.xml') as strings:
+                for _, element in ElementTree.iterparse(strings):
+                    if element.tag == f'{_SHEET_NS}si':
+                        shared.append(''.join(text.text or '' for text in element.iter(f'{_SHEET_NS}t')))
+                        element.clear()
+
+        header = None
+        with archive.open(_first_sheet_path(archive)) as sheet:
+            for _, element in ElementTree.iterparse(sheet):
+                if element.tag != f'{_SHEET_NS}row':
+                    continue
+                values = {}
+                position = 0
+                for cell in element.iter(f'{_SHEET_NS}c'):
+                    # Cell references are optional; without one a cell follows the previous cell
+                    position = _column_index(cell.get('r')) if cell.get('r') else position
+                    kind = cell.get('t')
+                    if kind == 'inlineStr':
+                        value = ''.join(text.text or '' for text in cell.iter(f'{_SHEET_NS}t'))
+                    else:
+                        raw = cell.findtext(f'{_SHEET_NS}v') or ''
+                        value = shared[int(raw)] if kind == 's' and raw else raw
+                    values[position] = value
+                    position += 1
+                element.clear()
+                row = [values.get(index, '') for index in range(max(values, default=-1) + 1)]
+                if header is None:
+                    header = [_header(name) for name in row]
+                elif any(str(value).strip() for value in row):
+                    yield dict(zip(header, row))
+
+
+def read_rows(upload):
+    """Pick the reader from the uploaded file's name"""
+    if upload.name.lower().endswith('.xlsx'):
+        return read_xlsx_rows(upload)
+    return read_csv_rows(upload)
+
+
+# ===================== VALIDATION =====================
+
+def _row_form(form_class, excluded):
+    """The admin form minus fields resolved from preloaded maps instead of a query per row"""
+    class RowForm(form_class):
+        class Meta(form_class.Meta):
+            fields = [name for name in form_class.Meta.fields if name not in excluded]
+
+        def validate_unique(self):
+            # Checked once per file against a preloaded set (see PeopleImport)
+            pass
+
+    return RowForm
+
+
+def _excel_date(value):
+    """Spreadsheet date serials (days since 1899-12-30) as ISO dates; other text unchanged"""
+    if re.fullmatch(r'\d+(\.0+)?', value):
+        return (date(1899, 12, 30) + timedelta(days=int(float(value)))).isoformat()
+    return value
+
+
+@dataclass
+class ImportReport:
+    kind: str
+    dry_run: bool = False
+    total: int = 0
+    created: int = 0
+    errors: list = field(default_factory=list)     # [(row number, [message])]
+
+    @property
+    def valid(self):
+        return self.total - len(self.errors)
+
+    def summary(self):
+        verb = 'would be created' if self.dry_run else 'created'
+        count = self.valid if self.dry_run else self.created
+        return f'{self.total} rows read: {count} {self.kind}s {verb}, {len(self.errors)} rows with errors'
+
+
+class PeopleImport:
+    """Validates import rows for one kind against maps loaded once per file"""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.spec = IMPORT_KINDS[kind]
+        self.form_class = _row_form(self.spec['form'], {self.spec['class_field'], 'subjects', 'photo'})
+        self.classes = {
+            (class_name.strip().lower(), section.strip().lower()): class_id
+            for class_id, class_name, section in SchoolClass.objects.values_list('id', 'class_name', 'section')
+        }
+        # Blank cells take the model default (role, fees, salary) rather than failing as required
+        model = self.spec['model']
+        self.defaults = {
+            name: str(model._meta.get_field(name).get_default())
+            for name in self.form_class._meta.fields
+            if model._meta.get_field(name).has_default() and name != 'is_active'
+        }
+        self.subjects = {}
+        self.emails = set()
+        if kind == 'teacher':
+            self.subjects = {
+                code.strip().lower(): subject_id
+                for subject_id, code in Subject.objects.values_list('id', 'subject_code')
+            }
+            self.emails = {email.lower() for email in Teacher.objects.values_list('email', flat=True)}
+
+    def validate(self, row):
+        """(unsaved instance, raw password, subject ids, [error]) for one row"""
+        data = {key: str(value).strip() for key, value in row.items() if key}
+        errors = []
+        date_field = self.spec['date_field']
+        if data.get(date_field):
+            data[date_field] = _excel_date(data[date_field])
+        data['is_active'] = 'false' if data.get('is_active', '').lower() in FALSE_VALUES else 'true'
+        for name, default in self.defaults.items():
+            if not data.get(name):
+                data[name] = default
+
+        class_id = None
+        if data.get('class'):
+            class_id = self.classes.get((data['class'].lower(), data.get('section', '').lower()))
+            if class_id is None:
+                errors.append(f"class: no class {data['class']} - {data.get('section', '')}")
+
+        subject_ids = []
+        for code in filter(None, (code.strip().lower() for code in data.get('subjects', '').split(';'))):
+            if code in self.subjects:
+                subject_ids.append(self.subjects[code])
+            else:
+                errors.append(f'subjects: no subject with code {code}')
+
+        password = data.get('password', '')
+        if self.spec['password_required'] and not password:
+            errors.append('password: required')
+
+        form = self.form_class(data)
+        if not form.is_valid():
+            errors.extend(
+                f'{name}: {message}' if name != '__all__' else message
+                for name, messages in form.errors.items()
+                for message in messages
+            )
+        elif self.kind == 'teacher':
+            email = form.cleaned_data['email'].lower()
+            if email in self.emails:
+                errors.append(f'email: {email} is already used by another teacher')
+            self.emails.add(email)
+        if errors:
+            return None, None, None, errors
+
+        instance = form.save(commit=False)
+        setattr(instance, f"{self.spec['class_field']}_id", class_id)
+        return instance, password, subject_ids, []
+
+
+# ===================== WRITER =====================
+
+def import_people(kind, rows, dry_run=False, workers=None, chunk_size=IMPORT_CHUNK_SIZE):
+    """Validate and create Students or Teachers from row dicts; returns an ImportReport.
+
+    Invalid rows are skipped and reported by spreadsheet row number; valid
+    rows are written in chunks of chunk_size inside one transaction, so a
+    failure part way leaves nothing behind. With dry_run=True rows are
+    only validated.
+    """
+    importer = PeopleImport(kind)
+    model = importer.spec['model']
+    report = ImportReport(kind=kind, dry_run=dry_run)
+    workers = worker_count('PEOPLE_IMPORT_WORKERS', workers)
+    executor = None
+    if workers and not dry_run:
+        executor = process_pool(workers)
+    created = []
+
+    def write(chunk):
+        for instance, hashed, _ in chunk:
+            if hashed is not None:
+                instance.password = hashed if isinstance(hashed, str) else hashed.result()
+        instances = model.objects.bulk_create([instance for instance, _, _ in chunk])
+        links = [
+            Teacher.subjects.through(teacher_id=instance.pk, subject_id=subject_id)
+            for instance, (_, _, subject_ids) in zip(instances, chunk)
+            for subject_id in subject_ids
+        ]
+        if links:
+            Teacher.subjects.through.objects.bulk_create(links)
+        created.extend(instances)
+
+    try:
+        with transaction.atomic():
+            chunk = []
+            for number, row in enumerate(rows, start=2):     # row 1 is the header
+                report.total += 1
+                instance, password, subject_ids, errors = importer.validate(row)
+                if errors:
+                    report.errors.append((number, errors))
+                    continue
+                if dry_run:
+                    continue
+                hashed = None
+                if password:
+                    hashed = executor.submit(make_password, password) if executor else make_password(password)
+                chunk.append((instance, hashed, subject_ids))
+                if len(chunk) >= chunk_size:
+                    write(chunk)
+                    chunk = []
+            if chunk:
+                write(chunk)
+            if created:
+                _after_import(kind, created)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+    report.created = len(created)
+    return report
+
+
+def _after_import(kind, created):
+    # bulk_create skips the signals that keep counters, balances and caches current
+    active = sum(1 for instance in created if instance.is_active)
+    if kind == 'student':
+        adjust_counters({'total_students': active})
+        student_ids = [student.pk for student in created]
+        transaction.on_commit(lambda: refresh_balances(student_ids))
+        invalidate_public_pages()
+        invalidate_daily_board(timezone.localdate())
+    else:
+        adjust_counters({'total_teachers': active})
@@ -0,0 +1,247 @@
+"""Filtering and streaming export of the fee and salary payment ledgers"""
+import csv
+import re
+import zipfile
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.core.paginator import Paginator
+from django.db.models import Count, Sum
+from django.utils.dateparse import parse_date
+
+from .fees import month_filter
+from .models import ArchivedStudentPayment, ArchivedTeacherPayment, StudentPayment, TeacherPayment, parse_month
+from .streaming import ZipStream
+
+
+EXPORT_CHUNK_SIZE = 2000
+LEDGER_PAGE_SIZE = 50
+
+# ledger -> model and its archive table, the class relation used by the class filter and the export columns
+LEDGERS = {
+    'fees': {
+        'model': StudentPayment,
+        'archive': ArchivedStudentPayment,
+        'class_field': 'student__student_class',
+        'columns': [
+            ('Receipt', 'id'),
+            ('Student', 'student__name'),
+            ('Class', 'student__student_class__class_name'),
+            ('Section', 'student__student_class__section'),
+            ('Month', 'month'),
+            ('Year', 'year'),
+            ('Paid Amount', 'paid_amount'),
+            ('Due Amount', 'due_amount'),
+            ('Mode', 'payment_mode'),
+            ('Payment Date', 'payment_date'),
+            ('Status', 'status'),
+            ('Remarks', 'remarks'),
+        ],
+    },
+    'salaries': {
+        'model': TeacherPayment,
+        'archive': ArchivedTeacherPayment,
+        'class_field': 'teacher__class_section',
+        'columns': [
+            ('Slip', 'id'),
+            ('Teacher', 'teacher__name'),
+            ('Role', 'teacher__role'),
+            ('Month', 'month'),
+            ('Year', 'year'),
+            ('Paid Amount', 'paid_amount'),
+            ('Due Amount', 'due_amount'),
+            ('Mode', 'payment_mode'),
+            ('Payment Date', 'payment_date'),
+            ('Status', 'status'),
+            ('Remarks', 'remarks'),
+        ],
+    },
+}
+
+
+def filter_payments(ledger, params, archived=False):
+    """Apply the status/mode/month/year/class/date-range query parameters to a ledger.
+
+    Returns (queryset, filters) where filters holds the cleaned values
+    for re-filling the filter form. With archived=True the same filters
+    are applied to the ledger's archive table instead.
+    """
+    spec = LEDGERS[ledger]
+    payments = spec['archive' if archived else 'model'].objects.all()
+    filters = {}
+
+    for name in ('status', 'payment_mode'):
+        value = params.get(name)
+        if value:
+            payments = payments.filter(**{name: value})
+            filters[name] = value
+
+    month_number = parse_month(params.get('month'))
+    if month_number:
+        payments = payments.filter(month_filter(month_number))
+        filters['month'] = month_number
+
+    for name, lookup in (('year', 'year'), ('class', spec['class_field'] + '_id')):
+        try:
+            value = int(params.get(name) or '')
+        except ValueError:
+            continue
+        payments = payments.filter(**{lookup: value})
+        filters[name] = value
+
+    for name, lookup in (('date_from', 'payment_date__gte'), ('date_to', 'payment_date__lte')):
+        try:
+            value = parse_date(params.get(name) or '')
+        except ValueError:
+            value = None
+        if value:
+            payments = payments.filter(**{lookup: value})
+            filters[name] = value
+    return payments, filters
+
+
+def ledger_totals(payments):
+    """Count and paid/due sums per status, plus a grand total, from one GROUP BY query"""
+    by_status = {
+        row['status']: row
+        for row in payments.order_by().values('status').annotate(
+            count=Count('id'), paid=Sum('paid_amount'), due=Sum('due_amount')
+        )
+    }
+    total = {
+        'count': sum(row['count'] for row in by_status.values()),
+        'paid': sum((row['paid'] for row in by_status.values()), Decimal('0')),
+        'due': sum((row['due'] for row in by_status.values()), Decimal('0')),
+    }
+    return total, by_status
+
+
+def ledger_page(payments, page_number, total_count, page_size=LEDGER_PAGE_SIZE):
+    """One page of payments, newest first; the count comes from ledger_totals instead of a second COUNT"""
+    paginator = Paginator(payments.order_by('-payment_date', '-id'), page_size)
+    paginator.count = total_count
+    return paginator.get_page(page_number)
+
+
+def ledger_rows(ledger, payments, archived=None):
+    """Header plus a lazily fetched row iterator; rows are read in chunks, never all at once.
+
+    Rows from `archived` (the same filters applied to the archive table)
+    are merged in with a UNION ALL when given.
+    """
+    columns = LEDGERS[ledger]['columns']
+    header = [label for label, _ in columns]
+    fields = [field for _, field in columns]
+    rows = payments.order_by().values_list(*fields)
+    if archived is not None:
+        rows = rows.union(archived.order_by().values_list(*fields), all=True)
+    rows = rows.order_by('-payment_date', '-id')
+    return header, rows.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+# Text starting with these is run as a formula by spreadsheet apps; a leading ' keeps it text
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+# Control characters XML 1.0 does not allow; one in a remark makes the whole workbook unreadable
+XML_INVALID_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _csv_cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class _Echo:
+    """csv.writer target that hands each formatted line straight back"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(header, rows, batch_size=500):
+    """Yield CSV text a batch of rows at a time"""
+    writer = csv.writer(_Echo())
+    yield '\ufeff' + writer.writerow(header)   # BOM so Excel detects UTF-8
+    batch = []
+    for row in rows:
+        batch.append(writer.writerow([_csv_cell(value) for value in row]))
+        if len(batch) >= batch_size:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="{title}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_row(values):
+    cells = []
+    for value in values:
+        if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+            cells.append(f'<c><v>{value}</v></c>')
+        else:
+            text = escape(XML_INVALID_CHARS.sub('', '' if value is None else str(value)))
+            cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return '<row>' + ''.join(cells) + '</row>'
+
+
+def stream_xlsx(header, rows, title='Ledger', batch_size=500):
+    """Yield an .xlsx workbook with one sheet, written row by row.
+
+    The sheet uses inline strings, so no shared-string table has to be
+    held in memory, and the archive is written through the same
+    unseekable buffer as the report card ZIP export.
+    """
+    buffer = ZipStream()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS.items():
+            archive.writestr(name, content.replace('{title}', escape(title[:31])))
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_xlsx_row(header).encode())
+            batch = []
+            for row in rows:
+                batch.append(_xlsx_row(row))
+                if len(batch) >= batch_size:
+                    sheet.write(''.join(batch).encode())
+                    batch = []
+                    yield buffer.drain()
+            sheet.write(''.join(batch).encode())
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.academic_years import ArchiveError, academic_year, archive_academic_year
+
+
+class Command(BaseCommand):
+    help = "Move a closed academic year's settled results, attendance and payments into the archive tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--year', type=int, help='Start year of the session to archive, e.g. 2024 for 2024-25 (default last year)'
+        )
+
+    def handle(self, *args, **options):
+        start_year = options['year'] or academic_year() - 1
+        try:
+            report = archive_academic_year(start_year)
+        except ArchiveError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(report.summary()))
@@ -0,0 +1,29 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from core.images import generate_gallery_derivatives
+from core.models import GalleryImage
+
+
+class Command(BaseCommand):
+    help = 'Generate resized WebP/JPEG derivatives for existing gallery images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild images that already have derivatives')
+        parser.add_argument('--workers', type=int, default=4)
+
+    def handle(self, *args, **options):
+        images = GalleryImage.objects.all()
+        if not options['force']:
+            images = images.filter(derivatives={})
+        image_ids = list(images.values_list('id', flat=True))
+
+        if options['workers'] > 1:
+            with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+                results = list(executor.map(generate_gallery_derivatives, image_ids))
+        else:
+            results = [generate_gallery_derivatives(image_id) for image_id in image_ids]
+        built = [result for result in results if result]
+
+        self.stdout.write(self.style.SUCCESS(f'Built derivatives for {len(built)} of {len(image_ids)} images'))
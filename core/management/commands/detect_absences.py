@@ -0,0 +1,25 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.attendance import detect_absence_streaks
+
+
+class Command(BaseCommand):
+    help = 'Advance consecutive-absence streaks through yesterday and raise or resolve alerts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--as-of', help='Last day to evaluate, YYYY-MM-DD (default yesterday)')
+        parser.add_argument(
+            '--days', type=int, help='Consecutive absences that raise an alert (default ABSENCE_ALERT_DAYS)'
+        )
+
+    def handle(self, *args, **options):
+        as_of = None
+        if options['as_of']:
+            try:
+                as_of = date.fromisoformat(options['as_of'])
+            except ValueError:
+                raise CommandError('--as-of must be YYYY-MM-DD')
+        run = detect_absence_streaks(as_of, options['days'])
+        self.stdout.write(self.style.SUCCESS(run.summary()))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.fees import generate_fee_invoices
+from core.models import parse_month
+
+
+class Command(BaseCommand):
+    help = "Create the month's Pending fee rows for every active student (safe to re-run)"
+
+    def add_arguments(self, parser):
+        today = timezone.localdate()
+        parser.add_argument('--month', default=str(today.month), help='Month name, abbreviation or number')
+        parser.add_argument('--year', type=int, default=today.year)
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        month_number = parse_month(options['month'])
+        if not month_number:
+            raise CommandError(f"Unknown month: {options['month']}")
+        report = generate_fee_invoices(month_number, options['year'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(report.summary()))
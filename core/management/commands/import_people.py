@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.imports import IMPORT_KINDS, import_people, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Create students or teachers from a CSV or XLSX file, reporting rows that fail validation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(IMPORT_KINDS))
+        parser.add_argument('path', help='CSV or XLSX file with a header row')
+        parser.add_argument('--dry-run', action='store_true', help='Validate every row without writing anything')
+        parser.add_argument('--workers', type=int, help='Password hashing processes (default PEOPLE_IMPORT_WORKERS)')
+
+    def handle(self, *args, **options):
+        try:
+            upload = open(options['path'], 'rb')
+        except OSError as error:
+            raise CommandError(error)
+        with upload:
+            report = import_people(
+                options['kind'], read_rows(upload), dry_run=options['dry_run'], workers=options['workers']
+            )
+        for number, errors in report.errors:
+            self.stderr.write(f"Row {number}: {'; '.join(errors)}")
+        self.stdout.write(self.style.SUCCESS(report.summary()))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.images import ingest_photo_zip
+
+
+class Command(BaseCommand):
+    help = 'Attach ID photos from a ZIP of student-<id>/teacher-<id> images, cropped and resized for the ID card'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='ZIP file of photos')
+        parser.add_argument('--dry-run', action='store_true', help='Only match file names, without saving anything')
+        parser.add_argument('--workers', type=int, help='Image processes (default PHOTO_IMPORT_WORKERS)')
+
+    def handle(self, *args, **options):
+        try:
+            upload = open(options['path'], 'rb')
+        except OSError as error:
+            raise CommandError(error)
+        with upload:
+            report = ingest_photo_zip(upload, dry_run=options['dry_run'], workers=options['workers'])
+        for filename, reason in report.unmatched:
+            self.stderr.write(f'{filename}: {reason}')
+        self.stdout.write(self.style.SUCCESS(report.summary()))
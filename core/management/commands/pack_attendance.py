@@ -0,0 +1,51 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+
+from core.attendance_archive import pack_month, unpack_month
+from core.models import StudentAttendance, StudentAttendanceMonth
+
+
+class Command(BaseCommand):
+    help = 'Pack student attendance history into one row per student per month (or --unpack it again)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help='Pack months before YYYY-MM (default and latest: the current month)')
+        parser.add_argument('--unpack', action='store_true', help='Move packed months back into daily rows')
+
+    def handle(self, *args, **options):
+        today = date.today()
+        before = (today.year, today.month)
+        if options['before']:
+            try:
+                year, month = (int(part) for part in options['before'].split('-'))
+                date(year, month, 1)
+            except ValueError:
+                raise CommandError('--before must be YYYY-MM')
+            if (year, month) > before:
+                raise CommandError('The current month is still being marked and cannot be packed')
+            before = (year, month)
+
+        if options['unpack']:
+            months = StudentAttendanceMonth.objects.values_list('year', 'month').distinct().order_by('year', 'month')
+            total = 0
+            for year, month in months:
+                total += unpack_month(year, month)
+            self.stdout.write(self.style.SUCCESS(f'Unpacked {len(months)} months into {total} attendance rows'))
+            return
+
+        span = StudentAttendance.objects.aggregate(first=Min('date'), last=Max('date'))
+        if span['first'] is None:
+            self.stdout.write('No attendance rows to pack')
+            return
+        year, month = span['first'].year, span['first'].month
+        packed_rows = written = 0
+        while (year, month) < before and (year, month) <= (span['last'].year, span['last'].month):
+            rows, packed = pack_month(year, month)
+            if rows:
+                self.stdout.write(f'{year}-{month:02d}: {rows} rows -> {packed} packed rows')
+            packed_rows += rows
+            written += packed
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        self.stdout.write(self.style.SUCCESS(f'Packed {packed_rows} attendance rows into {written} monthly rows'))
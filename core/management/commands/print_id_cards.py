@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.documents import id_card_students, stream_id_card_sheets
+from core.images import build_missing_id_card_thumbnails
+from core.models import SchoolClass
+
+
+class Command(BaseCommand):
+    help = 'Write printable A4 sheets of student ID cards for a class or the whole school to an HTML file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='HTML file to write')
+        parser.add_argument('--class', dest='class_id', type=int, help='Only this class (default every active student)')
+        parser.add_argument(
+            '--workers', type=int, help='Processes for missing photo thumbnails (default PHOTO_IMPORT_WORKERS)'
+        )
+
+    def handle(self, *args, **options):
+        title = 'ID Cards - All Students'
+        if options['class_id']:
+            school_class = SchoolClass.objects.filter(pk=options['class_id']).first()
+            if school_class is None:
+                raise CommandError(f"No class #{options['class_id']}")
+            title = f'ID Cards - {school_class}'
+        students = list(id_card_students(options['class_id']))
+        count = len(students)
+        build_missing_id_card_thumbnails(
+            [student.photo.name for student in students if student.photo], options['workers']
+        )
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            for chunk in stream_id_card_sheets(students, title):
+                output.write(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} ID cards to {options['output']}"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.results import rebuild_exam_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recompute every ExamSummary row from verified results'
+
+    def handle(self, *args, **options):
+        count = rebuild_exam_summaries()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} exam summaries'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from core.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute the admin dashboard counters from the source tables and repair any drift'
+
+    def handle(self, *args, **options):
+        drift = reconcile_counters()
+        for name, (stored, actual) in drift.items():
+            self.stdout.write(f'{name}: {stored} -> {actual}')
+        self.stdout.write(self.style.SUCCESS(f'Counters reconciled ({len(drift)} corrected)'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.attendance import rebuild_attendance_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recount every student\'s monthly attendance summary from the attendance records'
+
+    def handle(self, *args, **options):
+        count = rebuild_attendance_summaries()
+        self.stdout.write(self.style.SUCCESS(f'Refreshed {count} monthly attendance summaries'))
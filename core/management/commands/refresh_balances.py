@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.fees import refresh_balances
+
+
+class Command(BaseCommand):
+    help = 'Recompute every active student\'s outstanding fee balance'
+
+    def handle(self, *args, **options):
+        count = refresh_balances()
+        self.stdout.write(self.style.SUCCESS(f'Refreshed {count} student balances'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.models import parse_month
+from core.payroll import run_payroll
+
+
+class Command(BaseCommand):
+    help = "Create the month's Pending salary rows from teacher attendance (safe to re-run)"
+
+    def add_arguments(self, parser):
+        today = timezone.localdate()
+        parser.add_argument('--month', default=str(today.month), help='Month name, abbreviation or number')
+        parser.add_argument('--year', type=int, default=today.year)
+        parser.add_argument('--dry-run', action='store_true', help='Print the payroll without writing it')
+
+    def handle(self, *args, **options):
+        month_number = parse_month(options['month'])
+        if not month_number:
+            raise CommandError(f"Unknown month: {options['month']}")
+        report = run_payroll(month_number, options['year'], dry_run=options['dry_run'])
+        if options['dry_run']:
+            for line in report.lines:
+                self.stdout.write(f'{line.name}: {line.deducted_days} days deducted, payable {line.payable}')
+        self.stdout.write(self.style.SUCCESS(report.summary()))
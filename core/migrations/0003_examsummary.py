@@ -0,0 +1,73 @@
+# Generated by Django 4.2.29 on 2026-10-18 03:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+from decimal import Decimal
+
+
+# The grade ladder as it stood when this migration was written; frozen so later changes don't alter the backfill
+GRADE_LADDER = [(90, 'A+'), (80, 'A'), (70, 'B+'), (60, 'B'), (50, 'C'), (40, 'D')]
+
+
+def grade_for_percentage(percentage):
+    return next((grade for floor, grade in GRADE_LADDER if percentage >= floor), 'F')
+
+
+def build_exam_summaries(apps, schema_editor):
+    Result = apps.get_model('core', 'Result')
+    ExamSummary = apps.get_model('core', 'ExamSummary')
+    totals = Result.objects.filter(verification_status='Verified').values('student_id', 'exam_name').annotate(
+        obtained=models.Sum('marks_obtained'),
+        total=models.Sum('total_marks'),
+        subjects=models.Count('id'),
+        exam_date=models.Max('exam_date'),
+    ).order_by()
+    summaries = []
+    for row in totals:
+        total = row['total'] or Decimal('0')
+        percentage = (row['obtained'] / total * 100).quantize(Decimal('0.01')) if total > 0 else Decimal('0')
+        summaries.append(ExamSummary(
+            student_id=row['student_id'],
+            exam_name=row['exam_name'],
+            total_marks_obtained=row['obtained'],
+            total_marks=total,
+            percentage=percentage,
+            grade=grade_for_percentage(percentage),
+            result_status='PASS' if percentage >= 40 else 'FAIL',
+            total_subjects=row['subjects'],
+            exam_date=row['exam_date'],
+        ))
+    ExamSummary.objects.bulk_create(summaries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_galleryimage_schoolinfo_result'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExamSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('exam_name', models.CharField(max_length=100)),
+                ('total_marks_obtained', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('total_marks', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('percentage', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('grade', models.CharField(blank=True, choices=[('A+', 'A+ (90-100%)'), ('A', 'A (80-89%)'), ('B+', 'B+ (70-79%)'), ('B', 'B (60-69%)'), ('C', 'C (50-59%)'), ('D', 'D (40-49%)'), ('F', 'F (Below 40%)')], max_length=2)),
+                ('result_status', models.CharField(default='FAIL', max_length=4)),
+                ('total_subjects', models.IntegerField(default=0)),
+                ('exam_date', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exam_summaries', to='core.student')),
+            ],
+            options={
+                'verbose_name': 'Exam Summary',
+                'verbose_name_plural': 'Exam Summaries',
+                'ordering': ['-exam_date', 'exam_name'],
+                'unique_together': {('student', 'exam_name')},
+            },
+        ),
+        migrations.RunPython(build_exam_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.29 on 2026-10-18 03:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_examsummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='result',
+            index=models.Index(fields=['verification_status', '-exam_date'], name='result_status_date_idx'),
+        ),
+    ]
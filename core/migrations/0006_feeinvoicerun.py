@@ -0,0 +1,31 @@
+# Generated by Django 4.2.29 on 2026-10-18 03:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_galleryimage_derivatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeeInvoiceRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.CharField(max_length=20)),
+                ('year', models.IntegerField()),
+                ('status', models.CharField(choices=[('Running', 'Running'), ('Completed', 'Completed')], default='Running', max_length=10)),
+                ('last_student_id', models.BigIntegerField(default=0, help_text='Resume point if the run is interrupted')),
+                ('created_count', models.IntegerField(default=0)),
+                ('skipped_count', models.IntegerField(default=0)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-year', '-started_at'],
+                'unique_together': {('month', 'year')},
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.29 on 2026-10-18 03:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_feeinvoicerun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('months_billed', models.IntegerField(default=0)),
+                ('total_billed', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_paid', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('outstanding', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('months_owed', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('as_of', models.DateField(help_text='Month the billing was computed through')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='balance', to='core.student')),
+            ],
+            options={
+                'ordering': ['-outstanding'],
+                'indexes': [models.Index(fields=['months_owed'], name='balance_months_owed_idx')],
+            },
+        ),
+    ]
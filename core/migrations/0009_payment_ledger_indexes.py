@@ -0,0 +1,45 @@
+# Generated by Django 4.2.29 on 2026-10-18 03:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_dashboardcounter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='studentpayment',
+            index=models.Index(fields=['-payment_date', '-id'], name='fee_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentpayment',
+            index=models.Index(fields=['status', '-payment_date'], name='fee_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentpayment',
+            index=models.Index(fields=['year', 'month', 'status'], name='fee_period_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentpayment',
+            index=models.Index(fields=['payment_mode', '-payment_date'], name='fee_mode_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teacherpayment',
+            index=models.Index(fields=['-payment_date', '-id'], name='salary_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teacherpayment',
+            index=models.Index(fields=['status', '-payment_date'], name='salary_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teacherpayment',
+            index=models.Index(fields=['year', 'month', 'status'], name='salary_period_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teacherpayment',
+            index=models.Index(fields=['payment_mode', '-payment_date'], name='salary_mode_date_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.29 on 2026-10-18 03:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_payment_ledger_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.CharField(max_length=20)),
+                ('year', models.IntegerField()),
+                ('teacher_count', models.IntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('deductions', models.JSONField(default=dict, help_text='Days deducted per attendance status')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-year', '-created_at'],
+                'unique_together': {('month', 'year')},
+            },
+        ),
+    ]
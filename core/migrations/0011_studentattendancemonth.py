@@ -0,0 +1,29 @@
+# Generated by Django 4.2.29 on 2026-10-18 03:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_payrollrun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentAttendanceMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('marked', models.IntegerField(default=0)),
+                ('statuses', models.BigIntegerField(default=0)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_months', to='core.student')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['year', 'month'], name='attendance_month_idx')],
+                'unique_together': {('student', 'year', 'month')},
+            },
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 4.2.29 on 2026-10-18 03:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# The packed status codes and summary fields as they stood when this migration was written; frozen so later
+# changes don't alter the backfill
+STATUS_BY_CODE = ['Present', 'Absent', 'Leave', 'Half Day']
+STATUS_FIELDS = {'Present': 'present', 'Absent': 'absent', 'Leave': 'leave', 'Half Day': 'half_day'}
+
+
+def build_attendance_summaries(apps, schema_editor):
+    StudentAttendance = apps.get_model('core', 'StudentAttendance')
+    StudentAttendanceMonth = apps.get_model('core', 'StudentAttendanceMonth')
+    StudentAttendanceSummary = apps.get_model('core', 'StudentAttendanceSummary')
+    counts = {}
+
+    def add(key, status, days):
+        counts.setdefault(key, dict.fromkeys(STATUS_FIELDS.values(), 0))[STATUS_FIELDS[status]] += days
+
+    rows = StudentAttendance.objects.values('student_id', 'date__year', 'date__month', 'status').annotate(
+        days=models.Count('id')
+    ).order_by()
+    for row in rows:
+        add((row['student_id'], row['date__year'], row['date__month']), row['status'], row['days'])
+    for student_id, year, month, marked, statuses in StudentAttendanceMonth.objects.values_list(
+        'student_id', 'year', 'month', 'marked', 'statuses'
+    ).iterator():
+        day = 0
+        while marked >> day:
+            if marked >> day & 1:
+                add((student_id, year, month), STATUS_BY_CODE[statuses >> 2 * day & 0b11], 1)
+            day += 1
+    StudentAttendanceSummary.objects.bulk_create(
+        [
+            StudentAttendanceSummary(student_id=student_id, year=year, month=month, **student_counts)
+            for (student_id, year, month), student_counts in counts.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_studentattendancemonth'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentAttendanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('present', models.IntegerField(default=0)),
+                ('absent', models.IntegerField(default=0)),
+                ('leave', models.IntegerField(default=0)),
+                ('half_day', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_summaries', to='core.student')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['year', 'month'], name='attendance_summary_month_idx')],
+                'unique_together': {('student', 'year', 'month')},
+            },
+        ),
+        migrations.RunPython(build_attendance_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.29 on 2026-10-18 03:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_studentattendancesummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Holiday',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('name', models.CharField(max_length=100)),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AbsenceStreak',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('through_date', models.DateField(blank=True, help_text='Last school day evaluated; empty re-evaluates the term', null=True)),
+                ('current', models.IntegerField(default=0)),
+                ('started_on', models.DateField(blank=True, null=True)),
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='absence_streak', to='core.student')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AbsenceAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_on', models.DateField()),
+                ('last_absent_on', models.DateField()),
+                ('days', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('resolved_on', models.DateField(blank=True, null=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='absence_alerts', to='core.student')),
+            ],
+            options={
+                'ordering': ['-days', 'started_on'],
+                'indexes': [models.Index(fields=['resolved_on'], name='absence_alert_open_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.29 on 2026-10-18 04:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_absence_streaks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PromotionBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(help_text='e.g. Session 2026-2027', max_length=50)),
+                ('status', models.CharField(choices=[('Applied', 'Applied'), ('Rolled Back', 'Rolled Back')], default='Applied', max_length=20)),
+                ('mapping', models.JSONField(default=dict, help_text='{from class id: to class id, or "graduate"}')),
+                ('promoted', models.IntegerField(default=0)),
+                ('graduated', models.IntegerField(default=0)),
+                ('held_back', models.IntegerField(default=0)),
+                ('applied_at', models.DateTimeField(auto_now_add=True)),
+                ('rolled_back_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-applied_at', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PromotionRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('outcome', models.CharField(choices=[('Promoted', 'Promoted'), ('Graduated', 'Graduated'), ('Held Back', 'Held Back')], max_length=20)),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='records', to='core.promotionbatch')),
+                ('from_class', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.schoolclass')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='promotion_records', to='core.student')),
+                ('to_class', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.schoolclass')),
+            ],
+            options={
+                'unique_together': {('batch', 'student')},
+            },
+        ),
+    ]
@@ -0,0 +1,108 @@
+# Generated by Django 4.2.29 on 2026-10-18 04:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_class_promotions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AcademicYear',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_year', models.IntegerField(help_text='2025 for the 2025-26 session', unique=True)),
+                ('archived_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_rows', models.JSONField(default=dict, help_text='{table: rows moved}')),
+            ],
+            options={
+                'ordering': ['-start_year'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedTeacherPayment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payment_mode', models.CharField(choices=[('Cash', 'Cash'), ('Bank Transfer', 'Bank Transfer'), ('UPI', 'UPI'), ('Cheque', 'Cheque')], max_length=20)),
+                ('paid_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('due_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('payment_date', models.DateField()),
+                ('status', models.CharField(choices=[('Paid', 'Paid'), ('Pending', 'Pending'), ('Partial', 'Partial')], max_length=10)),
+                ('month', models.CharField(max_length=20)),
+                ('year', models.IntegerField()),
+                ('remarks', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField()),
+                ('academic_year', models.IntegerField()),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_payments', to='core.teacher')),
+            ],
+            options={
+                'ordering': ['-payment_date'],
+                'indexes': [models.Index(fields=['academic_year'], name='archived_salary_year_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedTeacherAttendance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('Present', 'Present'), ('Absent', 'Absent'), ('Leave', 'Leave'), ('Half Day', 'Half Day')], max_length=10)),
+                ('academic_year', models.IntegerField()),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_attendance', to='core.teacher')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['academic_year'], name='archived_tattendance_year_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedStudentPayment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payment_mode', models.CharField(choices=[('Cash', 'Cash'), ('Bank Transfer', 'Bank Transfer'), ('UPI', 'UPI'), ('Cheque', 'Cheque')], max_length=20)),
+                ('paid_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('due_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('payment_date', models.DateField()),
+                ('status', models.CharField(choices=[('Paid', 'Paid'), ('Pending', 'Pending'), ('Partial', 'Partial')], max_length=10)),
+                ('month', models.CharField(max_length=20)),
+                ('year', models.IntegerField()),
+                ('remarks', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField()),
+                ('academic_year', models.IntegerField()),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_payments', to='core.student')),
+            ],
+            options={
+                'ordering': ['-payment_date'],
+                'indexes': [models.Index(fields=['academic_year'], name='archived_fee_year_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('exam_name', models.CharField(max_length=100)),
+                ('marks_obtained', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('total_marks', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('percentage', models.DecimalField(blank=True, decimal_places=2, max_digits=5)),
+                ('grade', models.CharField(blank=True, choices=[('A+', 'A+ (90-100%)'), ('A', 'A (80-89%)'), ('B+', 'B+ (70-79%)'), ('B', 'B (60-69%)'), ('C', 'C (50-59%)'), ('D', 'D (40-49%)'), ('F', 'F (Below 40%)')], max_length=2)),
+                ('submission_date', models.DateTimeField()),
+                ('verification_status', models.CharField(choices=[('Pending', 'Pending Verification'), ('Verified', 'Verified'), ('Rejected', 'Rejected')], max_length=10)),
+                ('verification_date', models.DateTimeField(blank=True, null=True)),
+                ('verification_remarks', models.TextField(blank=True)),
+                ('exam_date', models.DateField()),
+                ('remarks', models.TextField(blank=True)),
+                ('academic_year', models.IntegerField()),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_results', to='core.student')),
+                ('subject', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.subject')),
+                ('submitted_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.teacher')),
+                ('verified_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.admin')),
+            ],
+            options={
+                'ordering': ['-submission_date'],
+                'indexes': [models.Index(fields=['academic_year'], name='archived_result_year_idx'), models.Index(fields=['student', 'exam_name'], name='archived_result_exam_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.29 on 2026-10-18 04:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_academic_year_archive'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='schoolinfo',
+            name='address',
+            field=models.TextField(default='Barahiya, Near Hanuman Temple'),
+        ),
+    ]
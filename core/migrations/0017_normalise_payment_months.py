@@ -0,0 +1,39 @@
+# Generated by Django 4.2.29 on 2026-10-18 05:02
+
+from django.db import migrations
+
+
+# Month spellings as they stood when this migration was written; frozen so later changes don't alter the backfill
+MONTH_NAMES = [
+    'January', 'February', 'March', 'April', 'May', 'June',
+    'July', 'August', 'September', 'October', 'November', 'December',
+]
+PAYMENT_MODELS = ['StudentPayment', 'TeacherPayment', 'ArchivedStudentPayment', 'ArchivedTeacherPayment']
+
+
+def full_month_name(value):
+    value = str(value or '').strip().lower()
+    if value.isdigit():
+        number = int(value)
+        return MONTH_NAMES[number - 1] if 1 <= number <= 12 else None
+    return next((name for name in MONTH_NAMES if value in (name.lower(), name[:3].lower())), None)
+
+
+def normalise_payment_months(apps, schema_editor):
+    for model_name in PAYMENT_MODELS:
+        model = apps.get_model('core', model_name)
+        for month in model.objects.exclude(month__in=MONTH_NAMES).values_list('month', flat=True).distinct():
+            name = full_month_name(month)
+            if name:
+                model.objects.filter(month=month).update(month=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_alter_schoolinfo_address'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalise_payment_months, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.29 on 2026-10-18 06:40
+
+from django.db import migrations
+
+
+def build_id_card_thumbnails(apps, schema_editor):
+    # Thumbnails are derived files, rebuilt from the photo by the current resizing code like any later upload
+    from core.images import build_missing_id_card_thumbnails
+
+    Student = apps.get_model('core', 'Student')
+    build_missing_id_card_thumbnails(
+        Student.objects.exclude(photo='').exclude(photo__isnull=True).values_list('photo', flat=True)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_cache_table'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_id_card_thumbnails, migrations.RunPython.noop),
+    ]
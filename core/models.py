@@ -1,7 +1,32 @@
+import calendar
+from decimal import Decimal
+
+from django.core.files.storage import default_storage
 from django.db import models
 from django.contrib.auth.hashers import make_password, check_password
 
 
+MONTH_NAMES = list(calendar.month_name)[1:]
+
+
+def parse_month(value):
+    """Month number (1-12) from 'February', 'feb', '2' or '02'; None if unrecognised"""
+    value = str(value or '').strip().lower()
+    if value.isdigit():
+        number = int(value)
+        return number if 1 <= number <= 12 else None
+    for number, name in enumerate(MONTH_NAMES, start=1):
+        if name.lower() == value or name[:3].lower() == value:
+            return number
+    return None
+
+
+def normalise_month(value):
+    """The full month name for however a payment month was typed in; unrecognised text is kept"""
+    number = parse_month(value)
+    return MONTH_NAMES[number - 1] if number else value
+
+
 class SchoolClass(models.Model):
     """Class model for organizing students by grade/class"""
     class_name = models.CharField(max_length=50)
@@ -129,11 +154,39 @@ class TeacherPayment(models.Model):
     
     class Meta:
         ordering = ['-payment_date']
+        indexes = [
+            models.Index(fields=['-payment_date', '-id'], name='salary_date_idx'),
+            models.Index(fields=['status', '-payment_date'], name='salary_status_date_idx'),
+            models.Index(fields=['year', 'month', 'status'], name='salary_period_idx'),
+            models.Index(fields=['payment_mode', '-payment_date'], name='salary_mode_date_idx'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        # One spelling per month, so the period index serves exact-match filters
+        self.month = normalise_month(self.month)
+        super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.teacher.name} - {self.month} {self.year}"
 
 
+class PayrollRun(models.Model):
+    """One month's generated salary rows (see core.payroll); its existence makes the run idempotent"""
+    month = models.CharField(max_length=20)
+    year = models.IntegerField()
+    teacher_count = models.IntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    deductions = models.JSONField(default=dict, help_text='Days deducted per attendance status')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['month', 'year']
+        ordering = ['-year', '-created_at']
+    
+    def __str__(self):
+        return f"Payroll {self.month} {self.year}"
+
+
 class StudentPayment(models.Model):
     """Student fee payment records"""
     PAYMENT_MODE_CHOICES = [
@@ -161,11 +214,77 @@ class StudentPayment(models.Model):
     
     class Meta:
         ordering = ['-payment_date']
+        indexes = [
+            models.Index(fields=['-payment_date', '-id'], name='fee_date_idx'),
+            models.Index(fields=['status', '-payment_date'], name='fee_status_date_idx'),
+            models.Index(fields=['year', 'month', 'status'], name='fee_period_idx'),
+            models.Index(fields=['payment_mode', '-payment_date'], name='fee_mode_date_idx'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        # One spelling per month, so the period index serves exact-match filters
+        self.month = normalise_month(self.month)
+        super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.student.name} - {self.month} {self.year}"
 
 
+class FeeInvoiceRun(models.Model):
+    """Bookkeeping for one month's generated Pending fee rows (see core.fees)"""
+    STATUS_CHOICES = [
+        ('Running', 'Running'),
+        ('Completed', 'Completed'),
+    ]
+    
+    month = models.CharField(max_length=20)
+    year = models.IntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Running')
+    last_student_id = models.BigIntegerField(default=0, help_text='Resume point if the run is interrupted')
+    created_count = models.IntegerField(default=0)
+    skipped_count = models.IntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        unique_together = ['month', 'year']
+        ordering = ['-year', '-started_at']
+    
+    def __str__(self):
+        return f"Fee invoices {self.month} {self.year} ({self.status})"
+
+
+class StudentBalance(models.Model):
+    """Denormalised fee balance per active student, maintained by core.fees"""
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, related_name='balance')
+    months_billed = models.IntegerField(default=0)
+    total_billed = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    outstanding = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    months_owed = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    as_of = models.DateField(help_text='Month the billing was computed through')
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-outstanding']
+        indexes = [
+            models.Index(fields=['months_owed'], name='balance_months_owed_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.student.name} - {self.outstanding}"
+
+
+class DashboardCounter(models.Model):
+    """Running total shown on the admin dashboard, maintained by core.counters"""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+
 class TeacherAttendance(models.Model):
     """Teacher attendance records"""
     STATUS_CHOICES = [
@@ -208,6 +327,142 @@ class StudentAttendance(models.Model):
         return f"{self.student.name} - {self.date}"
 
 
+class StudentAttendanceMonth(models.Model):
+    """A student's attendance for one month packed into bitmasks (see core.attendance_archive).
+
+    Bit d-1 of `marked` is set when day d was marked; bits 2(d-1)..2(d-1)+1
+    of `statuses` hold that day's status code. A (student, date) lives
+    either here or in StudentAttendance, never both.
+    """
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='attendance_months')
+    year = models.IntegerField()
+    month = models.IntegerField()
+    marked = models.IntegerField(default=0)
+    statuses = models.BigIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['student', 'year', 'month']
+        indexes = [
+            models.Index(fields=['year', 'month'], name='attendance_month_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.student.name} - {self.month}/{self.year}"
+
+
+class StudentAttendanceSummary(models.Model):
+    """Per-student monthly attendance counts, maintained by core.attendance on every marking"""
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='attendance_summaries')
+    year = models.IntegerField()
+    month = models.IntegerField()
+    present = models.IntegerField(default=0)
+    absent = models.IntegerField(default=0)
+    leave = models.IntegerField(default=0)
+    half_day = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['student', 'year', 'month']
+        indexes = [
+            models.Index(fields=['year', 'month'], name='attendance_summary_month_idx'),
+        ]
+    
+    @property
+    def marked(self):
+        return self.present + self.absent + self.leave + self.half_day
+    
+    def __str__(self):
+        return f"{self.student.name} - {self.month}/{self.year}"
+
+
+class Holiday(models.Model):
+    """A declared school holiday; attendance streaks skip these days like Sundays"""
+    date = models.DateField(unique=True)
+    name = models.CharField(max_length=100)
+    
+    class Meta:
+        ordering = ['date']
+    
+    def __str__(self):
+        return f"{self.name} - {self.date}"
+
+
+class AbsenceStreak(models.Model):
+    """Per-student consecutive-absence state, advanced by core.attendance.detect_absence_streaks"""
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, related_name='absence_streak')
+    through_date = models.DateField(
+        null=True, blank=True, help_text='Last school day evaluated; empty re-evaluates the term'
+    )
+    current = models.IntegerField(default=0)
+    started_on = models.DateField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.student.name} - {self.current} days"
+
+
+class AbsenceAlert(models.Model):
+    """A run of consecutive absences long enough to flag to the class teacher"""
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='absence_alerts')
+    started_on = models.DateField()
+    last_absent_on = models.DateField()
+    days = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    resolved_on = models.DateField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-days', 'started_on']
+        indexes = [
+            models.Index(fields=['resolved_on'], name='absence_alert_open_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.student.name} - {self.days} days from {self.started_on}"
+
+
+class PromotionBatch(models.Model):
+    """One year-end class promotion, applied and rolled back by core.promotions"""
+    STATUS_CHOICES = [
+        ('Applied', 'Applied'),
+        ('Rolled Back', 'Rolled Back'),
+    ]
+    
+    label = models.CharField(max_length=50, help_text='e.g. Session 2026-2027')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Applied')
+    mapping = models.JSONField(default=dict, help_text='{from class id: to class id, or "graduate"}')
+    promoted = models.IntegerField(default=0)
+    graduated = models.IntegerField(default=0)
+    held_back = models.IntegerField(default=0)
+    applied_at = models.DateTimeField(auto_now_add=True)
+    rolled_back_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-applied_at', '-id']
+    
+    def __str__(self):
+        return f"{self.label} ({self.status})"
+
+
+class PromotionRecord(models.Model):
+    """Where one student was before a promotion batch and what happened to them"""
+    OUTCOME_CHOICES = [
+        ('Promoted', 'Promoted'),
+        ('Graduated', 'Graduated'),
+        ('Held Back', 'Held Back'),
+    ]
+    
+    batch = models.ForeignKey(PromotionBatch, on_delete=models.CASCADE, related_name='records')
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='promotion_records')
+    from_class = models.ForeignKey(SchoolClass, on_delete=models.SET_NULL, null=True, related_name='+')
+    to_class = models.ForeignKey(SchoolClass, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    outcome = models.CharField(max_length=20, choices=OUTCOME_CHOICES)
+    
+    class Meta:
+        unique_together = ['batch', 'student']
+    
+    def __str__(self):
+        return f"{self.student.name} - {self.outcome}"
+
+
 class Notice(models.Model):
     """School notice/announcement model"""
     CATEGORY_CHOICES = [
@@ -321,16 +576,43 @@ class GalleryImage(models.Model):
     upload_date = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
     display_order = models.IntegerField(default=0)
+    # {format: {width: storage name}} of resized copies, filled in by core.images
+    derivatives = models.JSONField(default=dict, blank=True, editable=False)
     
     class Meta:
         ordering = ['display_order', '-upload_date']
         verbose_name = "Gallery Image"
         verbose_name_plural = "Gallery Images"
     
+    def srcset(self, fmt='jpeg'):
+        """`srcset` attribute value for one derivative format ('' until generated)"""
+        sizes = self.derivatives.get(fmt, {})
+        return ', '.join(
+            f'{default_storage.url(name)} {width}w'
+            for width, name in sorted(sizes.items(), key=lambda item: int(item[0]))
+        )
+    
     def __str__(self):
         return f"{self.title} - {self.category}"
 
 
+def grade_for_percentage(percentage):
+    """Map a percentage to the school's letter grade"""
+    if percentage >= 90:
+        return 'A+'
+    elif percentage >= 80:
+        return 'A'
+    elif percentage >= 70:
+        return 'B+'
+    elif percentage >= 60:
+        return 'B'
+    elif percentage >= 50:
+        return 'C'
+    elif percentage >= 40:
+        return 'D'
+    return 'F'
+
+
 class Result(models.Model):
     """Student exam results with teacher submission and admin verification"""
     VERIFICATION_STATUS_CHOICES = [
@@ -375,29 +657,166 @@ class Result(models.Model):
         ordering = ['-submission_date']
         verbose_name = "Result"
         verbose_name_plural = "Results"
+        indexes = [
+            models.Index(fields=['verification_status', '-exam_date'], name='result_status_date_idx'),
+        ]
     
-    def save(self, *args, **kwargs):
-        # Auto-calculate percentage
-        if self.marks_obtained and self.total_marks and self.total_marks > 0:
+    def calculate_grade(self):
+        """Fill percentage and grade from the marks (bulk_create skips save())"""
+        if self.marks_obtained is not None and self.total_marks and self.total_marks > 0:
             self.percentage = (self.marks_obtained / self.total_marks) * 100
-            
-            # Auto-assign grade based on percentage
-            if self.percentage >= 90:
-                self.grade = 'A+'
-            elif self.percentage >= 80:
-                self.grade = 'A'
-            elif self.percentage >= 70:
-                self.grade = 'B+'
-            elif self.percentage >= 60:
-                self.grade = 'B'
-            elif self.percentage >= 50:
-                self.grade = 'C'
-            elif self.percentage >= 40:
-                self.grade = 'D'
-            else:
-                self.grade = 'F'
-        
+            self.grade = grade_for_percentage(self.percentage)
+    
+    def save(self, *args, **kwargs):
+        # Auto-calculate percentage and grade
+        self.calculate_grade()
         super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.student.name} - {self.exam_name} - {self.subject}"
+
+
+class ExamSummary(models.Model):
+    """Per-student rollup of verified results for one exam, kept in step with verification"""
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='exam_summaries')
+    exam_name = models.CharField(max_length=100)
+    total_marks_obtained = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    total_marks = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    percentage = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    grade = models.CharField(max_length=2, choices=Result.GRADE_CHOICES, blank=True)
+    result_status = models.CharField(max_length=4, default='FAIL')
+    total_subjects = models.IntegerField(default=0)
+    exam_date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['student', 'exam_name']
+        ordering = ['-exam_date', 'exam_name']
+        verbose_name = "Exam Summary"
+        verbose_name_plural = "Exam Summaries"
+    
+    def calculate_totals(self):
+        """Derive percentage, grade and PASS/FAIL from the summed marks"""
+        if self.total_marks and self.total_marks > 0:
+            self.percentage = (Decimal(self.total_marks_obtained) / Decimal(self.total_marks) * 100).quantize(Decimal('0.01'))
+        else:
+            self.percentage = Decimal('0')
+        self.grade = grade_for_percentage(self.percentage)
+        self.result_status = 'PASS' if self.percentage >= 40 else 'FAIL'
+    
+    def __str__(self):
+        return f"{self.student.name} - {self.exam_name}"
+
+
+# ===================== ACADEMIC YEAR ARCHIVE =====================
+
+class AcademicYear(models.Model):
+    """An academic year whose closed records have been moved to the archive tables (see core.academic_years)"""
+    start_year = models.IntegerField(unique=True, help_text='2025 for the 2025-26 session')
+    archived_at = models.DateTimeField(null=True, blank=True)
+    archived_rows = models.JSONField(default=dict, help_text='{table: rows moved}')
+    
+    class Meta:
+        ordering = ['-start_year']
+    
+    @property
+    def label(self):
+        return f"{self.start_year}-{(self.start_year + 1) % 100:02d}"
+    
+    def __str__(self):
+        return self.label
+
+
+class ArchivedResult(models.Model):
+    """A Result from a closed academic year; same columns and id as the live row"""
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='archived_results')
+    exam_name = models.CharField(max_length=100)
+    subject = models.ForeignKey(Subject, on_delete=models.SET_NULL, null=True, related_name='+')
+    marks_obtained = models.DecimalField(max_digits=5, decimal_places=2)
+    total_marks = models.DecimalField(max_digits=5, decimal_places=2)
+    percentage = models.DecimalField(max_digits=5, decimal_places=2, blank=True)
+    grade = models.CharField(max_length=2, choices=Result.GRADE_CHOICES, blank=True)
+    submitted_by = models.ForeignKey(Teacher, on_delete=models.SET_NULL, null=True, related_name='+')
+    submission_date = models.DateTimeField()
+    verification_status = models.CharField(max_length=10, choices=Result.VERIFICATION_STATUS_CHOICES)
+    verified_by = models.ForeignKey(Admin, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    verification_date = models.DateTimeField(null=True, blank=True)
+    verification_remarks = models.TextField(blank=True)
+    exam_date = models.DateField()
+    remarks = models.TextField(blank=True)
+    academic_year = models.IntegerField()
+    
+    class Meta:
+        ordering = ['-submission_date']
+        indexes = [
+            models.Index(fields=['academic_year'], name='archived_result_year_idx'),
+            models.Index(fields=['student', 'exam_name'], name='archived_result_exam_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.student.name} - {self.exam_name} ({self.academic_year})"
+
+
+class ArchivedTeacherAttendance(models.Model):
+    """A TeacherAttendance row from a closed academic year"""
+    teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE, related_name='archived_attendance')
+    date = models.DateField()
+    status = models.CharField(max_length=10, choices=TeacherAttendance.STATUS_CHOICES)
+    academic_year = models.IntegerField()
+    
+    class Meta:
+        ordering = ['-date']
+        indexes = [
+            models.Index(fields=['academic_year'], name='archived_tattendance_year_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.teacher.name} - {self.date}"
+
+
+class ArchivedStudentPayment(models.Model):
+    """A settled StudentPayment from a closed academic year; same columns and id as the live row"""
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='archived_payments')
+    payment_mode = models.CharField(max_length=20, choices=StudentPayment.PAYMENT_MODE_CHOICES)
+    paid_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    due_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    payment_date = models.DateField()
+    status = models.CharField(max_length=10, choices=StudentPayment.STATUS_CHOICES)
+    month = models.CharField(max_length=20)
+    year = models.IntegerField()
+    remarks = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+    academic_year = models.IntegerField()
+    
+    class Meta:
+        ordering = ['-payment_date']
+        indexes = [
+            models.Index(fields=['academic_year'], name='archived_fee_year_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.student.name} - {self.month} {self.year}"
+
+
+class ArchivedTeacherPayment(models.Model):
+    """A settled TeacherPayment from a closed academic year; same columns and id as the live row"""
+    teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE, related_name='archived_payments')
+    payment_mode = models.CharField(max_length=20, choices=TeacherPayment.PAYMENT_MODE_CHOICES)
+    paid_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    due_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    payment_date = models.DateField()
+    status = models.CharField(max_length=10, choices=TeacherPayment.STATUS_CHOICES)
+    month = models.CharField(max_length=20)
+    year = models.IntegerField()
+    remarks = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+    academic_year = models.IntegerField()
+    
+    class Meta:
+        ordering = ['-payment_date']
+        indexes = [
+            models.Index(fields=['academic_year'], name='archived_salary_year_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.teacher.name} - {self.month} {self.year}"
@@ -0,0 +1,84 @@
+"""Response cache with conditional GET support for the public pages"""
+import hashlib
+import uuid
+from functools import wraps
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.http import urlencode
+from django.views.decorators.http import condition
+
+
+STATE_KEY = 'pagecache:state'
+PAGE_TIMEOUT = 60 * 60 * 24
+
+
+def _new_state():
+    return {'version': uuid.uuid4().hex, 'modified': timezone.now().replace(microsecond=0)}
+
+
+def _state():
+    state = cache.get(STATE_KEY)
+    if state is None:
+        state = _new_state()
+        cache.set(STATE_KEY, state, None)
+    return state
+
+
+def invalidate_public_pages():
+    """Start a new cache generation; every cached page and ETag becomes stale"""
+    cache.set(STATE_KEY, _new_state(), None)
+
+
+def _page_key(request):
+    """ETag for this URL in the current generation, computed once per request"""
+    if not hasattr(request, '_public_page_key'):
+        state = _state()
+        query = urlencode(sorted(request.GET.lists()), doseq=True)
+        raw = f"{state['version']}:{request.path}?{query}"
+        request._public_page_key = hashlib.md5(raw.encode()).hexdigest()
+        request._public_page_modified = state['modified']
+    return request._public_page_key
+
+
+def _last_modified(request, *args, **kwargs):
+    _page_key(request)
+    return request._public_page_modified
+
+
+def _etag(request, *args, **kwargs):
+    return _page_key(request)
+
+
+def public_page(view_func):
+    """Cache a public GET view per query string and answer conditional GETs with 304.
+
+    Pages are invalidated as a whole through invalidate_public_pages(),
+    which the model signals call whenever their source data changes.
+    """
+    @wraps(view_func)
+    def cached_view(request, *args, **kwargs):
+        key = f'pagecache:page:{_page_key(request)}'
+        cached = cache.get(key)
+        if cached is not None:
+            status, content_type, content = cached
+            return HttpResponse(content, status=status, content_type=content_type)
+
+        response = view_func(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            cache.set(key, (response.status_code, response['Content-Type'], response.content), PAGE_TIMEOUT)
+        return response
+
+    conditional_view = condition(etag_func=_etag, last_modified_func=_last_modified)(cached_view)
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view_func(request, *args, **kwargs)
+        response = conditional_view(request, *args, **kwargs)
+        # Let browsers and proxies keep the page but revalidate it every time
+        patch_cache_control(response, public=True, no_cache=True)
+        return response
+    return wrapper
@@ -0,0 +1,163 @@
+"""Monthly payroll: Pending salary rows computed from teacher attendance"""
+import calendar
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .counters import adjust_counters, forget_recent_payments
+from .fees import month_filter
+from .models import MONTH_NAMES, PayrollRun, Teacher, TeacherAttendance, TeacherPayment
+
+
+DEDUCTIBLE_STATUSES = [status for status, _ in TeacherAttendance.STATUS_CHOICES if status != 'Present']
+
+
+def default_deductions():
+    """{attendance status: days of pay deducted per day} from settings"""
+    return {
+        status: Decimal(str(days))
+        for status, days in getattr(settings, 'PAYROLL_DEDUCTIONS', {'Absent': 1, 'Half Day': 0.5}).items()
+    }
+
+
+@dataclass
+class PayrollLine:
+    teacher_id: int
+    name: str
+    monthly_salary: Decimal
+    days_employed: int
+    attendance: dict            # non-Present status -> days
+    deducted_days: Decimal
+    payable: Decimal
+
+
+@dataclass
+class PayrollReport:
+    month: str
+    year: int
+    deductions: dict
+    lines: list = field(default_factory=list)
+    skipped: dict = field(default_factory=dict)   # reason -> count
+    created: int = 0
+    dry_run: bool = False
+    already_completed: bool = False
+
+    @property
+    def total(self):
+        return sum((line.payable for line in self.lines), Decimal('0'))
+
+    def skip(self, reason):
+        self.skipped[reason] = self.skipped.get(reason, 0) + 1
+
+    def summary(self):
+        if self.already_completed:
+            return f'Payroll for {self.month} {self.year} was already run'
+        verb = 'would be created' if self.dry_run else 'created'
+        skipped = ', '.join(f'{count} {reason}' for reason, count in self.skipped.items()) or 'none'
+        return (
+            f'{len(self.lines)} salary rows {verb} for {self.month} {self.year} '
+            f'totalling ₹{self.total}; skipped: {skipped}'
+        )
+
+
+def payroll_lines(month_number, year, deductions, report):
+    """Compute every active teacher's payable salary with one grouped attendance query.
+
+    Pay is pro-rated per calendar day: teachers who joined mid-month are
+    paid from their joining date, and each attendance day whose status
+    appears in `deductions` removes that many days of pay.
+    """
+    days_in_month = calendar.monthrange(year, month_number)[1]
+    month_start = date(year, month_number, 1)
+    month_end = date(year, month_number, days_in_month)
+    in_month = Q(attendance__date__range=(month_start, month_end))
+    already_paid = set(
+        TeacherPayment.objects.filter(month_filter(month_number), year=year).values_list('teacher_id', flat=True)
+    )
+    teachers = (
+        Teacher.objects.filter(is_active=True, joining_date__lte=month_end)
+        .annotate(**{
+            f'days_{index}': Count('attendance', filter=in_month & Q(attendance__status=status))
+            for index, status in enumerate(DEDUCTIBLE_STATUSES)
+        })
+        .order_by('name', 'id')
+    )
+
+    lines = []
+    for teacher in teachers:
+        if teacher.id in already_paid:
+            report.skip('already has a salary row')
+            continue
+        if not teacher.monthly_salary:
+            report.skip('no monthly salary')
+            continue
+        attendance = {status: getattr(teacher, f'days_{index}') for index, status in enumerate(DEDUCTIBLE_STATUSES)}
+        days_employed = (month_end - max(teacher.joining_date, month_start)).days + 1
+        deducted_days = sum(
+            (days * Decimal(deductions.get(status, 0)) for status, days in attendance.items()), Decimal('0')
+        )
+        paid_days = max(days_employed - deducted_days, Decimal('0'))
+        payable = (teacher.monthly_salary * paid_days / days_in_month).quantize(Decimal('0.01'), ROUND_HALF_UP)
+        lines.append(PayrollLine(
+            teacher_id=teacher.id,
+            name=teacher.name,
+            monthly_salary=teacher.monthly_salary,
+            days_employed=days_employed,
+            attendance=attendance,
+            deducted_days=deducted_days,
+            payable=payable,
+        ))
+    return lines
+
+
+def run_payroll(month_number, year, deductions=None, dry_run=False):
+    """Create the month's Pending TeacherPayment rows in one transaction.
+
+    A PayrollRun row is written alongside the payments, so running the
+    same month again does nothing; teachers who already have a salary row
+    for the month are left out. With dry_run=True nothing is written and
+    the report just previews the lines.
+    """
+    month = MONTH_NAMES[month_number - 1]
+    deductions = deductions if deductions is not None else default_deductions()
+    report = PayrollReport(month=month, year=year, deductions=deductions, dry_run=dry_run)
+    if PayrollRun.objects.filter(month=month, year=year).exists():
+        report.already_completed = True
+        return report
+
+    if dry_run:
+        report.lines = payroll_lines(month_number, year, deductions, report)
+        return report
+
+    with transaction.atomic():
+        run, created = PayrollRun.objects.get_or_create(month=month, year=year)
+        if not created:
+            report.already_completed = True
+            return report
+        report.lines = payroll_lines(month_number, year, deductions, report)
+        TeacherPayment.objects.bulk_create([
+            TeacherPayment(
+                teacher_id=line.teacher_id,
+                paid_amount=0,
+                due_amount=line.payable,
+                payment_date=date(year, month_number, 1),
+                status='Pending',
+                month=month,
+                year=year,
+                remarks=f'Payroll: {line.deducted_days} days deducted',
+            )
+            for line in report.lines
+        ])
+        report.created = len(report.lines)
+        run.teacher_count = report.created
+        run.total_amount = report.total
+        run.deductions = {status: str(days) for status, days in deductions.items()}
+        run.save(update_fields=['teacher_count', 'total_amount', 'deductions'])
+        # bulk_create skips the signals that keep the dashboard counters current
+        adjust_counters({'pending_salaries': report.created})
+        forget_recent_payments()
+    return report
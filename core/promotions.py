@@ -0,0 +1,235 @@
+"""Year-end class promotion as a few set-based UPDATEs, with a record to roll back from.
+
+A mapping says where each class's students go: another class, GRADUATE,
+or (when a class is left out) nowhere. Applying it writes one
+PromotionRecord per active student in the mapped classes, then moves
+everyone in a single UPDATE keyed on their current class, so chains such
+as 1 -> 2 -> 3 resolve against the classes students started in. The
+records keep the starting class, so the latest batch can be undone.
+"""
+import re
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, OuterRef, Subquery, Value, When
+from django.utils import timezone
+
+from .attendance import invalidate_daily_board
+from .counters import adjust_counters
+from .fees import refresh_balances
+from .models import PromotionBatch, PromotionRecord, SchoolClass, Student
+from .page_cache import invalidate_public_pages
+
+
+GRADUATE = 'graduate'
+
+PROMOTION_BATCH_SIZE = 1000
+
+
+class PromotionError(ValueError):
+    """Raised when a mapping or rollback request cannot be applied"""
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('; '.join(errors))
+
+
+def _class_number(school_class):
+    match = re.search(r'\d+', school_class.class_name)
+    return int(match.group()) if match else None
+
+
+def suggest_mapping(classes=None):
+    """Best-guess {class id: next class id or GRADUATE} from the numbers in class names.
+
+    "Class 4" - A goes to "Class 5" - A when that class exists; the highest
+    numbered classes graduate. Classes without a number, or without a next
+    class in the same section, are left out for the admin to map by hand.
+    """
+    classes = list(classes if classes is not None else SchoolClass.objects.all())
+    numbered = {}
+    for school_class in classes:
+        number = _class_number(school_class)
+        if number is not None:
+            numbered[(number, school_class.section.strip().lower())] = school_class.pk
+    highest = max((number for number, _ in numbered), default=None)
+
+    mapping = {}
+    for school_class in classes:
+        number = _class_number(school_class)
+        if number is None:
+            continue
+        target = numbered.get((number + 1, school_class.section.strip().lower()))
+        if target is not None:
+            mapping[school_class.pk] = target
+        elif number == highest:
+            mapping[school_class.pk] = GRADUATE
+    return mapping
+
+
+def read_mapping(data, classes, prefix='target_'):
+    """Collect {class id: target} from POSTed `target_<class id>` fields; blank means not promoted"""
+    class_ids = {school_class.pk for school_class in classes}
+    mapping = {}
+    errors = []
+    for class_id in sorted(class_ids):
+        target = data.get(f'{prefix}{class_id}', '')
+        if not target:
+            continue
+        if target == GRADUATE:
+            mapping[class_id] = GRADUATE
+        elif target.isdigit() and int(target) in class_ids and int(target) != class_id:
+            mapping[class_id] = int(target)
+        else:
+            errors.append(f'Invalid target "{target}" for class #{class_id}')
+    if errors:
+        raise PromotionError(errors)
+    return mapping
+
+
+@dataclass
+class PromotionPreviewRow:
+    school_class: SchoolClass
+    target: object              # SchoolClass, GRADUATE or None
+    students: int = 0
+    held_back: int = 0
+
+    @property
+    def moving(self):
+        return self.students - self.held_back
+
+
+@dataclass
+class PromotionPreview:
+    rows: list = field(default_factory=list)
+
+    @property
+    def promoted(self):
+        return sum(row.moving for row in self.rows if isinstance(row.target, SchoolClass))
+
+    @property
+    def graduated(self):
+        return sum(row.moving for row in self.rows if row.target == GRADUATE)
+
+    @property
+    def held_back(self):
+        return sum(row.held_back for row in self.rows)
+
+    def summary(self):
+        return f'{self.promoted} promoted, {self.graduated} graduated, {self.held_back} held back'
+
+
+def _mapped_students(mapping):
+    return Student.objects.filter(is_active=True, student_class_id__in=list(mapping))
+
+
+def preview_promotion(mapping, held_back=()):
+    """Per-class counts of who would move, graduate or stay, from one GROUP BY"""
+    held_back = list(held_back)
+    counts = _mapped_students(mapping).order_by().values('student_class_id').annotate(
+        total=Count('id'),
+        held=Count(Case(When(pk__in=held_back, then=1), output_field=IntegerField())),
+    )
+    counts = {row['student_class_id']: row for row in counts}
+    classes = SchoolClass.objects.in_bulk()
+    preview = PromotionPreview()
+    for school_class in sorted(classes.values(), key=lambda school_class: str(school_class)):
+        if school_class.pk not in mapping:
+            continue
+        target = mapping[school_class.pk]
+        row = counts.get(school_class.pk, {})
+        preview.rows.append(PromotionPreviewRow(
+            school_class=school_class,
+            target=GRADUATE if target == GRADUATE else classes.get(target),
+            students=row.get('total', 0),
+            held_back=row.get('held', 0),
+        ))
+    return preview
+
+
+def apply_promotion(mapping, held_back=(), label=''):
+    """Promote every active student in the mapped classes in one transaction; returns the PromotionBatch.
+
+    Students listed in held_back keep their class and are recorded as held
+    back. Graduates keep their final class and are marked inactive.
+    """
+    if not mapping:
+        raise PromotionError(['Map at least one class'])
+    held_back = set(held_back)
+    promote = {class_id: target for class_id, target in mapping.items() if target != GRADUATE}
+
+    with transaction.atomic():
+        batch = PromotionBatch.objects.create(
+            label=label or f'Promotion {timezone.localdate():%Y}',
+            mapping={str(class_id): target for class_id, target in mapping.items()},
+        )
+        records = []
+        for student_id, class_id in _mapped_students(mapping).values_list('id', 'student_class_id').iterator():
+            if student_id in held_back:
+                outcome, to_class = 'Held Back', class_id
+            elif mapping[class_id] == GRADUATE:
+                outcome, to_class = 'Graduated', None
+            else:
+                outcome, to_class = 'Promoted', mapping[class_id]
+            records.append(PromotionRecord(
+                batch=batch, student_id=student_id, from_class_id=class_id, to_class_id=to_class, outcome=outcome,
+            ))
+        PromotionRecord.objects.bulk_create(records, batch_size=PROMOTION_BATCH_SIZE)
+
+        # One UPDATE for every promoted student, keyed on the class they start in
+        promoted_ids = PromotionRecord.objects.filter(batch=batch, outcome='Promoted').values('student_id')
+        if promote:
+            batch.promoted = Student.objects.filter(pk__in=promoted_ids).update(student_class_id=Case(
+                *(When(student_class_id=class_id, then=Value(target)) for class_id, target in promote.items()),
+                output_field=IntegerField(),
+            ))
+        graduate_ids = list(
+            PromotionRecord.objects.filter(batch=batch, outcome='Graduated').values_list('student_id', flat=True)
+        )
+        batch.graduated = Student.objects.filter(pk__in=graduate_ids).update(is_active=False)
+        batch.held_back = sum(1 for record in records if record.outcome == 'Held Back')
+        batch.save(update_fields=['promoted', 'graduated', 'held_back'])
+
+        # update() skips the signals that keep counters and caches current
+        adjust_counters({'total_students': -batch.graduated})
+        if graduate_ids:
+            transaction.on_commit(lambda: refresh_balances(graduate_ids))
+        invalidate_public_pages()
+        invalidate_daily_board(timezone.localdate())
+    return batch
+
+
+def latest_batch():
+    """The most recent batch still applied, the only one that can be rolled back"""
+    return PromotionBatch.objects.filter(status='Applied').first()
+
+
+def rollback_promotion(batch):
+    """Put every student in the batch back in the class they started in and re-activate its graduates.
+
+    Only the latest applied batch can be rolled back, so later promotions
+    are never undone out of order.
+    """
+    with transaction.atomic():
+        batch = PromotionBatch.objects.select_for_update().get(pk=batch.pk)
+        latest = latest_batch()
+        if batch.status != 'Applied' or latest is None or latest.pk != batch.pk:
+            raise PromotionError(['Only the latest applied promotion can be rolled back'])
+
+        records = PromotionRecord.objects.filter(batch=batch)
+        from_class = records.filter(student=OuterRef('pk')).values('from_class_id')[:1]
+        Student.objects.filter(pk__in=records.filter(outcome='Promoted').values('student_id')).update(
+            student_class_id=Subquery(from_class)
+        )
+        graduate_ids = list(records.filter(outcome='Graduated').values_list('student_id', flat=True))
+        reactivated = Student.objects.filter(pk__in=graduate_ids, is_active=False).update(is_active=True)
+
+        batch.status = 'Rolled Back'
+        batch.rolled_back_at = timezone.now()
+        batch.save(update_fields=['status', 'rolled_back_at'])
+
+        adjust_counters({'total_students': reactivated})
+        if graduate_ids:
+            transaction.on_commit(lambda: refresh_balances(graduate_ids))
+        invalidate_public_pages()
+        invalidate_daily_board(timezone.localdate())
+    return batch
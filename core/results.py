@@ -0,0 +1,483 @@
+"""Batch result entry and processing helpers"""
+import base64
+import json
+import zipfile
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from itertools import groupby
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import Coalesce
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .models import ArchivedResult, ExamSummary, Result, Student, grade_for_percentage
+from .page_cache import invalidate_public_pages
+from .streaming import ZipStream
+from .workers import process_pool, worker_count
+
+
+class MarksGrid:
+    """A class x exam x subject marks matrix posted by a teacher.
+
+    Cells are named `marks_<student_id>_<subject_id>` and each subject column
+    carries its maximum in `total_<subject_id>`. Blank cells are left out.
+    """
+
+    def __init__(self, students, subjects, data=None):
+        self.students = list(students)
+        self.subjects = list(subjects)
+        self.data = data or {}
+        self.exam_name = (self.data.get('exam_name') or '').strip()
+        self.exam_date = self.data.get('exam_date') or ''
+        self.errors = {}        # {(student_id, subject_id): message}
+        self.form_errors = []   # problems that apply to the whole grid
+        self.results = []
+
+    def cell_name(self, student, subject):
+        return f'marks_{student.id}_{subject.id}'
+
+    def _parse_decimal(self, value):
+        try:
+            return Decimal(value)
+        except (InvalidOperation, TypeError):
+            return None
+
+    def is_valid(self, existing=()):
+        """Validate every cell at once; `existing` is a set of
+        (student_id, subject_id) already submitted for this exam."""
+        if not self.exam_name:
+            self.form_errors.append('Exam name is required')
+        try:
+            exam_date = date.fromisoformat(self.exam_date)
+        except ValueError:
+            exam_date = None
+            self.form_errors.append('A valid exam date is required')
+
+        totals = {}
+        for subject in self.subjects:
+            raw = self.data.get(f'total_{subject.id}')
+            if raw in (None, ''):
+                continue
+            total = self._parse_decimal(raw)
+            if total is None or total <= 0:
+                self.form_errors.append(f'Total marks for {subject.subject_name} must be a positive number')
+                continue
+            totals[subject.id] = total
+
+        for student in self.students:
+            for subject in self.subjects:
+                raw = (self.data.get(self.cell_name(student, subject)) or '').strip()
+                if not raw:
+                    continue
+                key = (student.id, subject.id)
+                marks = self._parse_decimal(raw)
+                if subject.id not in totals:
+                    self.errors[key] = 'Set total marks for this subject'
+                elif marks is None:
+                    self.errors[key] = 'Not a number'
+                elif marks < 0 or marks > totals[subject.id]:
+                    self.errors[key] = f'Must be between 0 and {totals[subject.id]}'
+                elif key in existing:
+                    self.errors[key] = 'Already submitted for this exam'
+                else:
+                    result = Result(
+                        student_id=student.id,
+                        subject_id=subject.id,
+                        exam_name=self.exam_name,
+                        marks_obtained=marks,
+                        total_marks=totals[subject.id],
+                        exam_date=exam_date,
+                        verification_status='Pending',
+                    )
+                    result.calculate_grade()
+                    self.results.append(result)
+
+        if not self.results and not self.errors and not self.form_errors:
+            self.form_errors.append('Enter marks in at least one cell')
+        return not (self.errors or self.form_errors)
+
+    def save(self, submitted_by):
+        """Persist all validated cells in a single INSERT"""
+        for result in self.results:
+            result.submitted_by = submitted_by
+        with transaction.atomic():
+            return Result.objects.bulk_create(self.results)
+
+    def columns(self):
+        """Subjects with their posted total marks"""
+        return [
+            {'subject': subject, 'name': f'total_{subject.id}',
+             'value': self.data.get(f'total_{subject.id}', '')}
+            for subject in self.subjects
+        ]
+
+    def rows(self):
+        """Template-friendly rows with each cell's posted value and error"""
+        return [
+            {
+                'student': student,
+                'cells': [
+                    {
+                        'name': self.cell_name(student, subject),
+                        'value': self.data.get(self.cell_name(student, subject), ''),
+                        'error': self.errors.get((student.id, subject.id)),
+                    }
+                    for subject in self.subjects
+                ],
+            }
+            for student in self.students
+        ]
+
+
+def submitted_cells(exam_name, student_ids, subject_ids):
+    """(student_id, subject_id) pairs that already have a live result for an exam"""
+    return set(
+        Result.objects.filter(
+            exam_name=exam_name,
+            student_id__in=student_ids,
+            subject_id__in=subject_ids,
+        ).exclude(verification_status='Rejected').values_list('student_id', 'subject_id')
+    )
+
+
+# ===================== EXAM SUMMARIES =====================
+
+SUMMARY_FIELDS = [
+    'total_marks_obtained', 'total_marks', 'percentage', 'grade',
+    'result_status', 'total_subjects', 'exam_date', 'updated_at',
+]
+
+
+def _summaries_from_totals(totals):
+    summaries = []
+    for row in totals:
+        summary = ExamSummary(
+            student_id=row['student_id'],
+            exam_name=row['exam_name'],
+            total_marks_obtained=row['obtained'] or 0,
+            total_marks=row['total'] or 0,
+            total_subjects=row['subjects'],
+            exam_date=row['exam_date'],
+        )
+        summary.calculate_totals()
+        summaries.append(summary)
+    return summaries
+
+
+def _verified_totals(**lookups):
+    """Verified marks per (student, exam), merged across live and archived results"""
+    totals = {}
+    for model in (Result, ArchivedResult):
+        rows = model.objects.filter(verification_status='Verified', **lookups).values(
+            'student_id', 'exam_name'
+        ).annotate(
+            obtained=Sum('marks_obtained'),
+            total=Sum('total_marks'),
+            subjects=Count('id'),
+            exam_date=Max('exam_date'),
+        ).order_by()
+        for row in rows.iterator():
+            key = (row['student_id'], row['exam_name'])
+            if key not in totals:
+                totals[key] = row
+                continue
+            merged = totals[key]
+            for name in ('obtained', 'total', 'subjects'):
+                merged[name] += row[name]
+            merged['exam_date'] = max(merged['exam_date'], row['exam_date'])
+    return totals.values()
+
+
+def refresh_exam_summaries(pairs):
+    """Re-aggregate the ExamSummary rows for the given (student_id, exam_name) pairs.
+
+    Only the touched students/exams are recomputed, in one grouped query,
+    and written back with a single upsert.
+    """
+    pairs = set(pairs)
+    if not pairs:
+        return
+    student_ids = {student_id for student_id, _ in pairs}
+    exam_names = {exam_name for _, exam_name in pairs}
+    totals = [
+        row for row in _verified_totals(student_id__in=student_ids, exam_name__in=exam_names)
+        if (row['student_id'], row['exam_name']) in pairs
+    ]
+    summaries = _summaries_from_totals(totals)
+    stale = pairs - {(s.student_id, s.exam_name) for s in summaries}
+    
+    with transaction.atomic():
+        if summaries:
+            ExamSummary.objects.bulk_create(
+                summaries,
+                update_conflicts=True,
+                unique_fields=['student', 'exam_name'],
+                update_fields=SUMMARY_FIELDS,
+            )
+        for student_id, exam_name in stale:
+            ExamSummary.objects.filter(student_id=student_id, exam_name=exam_name).delete()
+    # Upserts and queryset updates send no model signals
+    cache.delete(RESULT_PICKERS_CACHE_KEY)
+    invalidate_public_pages()
+
+
+def rebuild_exam_summaries(batch_size=1000):
+    """Drop and recompute every ExamSummary from verified results"""
+    with transaction.atomic():
+        ExamSummary.objects.all().delete()
+        summaries = _summaries_from_totals(_verified_totals())
+        ExamSummary.objects.bulk_create(summaries, batch_size=batch_size)
+    cache.delete(RESULT_PICKERS_CACHE_KEY)
+    invalidate_public_pages()
+    return len(summaries)
+
+
+# ===================== PUBLIC LISTING =====================
+
+RESULT_PICKERS_CACHE_KEY = 'results:pickers'
+RESULT_LIST_PAGE_SIZE = 50
+RESULT_LIST_FIELDS = [
+    'id', 'exam_name', 'marks_obtained', 'total_marks', 'percentage', 'grade', 'exam_date',
+    'student__name', 'student__student_class__class_name', 'student__student_class__section',
+    'subject__subject_name',
+]
+
+
+def result_pickers():
+    """Distinct exam names and students with verified results, cached until summaries change.
+
+    Only live results count: the listing and the class export read the
+    live table, so exams from archived years are left out of the pickers.
+    """
+    pickers = cache.get(RESULT_PICKERS_CACHE_KEY)
+    if pickers is None:
+        verified = Result.objects.filter(verification_status='Verified').order_by()
+        pickers = {
+            'exam_names': list(
+                verified.order_by('exam_name').values_list('exam_name', flat=True).distinct()
+            ),
+            'students': list(
+                Student.objects.filter(pk__in=verified.values('student_id')).order_by(
+                    'student_class__class_name', 'name'
+                ).values('id', 'name', 'student_class__class_name', 'student_class__section')
+            ),
+        }
+        cache.set(RESULT_PICKERS_CACHE_KEY, pickers, 60 * 10)
+    return pickers
+
+
+def encode_cursor(row):
+    key = [row['exam_date'].isoformat(), row['class_key'], row['student__name'], row['id']]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        exam_date, class_key, name, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return date.fromisoformat(exam_date), int(class_key), str(name), int(pk)
+    except (ValueError, TypeError):
+        return None
+
+
+def verified_results_page(class_id=None, exam_name=None, cursor=None, page_size=RESULT_LIST_PAGE_SIZE):
+    """One keyset page of verified results as plain dicts.
+
+    Rows are ordered by (exam_date desc, class, student name, id) and the
+    page after `cursor` is found with a seek predicate, so the cost of a
+    page does not depend on how deep into the listing it is.
+    Returns (rows, next_cursor).
+    """
+    results = Result.objects.filter(verification_status='Verified').annotate(
+        class_key=Coalesce('student__student_class_id', 0)
+    )
+    if class_id:
+        results = results.filter(student__student_class_id=class_id)
+    if exam_name:
+        results = results.filter(exam_name__icontains=exam_name)
+
+    after = decode_cursor(cursor) if cursor else None
+    if after:
+        exam_date, class_key, name, pk = after
+        results = results.filter(
+            Q(exam_date__lt=exam_date)
+            | Q(exam_date=exam_date, class_key__gt=class_key)
+            | Q(exam_date=exam_date, class_key=class_key, student__name__gt=name)
+            | Q(exam_date=exam_date, class_key=class_key, student__name=name, id__gt=pk)
+        )
+
+    rows = list(
+        results.order_by('-exam_date', 'class_key', 'student__name', 'id')
+        .values(*RESULT_LIST_FIELDS, 'class_key')[:page_size + 1]
+    )
+    next_cursor = encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
+
+
+# ===================== VERIFICATION =====================
+
+def pending_results_matching(class_id=None, exam_name=None, teacher_id=None):
+    """Pending results narrowed by class, exam and submitting teacher"""
+    results = Result.objects.filter(verification_status='Pending')
+    if class_id and str(class_id).isdigit():
+        results = results.filter(student__student_class_id=class_id)
+    if exam_name:
+        results = results.filter(exam_name=exam_name)
+    if teacher_id and str(teacher_id).isdigit():
+        results = results.filter(submitted_by_id=teacher_id)
+    return results
+
+
+def bulk_verify(results, status, admin_id, remarks='', chunk_size=500):
+    """Approve or reject many pending results with set-based UPDATEs.
+
+    Rows are locked first (skipping any another admin already holds) and
+    the UPDATE only touches rows still Pending, so a result can never be
+    processed twice. Returns the number of results changed.
+    """
+    now = timezone.now()
+    updated = 0
+    with transaction.atomic():
+        rows = list(
+            results.filter(verification_status='Pending')
+            .select_for_update(skip_locked=True, of=('self',))
+            .values_list('id', 'student_id', 'exam_name')
+        )
+        ids = [row[0] for row in rows]
+        for start in range(0, len(ids), chunk_size):
+            updated += Result.objects.filter(
+                id__in=ids[start:start + chunk_size], verification_status='Pending'
+            ).update(
+                verification_status=status,
+                verified_by_id=admin_id,
+                verification_date=now,
+                verification_remarks=remarks,
+            )
+        refresh_exam_summaries((student_id, exam_name) for _, student_id, exam_name in rows)
+    return updated
+
+
+# ===================== REPORT CARDS =====================
+
+def report_card_context(student, exam_name, results, summary=None):
+    """Template context for teacher/student_result_pdf.html
+
+    When the student's ExamSummary is passed its stored totals are used
+    instead of summing the rows again.
+    """
+    results = list(results)
+    if summary is not None:
+        return {
+            'student': student,
+            'exam_name': exam_name,
+            'results': results,
+            'total_marks_obtained': summary.total_marks_obtained,
+            'total_marks_total': summary.total_marks,
+            'overall_percentage': summary.percentage,
+            'overall_grade': summary.grade,
+            'result_status': summary.result_status,
+            'total_subjects': summary.total_subjects,
+        }
+    total_marks_obtained = sum(r.marks_obtained for r in results)
+    total_marks_total = sum(r.total_marks for r in results)
+    overall_percentage = (total_marks_obtained / total_marks_total * 100) if total_marks_total > 0 else 0
+    return {
+        'student': student,
+        'exam_name': exam_name,
+        'results': results,
+        'total_marks_obtained': total_marks_obtained,
+        'total_marks_total': total_marks_total,
+        'overall_percentage': overall_percentage,
+        'overall_grade': grade_for_percentage(overall_percentage),
+        'result_status': 'PASS' if overall_percentage >= 40 else 'FAIL',
+        'total_subjects': len(results),
+    }
+
+
+def class_report_cards(class_id, exam_name):
+    """Report card contexts for every student of a class, from one query"""
+    results = Result.objects.filter(
+        verification_status='Verified',
+        exam_name=exam_name,
+        student__student_class_id=class_id,
+    ).select_related('student', 'student__student_class', 'subject').order_by(
+        'student__name', 'student_id', 'subject__subject_name'
+    )
+    for _, rows in groupby(results.iterator(), key=lambda r: r.student_id):
+        rows = list(rows)
+        yield report_card_context(rows[0].student, exam_name, rows)
+
+
+def _render_report_card(context):
+    filename = f"{context['student'].pk:04d}-{slugify(context['student'].name)}.html"
+    return filename, render_to_string('teacher/student_result_pdf.html', context)
+
+
+class ExportProgress:
+    """Progress and cancellation flag for a batch export, shared via the cache.
+
+    The cancel flag lives under its own key: progress writes replace the
+    whole progress dict and must never overwrite a concurrent cancel.
+    """
+    TIMEOUT = 60 * 60
+
+    def __init__(self, token):
+        self.key = f'result-export:{token}'
+        self.cancel_key = f'result-export:{token}:cancelled'
+
+    def get(self):
+        state = cache.get(self.key) or {'done': 0, 'total': 0, 'finished': False}
+        return {**state, 'cancelled': self.cancelled}
+
+    def update(self, **fields):
+        state = cache.get(self.key) or {'done': 0, 'total': 0, 'finished': False}
+        state.update(fields)
+        cache.set(self.key, state, self.TIMEOUT)
+
+    def cancel(self):
+        cache.set(self.cancel_key, True, self.TIMEOUT)
+
+    @property
+    def cancelled(self):
+        return bool(cache.get(self.cancel_key))
+
+
+def _rendered_cards(contexts, workers):
+    """Render cards in a process pool, keeping at most 2 x workers in flight"""
+    if not workers:
+        for context in contexts:
+            yield _render_report_card(context)
+        return
+    executor = process_pool(workers)
+    try:
+        pending = []
+        for context in contexts:
+            pending.append(executor.submit(_render_report_card, context))
+            if len(pending) >= workers * 2:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def stream_report_cards_zip(class_id, exam_name, progress, total):
+    """Yield a ZIP of rendered report cards chunk by chunk"""
+    workers = worker_count('RESULT_EXPORT_WORKERS')
+    # A cancel sent before the first byte still applies, so the flag is left as it is
+    progress.update(done=0, total=total, finished=False)
+    buffer = ZipStream()
+    done = 0
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for filename, html in _rendered_cards(class_report_cards(class_id, exam_name), workers):
+            if progress.cancelled:
+                break
+            archive.writestr(filename, html)
+            done += 1
+            progress.update(done=done)
+            yield buffer.drain()
+    progress.update(finished=True)
+    yield buffer.drain()
@@ -0,0 +1,98 @@
+"""Model signal handlers that keep derived data in step with its sources"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .attendance import invalidate_daily_board, refresh_attendance_summaries, rewind_absence_streaks
+from .counters import COUNTER_SOURCES, SOURCE_FIELDS, adjust_counters, contributions, forget_recent_payments
+from .fees import refresh_balances
+from .images import queue_id_card_thumbnail
+from .models import (
+    ExamSummary, GalleryImage, Holiday, Result, SchoolClass, SchoolInfo, Student, StudentAttendance, StudentPayment
+)
+from .page_cache import invalidate_public_pages
+
+
+@receiver([post_save, post_delete], sender=SchoolInfo)
+@receiver([post_save, post_delete], sender=GalleryImage)
+@receiver([post_save, post_delete], sender=Result)
+@receiver([post_save, post_delete], sender=ExamSummary)
+@receiver([post_save, post_delete], sender=Student)
+@receiver([post_save, post_delete], sender=SchoolClass)
+def public_page_source_changed(sender, **kwargs):
+    invalidate_public_pages()
+
+
+@receiver([post_save, post_delete], sender=StudentPayment)
+def student_payment_changed(sender, instance, **kwargs):
+    student_id = instance.student_id
+    transaction.on_commit(lambda: refresh_balances([student_id]))
+
+
+@receiver(post_save, sender=Student)
+def student_fee_terms_changed(sender, instance, **kwargs):
+    student_id = instance.pk
+    transaction.on_commit(lambda: refresh_balances([student_id]))
+
+
+@receiver(post_save, sender=Student)
+def student_photo_saved(sender, instance, **kwargs):
+    # ID card sheets print the small thumbnail; build it now rather than when printing
+    if instance.photo:
+        queue_id_card_thumbnail(instance.photo.name)
+
+
+def counter_source(signal):
+    """Connect a handler to `signal` for every model that feeds the dashboard counters"""
+    def decorator(func):
+        for model in COUNTER_SOURCES:
+            signal.connect(func, sender=model, dispatch_uid=f'{func.__name__}:{model.__name__}')
+        return func
+    return decorator
+
+
+@counter_source(pre_save)
+def counter_source_saving(sender, instance, **kwargs):
+    # Snapshot what the stored row contributes so post_save can apply only the difference
+    instance._counter_previous = None
+    if instance.pk and not instance._state.adding:
+        fields = SOURCE_FIELDS[sender]
+        previous = sender.objects.filter(pk=instance.pk).values(*fields).first() if fields else {}
+        if previous is not None:
+            instance._counter_previous = contributions(sender(**previous))
+
+
+@counter_source(post_save)
+def counter_source_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_counter_previous', None) or {}
+    adjust_counters({
+        name: value - previous.get(name, 0) for name, value in contributions(instance).items()
+    })
+    forget_recent_payments()
+
+
+@counter_source(post_delete)
+def counter_source_deleted(sender, instance, **kwargs):
+    adjust_counters({name: -value for name, value in contributions(instance).items()})
+    forget_recent_payments()
+
+
+@receiver([post_save, post_delete], sender=StudentAttendance)
+def student_attendance_changed(sender, instance, **kwargs):
+    invalidate_daily_board(instance.date)
+    student_id, day = instance.student_id, instance.date
+    transaction.on_commit(lambda: refresh_attendance_summaries(day.year, day.month, [student_id]))
+    rewind_absence_streaks(day, [student_id])
+
+
+@receiver([post_save, post_delete], sender=Holiday)
+def holiday_changed(sender, instance, **kwargs):
+    rewind_absence_streaks(instance.date)
+
+
+@receiver([post_save, post_delete], sender=Student)
+@receiver([post_save, post_delete], sender=SchoolClass)
+def class_roster_changed(sender, **kwargs):
+    # Rosters only matter for the board of the day being marked
+    invalidate_daily_board(timezone.localdate())
@@ -0,0 +1,25 @@
+"""Helpers for responses written and sent a chunk at a time"""
+
+
+class ZipStream:
+    """Write-only file object; zipfile falls back to streaming mode without seek()"""
+
+    def __init__(self):
+        self.chunks = []
+        self.offset = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
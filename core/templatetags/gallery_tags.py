@@ -0,0 +1,19 @@
+from django import template
+from django.utils.html import format_html
+
+register = template.Library()
+
+
+@register.simple_tag
+def gallery_picture(image, sizes='100vw', loading='lazy'):
+    """<picture> with WebP and JPEG srcsets, falling back to the original upload"""
+    webp, jpeg = image.srcset('webp'), image.srcset('jpeg')
+    if not jpeg:
+        return format_html('<img src="{}" alt="{}" loading="{}">', image.image.url, image.title, loading)
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" loading="{}">'
+        '</picture>',
+        webp, sizes, image.image.url, jpeg, sizes, image.title, loading,
+    )
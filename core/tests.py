@@ -1,3 +1,1315 @@
-from django.test import TestCase
+import csv
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal
+from importlib import import_module
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from unittest.mock import patch
+from PIL import Image
+
+from .academic_years import ArchiveError, academic_year, academic_year_range, archive_academic_year
+from .attendance_archive import pack, pack_month, unpack
+from .attendance import (
+    RegisterError, attendance_shortfall, daily_board, detect_absence_streaks, invalidate_daily_board,
+    monthly_register, open_absence_alerts, read_register, rebuild_attendance_summaries, save_student_register,
+    save_teacher_register, term_start, with_term_attendance
+)
+from .documents import DocumentCache, id_card_students, rendered_documents, stream_id_card_sheets
+from .counters import dashboard_counters, reconcile_counters
+from .fees import defaulters, generate_fee_invoices, month_filter, refresh_balances
+from .images import ID_PHOTO_SIZE, id_card_thumbnail_name, ingest_photo_zip, match_photo_name
+from .imports import import_people, read_rows
+from .ledgers import stream_xlsx
+from .models import (
+    AbsenceAlert, AbsenceStreak, AcademicYear, Admin, ArchivedResult, ArchivedStudentPayment, DashboardCounter,
+    ExamSummary, FeeInvoiceRun, GalleryImage, Holiday, PayrollRun, PromotionRecord, Result, SchoolClass, SchoolInfo,
+    Student, StudentAttendance, StudentAttendanceMonth, StudentAttendanceSummary, StudentBalance, StudentPayment,
+    Subject, Teacher, TeacherAttendance, TeacherPayment, parse_month
+)
+from .payroll import run_payroll
+from .promotions import (
+    GRADUATE, PromotionError, apply_promotion, preview_promotion, rollback_promotion, suggest_mapping
+)
+from .results import ExportProgress, MarksGrid, rebuild_exam_summaries, result_pickers, verified_results_page
+
+
+# Query budgets count database queries only, so those tests keep the
+# shared DatabaseCache's reads out of them
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def make_class(name='Class 1', section='A'):
+    return SchoolClass.objects.create(class_name=name, section=section)
+
+
+def make_student(school_class, name='Student', **kwargs):
+    return Student.objects.create(
+        name=name, father_name='Father', student_class=school_class,
+        mobile='9999999999', admission_date=kwargs.pop('admission_date', date(2025, 4, 1)),
+        monthly_fee=kwargs.pop('monthly_fee', Decimal('500')), password='x', **kwargs
+    )
+
+
+def make_teacher(name='Teacher', **kwargs):
+    return Teacher.objects.create(
+        name=name, email=kwargs.pop('email', f'{name.lower().replace(" ", "")}@school.test'),
+        mobile='9999999999', joining_date=kwargs.pop('joining_date', date(2024, 4, 1)), password='x', **kwargs
+    )
+
+
+def login(client, user_type, **ids):
+    session = client.session
+    session['user_type'] = user_type
+    session.update(ids)
+    session.save()
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class AttendanceRegisterTests(TestCase):
+    def setUp(self):
+        self.school_class = make_class()
+        self.students = [make_student(self.school_class, f'Student {i}') for i in range(50)]
+        self.day = date(2026, 7, 1)
+
+    def count_queries(self, register):
+        with CaptureQueriesContext(connection) as ctx:
+            save_student_register(self.day, register)
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_register_size(self):
+        one = self.count_queries({self.students[0].id: 'Present'})
+        everyone = self.count_queries({s.id: 'Absent' for s in self.students})
+        self.assertEqual(one, everyone)
+        # savepoint + packed-month lookup (past months only) + insert
+        # + summary recount (rows, packed rows) + summary upsert
+        # + absence streak rewind (past days only) + release
+        self.assertLessEqual(everyone, 8)
+
+    def test_upsert_updates_existing_rows(self):
+        save_student_register(self.day, {s.id: 'Present' for s in self.students})
+        save_student_register(self.day, {self.students[0].id: 'Leave'})
+        self.assertEqual(StudentAttendance.objects.filter(date=self.day).count(), 50)
+        self.assertEqual(
+            StudentAttendance.objects.get(student=self.students[0], date=self.day).status, 'Leave'
+        )
+
+    def test_invalid_status_rejects_whole_register(self):
+        data = {f'status_{s.id}': 'Present' for s in self.students}
+        data[f'status_{self.students[3].id}'] = 'Sick'
+        with self.assertRaises(RegisterError):
+            read_register(data, [s.id for s in self.students])
+
+    def test_blank_entries_are_skipped(self):
+        data = {f'status_{self.students[0].id}': 'Present', f'status_{self.students[1].id}': ''}
+        register = read_register(data, [s.id for s in self.students])
+        self.assertEqual(register, {self.students[0].id: 'Present'})
+
+    def test_teacher_register(self):
+        teacher = make_teacher()
+        save_teacher_register(self.day, {teacher.id: 'Half Day'})
+        save_teacher_register(self.day, {teacher.id: 'Present'})
+        self.assertEqual(TeacherAttendance.objects.get(teacher=teacher, date=self.day).status, 'Present')
+
+    def test_mark_view_writes_class_register(self):
+        teacher = make_teacher(class_section=self.school_class)
+        login(self.client, 'teacher', teacher_id=teacher.id)
+        data = {'attendance_date': self.day.isoformat()}
+        data.update({f'status_{s.id}': 'Present' for s in self.students})
+        self.client.post('/teacher/student-attendance/mark/', data)
+        self.assertEqual(StudentAttendance.objects.filter(date=self.day, status='Present').count(), 50)
+
+
+class MarksGridTests(TestCase):
+    def setUp(self):
+        self.school_class = make_class()
+        self.students = [make_student(self.school_class, f'Student {i}') for i in range(3)]
+        self.subjects = [
+            Subject.objects.create(subject_name='Maths', subject_code='MATH'),
+            Subject.objects.create(subject_name='Hindi', subject_code='HIN'),
+        ]
+        self.teacher = make_teacher(class_section=self.school_class)
+
+    def grid_data(self, **cells):
+        data = {'exam_name': 'Half Yearly', 'exam_date': '2026-09-20'}
+        data.update({f'total_{s.id}': '100' for s in self.subjects})
+        for student in self.students:
+            for subject in self.subjects:
+                data[f'marks_{student.id}_{subject.id}'] = '75'
+        data.update(cells)
+        return data
+
+    def test_valid_grid_is_saved_with_grades(self):
+        grid = MarksGrid(self.students, self.subjects, self.grid_data())
+        self.assertTrue(grid.is_valid())
+        with self.assertNumQueries(3):  # savepoint + insert + release
+            grid.save(self.teacher)
+        self.assertEqual(Result.objects.filter(grade='B+', submitted_by=self.teacher).count(), 6)
+
+    def test_zero_marks_are_saved_with_a_grade(self):
+        absent = f'marks_{self.students[0].id}_{self.subjects[0].id}'
+        grid = MarksGrid(self.students, self.subjects, self.grid_data(**{absent: '0'}))
+        self.assertTrue(grid.is_valid())
+        grid.save(self.teacher)
+        result = Result.objects.get(student=self.students[0], subject=self.subjects[0])
+        self.assertEqual((result.percentage, result.grade), (Decimal('0'), 'F'))
+
+    def test_cell_errors_block_the_whole_grid(self):
+        bad = f'marks_{self.students[1].id}_{self.subjects[0].id}'
+        grid = MarksGrid(self.students, self.subjects, self.grid_data(**{bad: '120'}))
+        self.assertFalse(grid.is_valid())
+        self.assertIn((self.students[1].id, self.subjects[0].id), grid.errors)
+        self.assertEqual(len(grid.errors), 1)
+
+    def test_grid_view(self):
+        login(self.client, 'teacher', teacher_id=self.teacher.id)
+        self.client.post('/teacher/results/grid/', self.grid_data())
+        self.assertEqual(Result.objects.filter(verification_status='Pending').count(), 6)
+        # Re-posting the same exam flags every cell as a duplicate
+        response = self.client.post('/teacher/results/grid/', self.grid_data())
+        self.assertEqual(len(response.context['grid'].errors), 6)
+
+
+class ResultExportTests(TestCase):
+    def setUp(self):
+        self.school_class = make_class()
+        subject = Subject.objects.create(subject_name='Maths', subject_code='MATH')
+        for i in range(3):
+            Result.objects.create(
+                student=make_student(self.school_class, f'Student {i}'), subject=subject,
+                exam_name='Annual', marks_obtained=Decimal('80'), total_marks=Decimal('100'),
+                exam_date=date(2026, 3, 1), verification_status='Verified',
+            )
+        login(self.client, 'admin', admin_id=1)
+
+    def export(self, **params):
+        return self.client.get('/results/export/', {'class': self.school_class.id, 'exam': 'Annual', **params})
+
+    @override_settings(RESULT_EXPORT_WORKERS=0)
+    def test_zip_contains_one_card_per_student(self):
+        token = 'a' * 32
+        response = self.export(token=token)
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(len(archive.namelist()), 3)
+        self.assertIn(b'Student 0', archive.read(archive.namelist()[0]))
+        self.assertEqual(ExportProgress(token).get()['done'], 3)
+
+    @override_settings(RESULT_EXPORT_WORKERS=0)
+    def test_cancel_stops_export(self):
+        token = 'b' * 32
+        response = self.export(token=token)
+        stream = iter(response.streaming_content)
+        next(stream)
+        self.client.post(f'/results/export/{token}/cancel/')
+        b''.join(stream)
+        state = ExportProgress(token).get()
+        self.assertTrue(state['cancelled'])
+        self.assertLess(state['done'], 3)
+
+    @override_settings(RESULT_EXPORT_WORKERS=0)
+    def test_cancel_before_start_survives_progress_writes(self):
+        token = 'c' * 32
+        ExportProgress(token).cancel()
+        response = self.export(token=token)
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(archive.namelist(), [])
+        ExportProgress(token).update(done=2)
+        self.assertTrue(ExportProgress(token).get()['cancelled'])
+
+
+class ExamSummaryTests(TestCase):
+    def setUp(self):
+        self.student = make_student(make_class())
+        self.results = [
+            Result.objects.create(
+                student=self.student, subject=Subject.objects.create(subject_name=name, subject_code=name),
+                exam_name='Annual', marks_obtained=Decimal(marks), total_marks=Decimal('100'),
+                exam_date=date(2026, 3, 1),
+            )
+            for name, marks in [('Maths', '90'), ('Hindi', '30')]
+        ]
+        self.admin = Admin.objects.create(name='Admin', email='admin@school.test', phone='1', password='x')
+        login(self.client, 'admin', admin_id=self.admin.id)
+
+    def summary(self):
+        return ExamSummary.objects.get(student=self.student, exam_name='Annual')
+
+    def test_approve_reject_and_delete_update_summary(self):
+        for result in self.results:
+            self.client.post(f'/admin/results/{result.pk}/approve/')
+        summary = self.summary()
+        self.assertEqual(summary.total_marks_obtained, Decimal('120'))
+        self.assertEqual(summary.percentage, Decimal('60.00'))
+        self.assertEqual((summary.grade, summary.result_status, summary.total_subjects), ('B', 'PASS', 2))
+
+        self.client.post(f'/admin/results/{self.results[0].pk}/delete/')
+        self.assertEqual((self.summary().grade, self.summary().result_status), ('F', 'FAIL'))
+
+        self.client.post(f'/admin/results/{self.results[1].pk}/delete/')
+        self.assertFalse(ExamSummary.objects.exists())
+
+    def test_reject_keeps_result_out_of_summary(self):
+        self.client.post(f'/admin/results/{self.results[0].pk}/approve/')
+        self.client.post(f'/admin/results/{self.results[1].pk}/reject/')
+        self.assertEqual((self.summary().grade, self.summary().total_subjects), ('A+', 1))
+
+    def test_result_pdf_reads_summary(self):
+        self.client.post(f'/admin/results/{self.results[0].pk}/approve/')
+        response = self.client.get(f'/results/pdf/{self.student.pk}/', {'exam': 'Annual'})
+        self.assertEqual(response.context['overall_grade'], 'A+')
+
+    def test_rebuild_command(self):
+        Result.objects.update(verification_status='Verified')
+        call_command('rebuild_exam_summaries', stdout=io.StringIO())
+        self.assertEqual(self.summary().total_subjects, 2)
+
+
+class BulkVerifyTests(TestCase):
+    def setUp(self):
+        self.class_a, self.class_b = make_class('Class 1'), make_class('Class 2')
+        subject = Subject.objects.create(subject_name='Maths', subject_code='MATH')
+        self.results = [
+            Result.objects.create(
+                student=make_student(school_class, f'Student {i}'), subject=subject, exam_name='Annual',
+                marks_obtained=Decimal('50'), total_marks=Decimal('100'), exam_date=date(2026, 3, 1),
+            )
+            for i, school_class in enumerate([self.class_a, self.class_a, self.class_b])
+        ]
+        self.admin = Admin.objects.create(name='Admin', email='admin@school.test', phone='1', password='x')
+        login(self.client, 'admin', admin_id=self.admin.id)
+
+    def test_approve_selected(self):
+        self.client.post('/admin/results/bulk/', {
+            'action': 'approve', 'result_ids': [self.results[0].pk, self.results[2].pk],
+        })
+        verified = Result.objects.filter(verification_status='Verified', verified_by=self.admin)
+        self.assertEqual(set(verified.values_list('pk', flat=True)), {self.results[0].pk, self.results[2].pk})
+        self.assertEqual(ExamSummary.objects.count(), 2)
+
+    def test_reject_all_matching_class(self):
+        self.client.post('/admin/results/bulk/', {
+            'action': 'reject', 'scope': 'matching', 'class': self.class_a.pk, 'exam': 'Annual',
+        })
+        self.assertEqual(Result.objects.filter(verification_status='Rejected').count(), 2)
+        self.assertEqual(Result.objects.filter(verification_status='Pending').count(), 1)
+
+    def test_processed_results_are_not_touched_again(self):
+        self.client.post(f'/admin/results/{self.results[0].pk}/reject/')
+        self.client.post('/admin/results/bulk/', {'action': 'approve', 'result_ids': [self.results[0].pk]})
+        self.assertEqual(Result.objects.get(pk=self.results[0].pk).verification_status, 'Rejected')
+
+
+class ResultListTests(TestCase):
+    def setUp(self):
+        self.classes = [make_class('Class 1'), make_class('Class 2')]
+        subject = Subject.objects.create(subject_name='Maths', subject_code='MATH')
+        for i in range(7):
+            Result.objects.create(
+                student=make_student(self.classes[i % 2], f'Student {i}'), subject=subject,
+                exam_name='Annual', marks_obtained=Decimal('50'), total_marks=Decimal('100'),
+                exam_date=date(2026, 3, 1 + i % 3), verification_status='Verified',
+            )
+
+    def test_keyset_pages_cover_every_row_once(self):
+        seen, cursor = [], None
+        while True:
+            rows, cursor = verified_results_page(cursor=cursor, page_size=3)
+            seen.extend(row['id'] for row in rows)
+            if not cursor:
+                break
+        expected = list(
+            Result.objects.order_by('-exam_date', 'student__student_class_id', 'student__name', 'id')
+            .values_list('id', flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_page_query_count_is_flat(self):
+        rows, cursor = verified_results_page(page_size=3)
+        with self.assertNumQueries(1):
+            verified_results_page(cursor=cursor, page_size=3)
+
+    def test_list_view(self):
+        response = self.client.get('/results/', {'class': self.classes[0].pk})
+        self.assertEqual(len(response.context['results']), 4)
+        self.assertIsNone(response.context['next_page_query'])
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class PublicPageCacheTests(TestCase):
+    def setUp(self):
+        SchoolInfo.objects.create()
+
+    def test_conditional_get_returns_304_until_data_changes(self):
+        response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        self.assertEqual(self.client.get('/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        info = SchoolInfo.objects.first()
+        info.school_name = 'Renamed'
+        info.save()
+        response = self.client.get('/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Renamed')
+
+    def test_cached_page_skips_queries(self):
+        self.client.get('/results/')
+        with self.assertNumQueries(0):
+            self.client.get('/results/')
+
+    def test_query_params_are_part_of_the_key(self):
+        first = self.client.get('/results/', {'exam': 'Annual'})['ETag']
+        self.assertNotEqual(first, self.client.get('/results/', {'exam': 'Unit Test'})['ETag'])
+
+
+def png_upload(name='photo.png', size=(1600, 900)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'orange').save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(IMAGE_DERIVATIVE_WORKERS=0)
+class GalleryDerivativeTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        login(self.client, 'admin', admin_id=1)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_upload_builds_webp_and_jpeg_widths(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/admin/gallery/add/', {'title': 'Sports Day', 'category': 'Sports', 'image': png_upload()})
+        image = GalleryImage.objects.get()
+        self.assertEqual(sorted(image.derivatives['webp'], key=int), ['320', '640', '1280'])
+        self.assertIn('1280w', image.srcset('jpeg'))
+
+    def test_small_images_are_not_upscaled(self):
+        image = GalleryImage.objects.create(title='Logo', image=png_upload(size=(500, 300)))
+        call_command('backfill_gallery_derivatives', workers=1, stdout=io.StringIO())
+        image.refresh_from_db()
+        self.assertEqual(sorted(image.derivatives['jpeg'], key=int), ['320', '500'])
+
+    def test_delete_removes_derivative_files(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/admin/gallery/add/', {'title': 'Sports Day', 'category': 'Sports', 'image': png_upload()})
+        names = [name for sizes in GalleryImage.objects.get().derivatives.values() for name in sizes.values()]
+        self.assertTrue(all(os.path.exists(os.path.join(self.media_root, name)) for name in names))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(f'/admin/gallery/{GalleryImage.objects.get().pk}/delete/')
+        self.assertFalse(any(os.path.exists(os.path.join(self.media_root, name)) for name in names))
+
+
+class FeeInvoiceTests(TestCase):
+    def setUp(self):
+        school_class = make_class()
+        self.students = [make_student(school_class, f'Student {i}') for i in range(5)]
+        make_student(school_class, 'Free', monthly_fee=Decimal('0'))
+        make_student(school_class, 'Late', admission_date=date(2026, 9, 1))
+        make_student(school_class, 'Gone', is_active=False)
+
+    def test_parse_month(self):
+        self.assertEqual([parse_month(m) for m in ['feb', 'February', '2', '13', 'x']], [2, 2, 2, None, None])
+
+    def test_payment_months_are_stored_in_one_spelling(self):
+        payment = StudentPayment.objects.create(
+            student=self.students[0], paid_amount=500, payment_date=date(2026, 6, 3), status='Paid', month=' jun',
+            year=2026,
+        )
+        payment.refresh_from_db()
+        self.assertEqual(payment.month, 'June')
+        self.assertEqual(TeacherPayment(month='6').month, '6')
+        self.assertEqual(StudentPayment.objects.filter(month_filter(6)).get(), payment)
+
+    def test_generates_pending_rows_once(self):
+        StudentPayment.objects.create(
+            student=self.students[0], paid_amount=500, payment_date=date(2026, 7, 3),
+            status='Paid', month='jul', year=2026,
+        )
+        report = generate_fee_invoices(7, 2026, chunk_size=2)
+        self.assertEqual(report.created, 4)
+        self.assertEqual(report.skipped, {'already billed': 1, 'no monthly fee': 1, 'admitted later': 1})
+        pending = StudentPayment.objects.filter(month='July', year=2026, status='Pending')
+        self.assertEqual(pending.count(), 4)
+        self.assertEqual(pending.first().due_amount, Decimal('500'))
+
+        again = generate_fee_invoices(7, 2026)
+        self.assertTrue(again.already_completed)
+        self.assertEqual(StudentPayment.objects.filter(year=2026).count(), 5)
+
+    def test_interrupted_run_resumes(self):
+        # Simulate a crash after the first chunk was committed
+        FeeInvoiceRun.objects.create(month='July', year=2026, last_student_id=self.students[1].id)
+        report = generate_fee_invoices(7, 2026, chunk_size=2)
+        self.assertEqual(report.created, 3)
+        self.assertFalse(StudentPayment.objects.filter(student__in=self.students[:2]).exists())
+
+
+class StudentBalanceTests(TestCase):
+    def setUp(self):
+        school_class = make_class()
+        # Admitted April 2025: 16 months billed through July 2026
+        self.student = make_student(school_class, 'Owes')
+        self.paid_up = make_student(school_class, 'Paid Up', admission_date=date(2026, 6, 1))
+        self.as_of = date(2026, 7, 15)
+
+    def pay(self, student, amount, **kwargs):
+        return StudentPayment.objects.create(
+            student=student, paid_amount=amount, payment_date=date(2026, 7, 1),
+            status=kwargs.pop('status', 'Paid'), month='July', year=2026, **kwargs
+        )
+
+    def test_balance_counts_partial_payments(self):
+        self.pay(self.student, 2000, status='Partial')
+        self.pay(self.student, 1500)
+        self.pay(self.paid_up, 1000)
+        refresh_balances(as_of=self.as_of)
+        balance = StudentBalance.objects.get(student=self.student)
+        self.assertEqual(balance.months_billed, 16)
+        self.assertEqual(balance.total_billed, Decimal('8000'))
+        self.assertEqual(balance.outstanding, Decimal('4500'))
+        self.assertEqual(balance.months_owed, Decimal('9'))
+        self.assertEqual(StudentBalance.objects.get(student=self.paid_up).outstanding, Decimal('0'))
+
+    def test_payment_updates_balance_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            payment = self.pay(self.student, 500)
+        before = StudentBalance.objects.get(student=self.student).outstanding
+        with self.captureOnCommitCallbacks(execute=True):
+            payment.paid_amount = 1500
+            payment.save()
+        self.assertEqual(StudentBalance.objects.get(student=self.student).outstanding, before - 1000)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.is_active = False
+            self.student.save()
+        self.assertFalse(StudentBalance.objects.filter(student=self.student).exists())
+
+    def test_defaulters_report(self):
+        self.pay(self.paid_up, 100000)
+        refresh_balances()
+        login(self.client, 'admin')
+        response = self.client.get('/admin/fees/defaulters/?months=1')
+        self.assertEqual([b.student for b in response.context['balances']], [self.student])
+
+    def test_defaulters_include_students_without_a_balance_row(self):
+        self.pay(self.paid_up, 100000)
+        StudentBalance.objects.all().delete()
+        self.assertEqual([b.student for b in defaulters(1)], [self.student])
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class DashboardCounterTests(TestCase):
+    def setUp(self):
+        self.school_class = make_class()
+        self.student = make_student(self.school_class)
+        self.teacher = make_teacher()
+        reconcile_counters()
+
+    def pay_fee(self, amount, status='Paid'):
+        return StudentPayment.objects.create(
+            student=self.student, paid_amount=amount, payment_date=date(2026, 7, 1),
+            status=status, month='July', year=2026,
+        )
+
+    def test_counters_follow_saves_and_deletes(self):
+        payment = self.pay_fee(300, status='Pending')
+        TeacherPayment.objects.create(
+            teacher=self.teacher, paid_amount=1000, payment_date=date(2026, 7, 1),
+            status='Paid', month='July', year=2026,
+        )
+        payment.status = 'Paid'
+        payment.save()
+        self.pay_fee(200).delete()
+        make_student(self.school_class, 'Inactive', is_active=False)
+        self.teacher.is_active = False
+        self.teacher.save()
+
+        counters = dashboard_counters()
+        self.assertEqual(counters['total_revenue'], Decimal('300'))
+        self.assertEqual(counters['total_spend'], Decimal('1000'))
+        self.assertEqual(counters['pending_fees'], 0)
+        self.assertEqual(counters['total_students'], 1)
+        self.assertEqual(counters['total_teachers'], 0)
+        self.assertEqual(reconcile_counters(), {})
+
+    def test_reconcile_repairs_drift(self):
+        self.pay_fee(500)
+        DashboardCounter.objects.filter(name='total_revenue').update(value=0)
+        self.assertEqual(reconcile_counters(), {'total_revenue': (Decimal('0'), Decimal('500'))})
+        self.assertEqual(dashboard_counters()['total_revenue'], Decimal('500'))
+
+    def test_invoice_generation_counts_pending(self):
+        generate_fee_invoices(7, 2026)
+        self.assertEqual(dashboard_counters()['pending_fees'], 1)
+
+    def test_dashboard_query_count(self):
+        self.pay_fee(500)
+        login(self.client, 'admin')
+        self.client.get('/admin-dashboard/')
+        # Session lookup plus the counters; recent payments come from the cache
+        with self.assertNumQueries(2):
+            response = self.client.get('/admin-dashboard/')
+        self.assertEqual(response.context['total_revenue'], Decimal('500'))
+        self.assertEqual(response.context['recent_fee_payments'][0].student.name, 'Student')
+
+
+class LedgerExportTests(TestCase):
+    def setUp(self):
+        self.class_one = make_class('Class 1')
+        class_two = make_class('Class 2')
+        for i, school_class in enumerate([self.class_one, self.class_one, class_two]):
+            StudentPayment.objects.create(
+                student=make_student(school_class, f'Student, "{i}"'), paid_amount=500,
+                payment_date=date(2026, 7, 1), status='Paid', month='jul', year=2026,
+            )
+        StudentPayment.objects.create(
+            student=make_student(self.class_one, 'Old'), paid_amount=400,
+            payment_date=date(2025, 7, 1), status='Paid', month='July', year=2025,
+        )
+        login(self.client, 'admin')
+
+    def test_csv_export_is_filtered_and_streamed(self):
+        response = self.client.get(f'/admin/fees/export/?month=July&year=2026&class={self.class_one.id}')
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))
+        self.assertEqual(rows[0][:3], ['Receipt', 'Student', 'Class'])
+        self.assertEqual(sorted(row[1] for row in rows[1:]), ['Student, "0"', 'Student, "1"'])
+
+    def test_xlsx_export(self):
+        response = self.client.get('/admin/fees/export/?format=xlsx&year=2025')
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(sheet.count('<row>'), 2)
+        self.assertIn('<v>400.00</v>', sheet)
+        self.assertIn('[Content_Types].xml', archive.namelist())
+
+    def test_exports_neutralise_formulas_and_control_characters(self):
+        StudentPayment.objects.filter(year=2025).update(remarks='=HYPERLINK("http://x")\x07')
+        response = self.client.get('/admin/fees/export/?year=2025')
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))
+        self.assertEqual(rows[1][-1], '\'=HYPERLINK("http://x")\x07')
+        self.assertEqual(rows[1][6], '400.00')
+        response = self.client.get('/admin/fees/export/?format=xlsx&year=2025')
+        sheet = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))).read('xl/worksheets/sheet1.xml')
+        self.assertIn(b'>=HYPERLINK("http://x")</t>', sheet)
+        self.assertNotIn(b'\x07', sheet)
+
+
+class LedgerPageTests(TestCase):
+    def setUp(self):
+        student = make_student(make_class())
+        for i in range(60):
+            StudentPayment.objects.create(
+                student=student, paid_amount=100 if i % 3 else 0, due_amount=0 if i % 3 else 100,
+                payment_date=date(2026, 1, 1) + timedelta(days=i), status='Paid' if i % 3 else 'Pending',
+                payment_mode='UPI' if i % 2 else 'Cash', month='Jan', year=2026,
+            )
+        login(self.client, 'admin')
+
+    def test_totals_and_pagination(self):
+        response = self.client.get('/admin/fees/?page=2')
+        self.assertEqual(response.context['totals'], {'count': 60, 'paid': Decimal('4000'), 'due': Decimal('2000')})
+        self.assertEqual(response.context['status_totals']['Pending']['count'], 20)
+        self.assertEqual(len(response.context['payments']), 10)
+        self.assertEqual(response.context['page_obj'].paginator.num_pages, 2)
+
+    def test_mode_and_date_range_filters(self):
+        response = self.client.get('/admin/fees/?payment_mode=UPI&date_from=2026-01-01&date_to=2026-01-10')
+        # Days 1, 3, 5, 7 and 9 are UPI; 3 and 9 of those are Pending
+        self.assertEqual(response.context['totals']['count'], 5)
+        self.assertEqual(response.context['status_totals']['Pending']['count'], 2)
+
+
+class PayrollTests(TestCase):
+    def setUp(self):
+        # June 2026 has 30 days
+        self.teacher = make_teacher('Full', monthly_salary=Decimal('30000'))
+        self.late = make_teacher('Late', monthly_salary=Decimal('30000'), joining_date=date(2026, 6, 16))
+        make_teacher('Unpaid')
+        for day, status in [(1, 'Absent'), (2, 'Absent'), (3, 'Half Day'), (4, 'Leave'), (5, 'Present')]:
+            TeacherAttendance.objects.create(teacher=self.teacher, date=date(2026, 6, day), status=status)
+        TeacherAttendance.objects.create(teacher=self.teacher, date=date(2026, 7, 1), status='Absent')
+        reconcile_counters()
+
+    def test_dry_run_writes_nothing(self):
+        report = run_payroll(6, 2026, dry_run=True)
+        payable = {line.name: line.payable for line in report.lines}
+        self.assertEqual(payable, {'Full': Decimal('27500.00'), 'Late': Decimal('15000.00')})
+        self.assertEqual(report.skipped, {'no monthly salary': 1})
+        self.assertFalse(TeacherPayment.objects.exists())
+        self.assertFalse(PayrollRun.objects.exists())
+
+    def test_run_is_idempotent(self):
+        TeacherPayment.objects.create(
+            teacher=self.late, paid_amount=15000, payment_date=date(2026, 6, 30),
+            status='Paid', month='jun', year=2026,
+        )
+        report = run_payroll(6, 2026, deductions={'Absent': Decimal('1'), 'Leave': Decimal('1')})
+        self.assertEqual(report.created, 1)
+        row = TeacherPayment.objects.get(teacher=self.teacher, status='Pending')
+        self.assertEqual(row.due_amount, Decimal('27000.00'))
+        self.assertEqual(dashboard_counters()['pending_salaries'], 1)
+
+        self.assertTrue(run_payroll(6, 2026).already_completed)
+        self.assertEqual(TeacherPayment.objects.count(), 2)
+
+
+class PaymentDocumentTests(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        override = override_settings(DOCUMENT_CACHE_DIR=self.cache_dir, DOCUMENT_RENDER_WORKERS=0)
+        override.enable()
+        self.addCleanup(override.disable)
+        student = make_student(make_class(), 'Receipt Student')
+        self.payments = [
+            StudentPayment.objects.create(
+                student=student, paid_amount=500, payment_date=date(2026, 7, day),
+                status='Paid', month='July', year=2026,
+            )
+            for day in (1, 2)
+        ]
+        StudentPayment.objects.create(
+            student=student, paid_amount=0, due_amount=500, payment_date=date(2026, 7, 1),
+            status='Pending', month='August', year=2026,
+        )
+        login(self.client, 'admin')
+
+    def test_print_document_contains_each_receipt(self):
+        response = self.client.get('/admin/fees/receipts/?date_from=2026-07-01&date_to=2026-07-31')
+        html = b''.join(response.streaming_content).decode()
+        self.assertEqual(html.count('class="document"'), 2)
+        self.assertIn(f'Fee Receipt #{self.payments[1].id}', html)
+
+    def test_zip_of_salary_slips(self):
+        teacher = make_teacher(monthly_salary=Decimal('20000'))
+        TeacherPayment.objects.create(
+            teacher=teacher, paid_amount=20000, payment_date=date(2026, 7, 31),
+            status='Paid', month='July', year=2026,
+        )
+        response = self.client.get('/admin/salaries/slips/?month=7&year=2026&format=zip')
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(len(archive.namelist()), 1)
+        self.assertIn('Salary Slip - July 2026', archive.read(archive.namelist()[0]).decode())
+
+    def test_rendered_once_until_payment_changes(self):
+        rows = lambda: StudentPayment.objects.filter(pk=self.payments[0].pk).values(
+            'id', 'paid_amount', name=F('student__name')
+        )
+        cache = DocumentCache('receipt')
+        with patch('core.documents._render_document', return_value='<div>cached</div>') as render:
+            list(rendered_documents('receipt', rows()))
+            list(rendered_documents('receipt', rows()))
+            self.assertEqual(render.call_count, 1)
+            StudentPayment.objects.filter(pk=self.payments[0].pk).update(paid_amount=600)
+            list(rendered_documents('receipt', rows()))
+            self.assertEqual(render.call_count, 2)
+        self.assertEqual(len(os.listdir(cache.directory)), 1)
+
+    def test_stale_render_removed_by_another_worker(self):
+        cache = DocumentCache('receipt')
+        gone = cache.path(1, 'old')
+        with patch('core.documents.glob', return_value=[gone, cache.path(1, 'new')]):
+            cache.set(1, 'new', '<div>new</div>')
+        self.assertEqual(cache.get(1, 'new'), '<div>new</div>')
+        self.assertIsNone(cache.get(1, 'old'))
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class AttendanceBoardTests(TestCase):
+    def setUp(self):
+        self.day = date(2026, 7, 1)
+        self.class_one = make_class('Class 1')
+        self.class_two = make_class('Class 2')
+        self.students = [make_student(self.class_one, f'Student {i}') for i in range(4)]
+        make_student(self.class_two, 'Unmarked')
+        make_student(self.class_one, 'Left', is_active=False)
+        StudentAttendance.objects.create(student=self.students[0], date=date(2026, 6, 30), status='Absent')
+        save_student_register(self.day, {
+            self.students[0].id: 'Present', self.students[1].id: 'Absent', self.students[2].id: 'Half Day',
+        })
+
+    def test_board_counts_in_one_grouped_query(self):
+        # The GROUP BY, plus the packed-history lookup for a past month
+        with self.assertNumQueries(2):
+            board = daily_board(self.day)
+        one, two = board['classes']
+        self.assertEqual((one['students'], one['present'], one['absent'], one['half_day']), (4, 1, 1, 1))
+        self.assertEqual(one['unmarked'], 1)
+        self.assertEqual([row['id'] for row in board['pending_classes']], [self.class_two.id])
+        with self.assertNumQueries(0):
+            daily_board(self.day)
+
+    def test_marking_invalidates_board(self):
+        daily_board(self.day)
+        save_student_register(self.day, {self.students[3].id: 'Leave'})
+        self.assertEqual(daily_board(self.day)['totals']['leave'], 1)
+
+
+class AttendanceRegisterMatrixTests(TestCase):
+    def setUp(self):
+        self.school_class = make_class()
+        self.students = [make_student(self.school_class, f'Student {i:02d}') for i in range(60)]
+        for day in range(1, 32):
+            save_student_register(date(2026, 7, day), {
+                student.id: 'Absent' if (student.id + day) % 10 == 0 else 'Present' for student in self.students
+            })
+        save_student_register(date(2026, 8, 1), {self.students[0].id: 'Leave'})
+        self.teacher = make_teacher(class_section=self.school_class)
+        login(self.client, 'teacher', teacher_id=self.teacher.id)
+
+    def test_matrix_and_totals(self):
+        # Roster, attendance rows and packed months
+        with self.assertNumQueries(3):
+            register = monthly_register(self.school_class.id, 2026, 7)
+        self.assertEqual(len(register.rows), 60)
+        self.assertEqual(len(register.days), 31)
+        row = register.rows[0]
+        self.assertEqual(row['totals']['P'] + row['totals']['A'], 31)
+        self.assertEqual(row['totals']['L'], 0)
+        self.assertEqual(sum(totals['A'] for totals in register.day_totals), 31 * 6)
+
+    def test_csv_export(self):
+        response = self.client.get('/teacher/student-attendance/register/?month=2026-07&format=csv')
+        rows = list(csv.reader(io.StringIO(response.content.decode())))
+        self.assertEqual(rows[0][:3], ['Student', '1', '2'])
+        self.assertEqual(len(rows), 1 + 60 + 4)
+
+    def test_page_renders(self):
+        response = self.client.get('/teacher/student-attendance/register/?month=2026-07')
+        self.assertContains(response, 'July 2026')
+        self.assertEqual(len(response.context['register'].rows), 60)
+
+
+class PackedAttendanceTests(TestCase):
+    def setUp(self):
+        self.school_class = make_class()
+        self.students = [make_student(self.school_class, f'Student {i}') for i in range(3)]
+        self.statuses = ['Present', 'Absent', 'Leave', 'Half Day']
+        for day in range(1, 32):
+            save_student_register(date(2026, 7, day), {
+                student.id: self.statuses[(student.id + day) % 4] for student in self.students
+            })
+
+    def test_pack_round_trip(self):
+        days = {1: 'Half Day', 2: 'Absent', 31: 'Leave', 15: 'Present'}
+        self.assertEqual(unpack(*pack(days)), days)
+        self.assertEqual(unpack(*pack({2: 'Present'}, *pack(days)))[2], 'Present')
+
+    def test_readers_see_packed_history(self):
+        register = monthly_register(self.school_class.id, 2026, 7)
+        board = daily_board(date(2026, 7, 4))
+        self.assertEqual(pack_month(2026, 7), (93, 3))
+        self.assertFalse(StudentAttendance.objects.exists())
+        self.assertEqual(monthly_register(self.school_class.id, 2026, 7).rows, register.rows)
+        invalidate_daily_board(date(2026, 7, 4))
+        self.assertEqual(daily_board(date(2026, 7, 4)), board)
+
+    def test_class_attendance_page_reads_packed_month(self):
+        pack_month(2026, 7)
+        login(self.client, 'teacher', teacher_id=make_teacher(class_section=self.school_class).id)
+        response = self.client.get('/teacher/student-attendance/?date=2026-07-04')
+        expected = [self.statuses[(student.id + 4) % 4] for student in self.students]
+        self.assertEqual([item['status'] for item in response.context['students_with_attendance']], expected)
+        self.assertEqual(response.context['present_count'], expected.count('Present'))
+        self.assertEqual(response.context['halfday_count'], expected.count('Half Day'))
+
+    def test_packing_deletes_only_that_month_without_signals(self):
+        save_student_register(date(2026, 8, 1), {self.students[0].id: 'Present'})
+        summaries = list(StudentAttendanceSummary.objects.order_by('pk').values())
+        with patch('core.signals.rewind_absence_streaks') as rewind:
+            pack_month(2026, 7)
+        rewind.assert_not_called()
+        self.assertEqual(list(StudentAttendance.objects.values_list('date', flat=True)), [date(2026, 8, 1)])
+        self.assertEqual(list(StudentAttendanceSummary.objects.order_by('pk').values()), summaries)
+
+    def test_day_marked_during_packing_is_kept(self):
+        late = make_student(self.school_class, 'Late')
+        real_pack = pack
+
+        def pack_then_mark(*args):
+            if not StudentAttendance.objects.filter(student=late).exists():
+                StudentAttendance.objects.create(student=late, date=date(2026, 7, 9), status='Present')
+            return real_pack(*args)
+
+        with patch('core.attendance_archive.pack', side_effect=pack_then_mark):
+            self.assertEqual(pack_month(2026, 7, batch_size=40), (93, 3))
+        self.assertEqual(list(StudentAttendance.objects.values_list('student', 'date')), [(late.id, date(2026, 7, 9))])
+
+    def test_marking_a_packed_month_updates_it(self):
+        pack_month(2026, 7)
+        save_student_register(date(2026, 7, 4), {self.students[0].id: 'Absent'})
+        self.assertFalse(StudentAttendance.objects.exists())
+        register = monthly_register(self.school_class.id, 2026, 7)
+        self.assertEqual(register.rows[0]['cells'][3], 'A')
+
+    def test_command_packs_and_unpacks(self):
+        call_command('pack_attendance', stdout=io.StringIO())
+        self.assertEqual(StudentAttendanceMonth.objects.count(), 3)
+        call_command('pack_attendance', unpack=True, stdout=io.StringIO())
+        self.assertEqual(StudentAttendance.objects.count(), 93)
+        self.assertFalse(StudentAttendanceMonth.objects.exists())
+
+
+class TermAttendanceTests(TestCase):
+    def setUp(self):
+        self.school_class = make_class()
+        self.good, self.poor = make_student(self.school_class, 'Good'), make_student(self.school_class, 'Poor')
+        self.today = date(2026, 10, 18)
+        for day in range(1, 11):
+            save_student_register(date(2026, 7, day), {
+                self.good.id: 'Present',
+                self.poor.id: 'Half Day' if day % 2 else 'Absent',
+            })
+        # Before the term started, so never counted
+        save_student_register(date(2026, 3, 2), {self.poor.id: 'Present'})
+
+    def test_marking_keeps_monthly_summary_current(self):
+        save_student_register(date(2026, 7, 1), {self.poor.id: 'Leave'})
+        summary = StudentAttendanceSummary.objects.get(student=self.poor, year=2026, month=7)
+        self.assertEqual((summary.present, summary.absent, summary.leave, summary.half_day), (0, 5, 1, 4))
+        with self.captureOnCommitCallbacks(execute=True):
+            StudentAttendance.objects.filter(student=self.poor, date__month=3).delete()
+        self.assertFalse(StudentAttendanceSummary.objects.filter(student=self.poor, month=3).exists())
+
+    def test_term_percentage_weights_half_days(self):
+        self.assertEqual(term_start(self.today), date(2026, 4, 1))
+        with override_settings(ACADEMIC_YEAR_START_MONTH=11):
+            self.assertEqual(term_start(self.today), date(2025, 11, 1))
+        students = with_term_attendance(Student.objects.order_by('name'), self.today)
+        self.assertEqual([s.term_percentage for s in students], [100.0, 25.0])
+        self.assertEqual(list(attendance_shortfall(75, today=self.today)), [self.poor])
+        self.assertFalse(attendance_shortfall(20, today=self.today).exists())
+
+    def test_rebuild_matches_incremental_rollup_across_packed_months(self):
+        expected = set(StudentAttendanceSummary.objects.values_list('student', 'year', 'month', 'absent', 'half_day'))
+        pack_month(2026, 7)
+        StudentAttendanceSummary.objects.all().delete()
+        self.assertEqual(rebuild_attendance_summaries(), 3)
+        self.assertEqual(
+            set(StudentAttendanceSummary.objects.values_list('student', 'year', 'month', 'absent', 'half_day')), expected
+        )
+
+    def test_dashboards_and_shortfall_page(self):
+        today = date.today()
+        save_student_register(today, {self.good.id: 'Present', self.poor.id: 'Absent'})
+        teacher = make_teacher(class_section=self.school_class)
+        login(self.client, 'teacher', teacher_id=teacher.id)
+        self.assertContains(self.client.get('/teacher/dashboard/'), 'Class Attendance (term)')
+        login(self.client, 'admin', admin_id=1)
+        response = self.client.get('/admin/attendance/shortfall/', {'threshold': '50'})
+        self.assertContains(response, 'Poor')
+        self.assertNotContains(response, '<strong>Good</strong>')
+
+
+class AbsenceStreakTests(TestCase):
+    def setUp(self):
+        self.school_class = make_class()
+        self.absent, self.present = make_student(self.school_class, 'Absent'), make_student(self.school_class, 'Present')
+        # Thu 9 - Sat 11 July absent; Sunday 12 and the holiday on Monday 13 are skipped
+        for day in (9, 10, 11, 14):
+            self.mark(day, 'Absent')
+        Holiday.objects.create(date=date(2026, 7, 13), name='Monsoon break')
+
+    def mark(self, day, status):
+        save_student_register(date(2026, 7, day), {self.absent.id: status, self.present.id: 'Present'})
+
+    def test_streak_raises_extends_and_resolves_one_alert(self):
+        run = detect_absence_streaks(date(2026, 7, 11), min_days=3)
+        self.assertEqual((run.students, run.opened), (2, 1))
+        # Later runs continue from the stored streak instead of re-reading old rows
+        StudentAttendance.objects.filter(date__lte=date(2026, 7, 11)).update(status='Present')
+        detect_absence_streaks(date(2026, 7, 14), min_days=3)
+        alert = AbsenceAlert.objects.get()
+        self.assertEqual((alert.started_on, alert.last_absent_on, alert.days), (date(2026, 7, 9), date(2026, 7, 14), 4))
+
+        self.mark(15, 'Present')
+        run = detect_absence_streaks(date(2026, 7, 15), min_days=3)
+        self.assertEqual(run.resolved, 1)
+        self.assertFalse(open_absence_alerts(self.school_class.id).exists())
+
+    def test_late_edit_rewinds_the_streak(self):
+        detect_absence_streaks(date(2026, 7, 14), min_days=3)
+        self.mark(10, 'Present')
+        self.assertIsNone(AbsenceStreak.objects.get(student=self.absent).through_date)
+        run = detect_absence_streaks(date(2026, 7, 14), min_days=3)
+        self.assertEqual(run.resolved, 1)
+        self.assertEqual(AbsenceStreak.objects.get(student=self.absent).current, 2)
+
+    def test_teacher_dashboard_reads_alerts_in_one_query(self):
+        detect_absence_streaks(date(2026, 7, 14), min_days=3)
+        with self.assertNumQueries(1):
+            alerts = list(open_absence_alerts(self.school_class.id))
+        self.assertEqual([alert.student.name for alert in alerts], ['Absent'])
+        teacher = make_teacher(class_section=self.school_class)
+        login(self.client, 'teacher', teacher_id=teacher.id)
+        self.assertContains(self.client.get('/teacher/dashboard/'), 'Consecutive Absences')
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class PeopleImportTests(TestCase):
+    def setUp(self):
+        self.school_class = make_class('Class 5', 'B')
+        Subject.objects.create(subject_name='Maths', subject_code='MATH')
+
+    def upload(self, name, content):
+        return SimpleUploadedFile(name, content)
+
+    def student_csv(self):
+        return (
+            'Name,Father Name,Class,Section,Mobile,Admission Date,Monthly Fee,Password\n'
+            'Asha,Ram,Class 5,b,9000000001,2026-04-01,500,secret1\n'
+            'Ravi,Mohan,Class 9,A,9000000002,2026-04-01,500,\n'
+            'Gita,Shyam,Class 5,B,9000000003,1st April,500,\n'
+        ).encode()
+
+    def test_csv_rows_are_validated_and_reported(self):
+        report = import_people('student', read_rows(self.upload('s.csv', self.student_csv())), dry_run=True)
+        self.assertEqual((report.total, report.valid), (3, 1))
+        self.assertEqual([number for number, _ in report.errors], [3, 4])
+        self.assertIn('class: no class Class 9 - A', report.errors[0][1])
+        self.assertFalse(Student.objects.exists())
+
+        report = import_people('student', read_rows(self.upload('s.csv', self.student_csv())), workers=0)
+        student = Student.objects.get()
+        self.assertEqual((report.created, student.student_class, student.is_active), (1, self.school_class, True))
+        self.assertTrue(student.check_password('secret1'))
+
+    def test_xlsx_teachers_hashed_in_worker_pool(self):
+        header = ['Name', 'Email', 'Mobile', 'Joining Date', 'Subjects', 'Class', 'Section', 'Monthly Salary',
+                  'Password']
+        rows = [
+            ['Meena', 'meena@example.com', '9000000004', 46113, 'math', 'Class 5', 'B', 20000, 'pass-1'],
+            ['Kiran', 'MEENA@example.com', '9000000005', '2026-04-01', '', '', '', 18000, 'pass-2'],
+            ['Arun', 'arun@example.com', '9000000006', '2026-04-01', 'SCI', '', '', 18000, ''],
+        ]
+        content = b''.join(stream_xlsx(header, rows, title='Teachers'))
+        report = import_people('teacher', read_rows(self.upload('t.xlsx', content)), workers=2, chunk_size=1)
+        self.assertEqual(report.created, 1)
+        self.assertIn('email: meena@example.com is already used by another teacher', report.errors[0][1])
+        self.assertEqual(report.errors[1][1], ['subjects: no subject with code sci', 'password: required'])
+        teacher = Teacher.objects.get()
+        self.assertEqual((teacher.joining_date, teacher.class_section), (date(2026, 4, 1), self.school_class))
+        self.assertEqual([s.subject_code for s in teacher.subjects.all()], ['MATH'])
+        self.assertTrue(teacher.check_password('pass-1'))
+
+    def test_import_view_checks_then_imports(self):
+        login(self.client, 'admin', admin_id=1)
+        response = self.client.post(
+            '/admin/students/import/', {'file': self.upload('s.csv', self.student_csv()), 'action': 'check'}
+        )
+        self.assertContains(response, '1 students would be created')
+        self.assertFalse(Student.objects.exists())
+        self.client.post(
+            '/admin/students/import/', {'file': self.upload('s.csv', self.student_csv()), 'action': 'import'}
+        )
+        self.assertEqual(Student.objects.count(), 1)
+
+
+class PhotoZipTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        school_class = make_class()
+        self.student = make_student(school_class, 'Asha')
+        self.teacher = make_teacher('Meena')
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def photo_zip(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            archive.writestr(f'Student-{self.student.pk}.png', png_upload(size=(1920, 1080)).read())
+            archive.writestr(f'teachers/{self.teacher.pk}.jpg', png_upload(size=(300, 400)).read())
+            archive.writestr('student-9999.jpg', png_upload().read())
+            archive.writestr('class photo.jpg', png_upload().read())
+            archive.writestr('notes.txt', b'hello')
+            archive.writestr(f'student_{self.student.pk}.png', b'not an image')
+        buffer.seek(0)
+        return buffer
+
+    def test_naming_convention(self):
+        self.assertEqual(match_photo_name('photos/Teacher_7.JPG'), ('teacher', 7))
+        self.assertEqual(match_photo_name('students/12.png'), ('student', 12))
+        self.assertIsNone(match_photo_name('12.png'))
+
+    def test_photos_are_cropped_and_attached(self):
+        report = ingest_photo_zip(self.photo_zip(), dry_run=True)
+        self.assertEqual(report.summary(), '2 photos would be attached, 4 files not used')
+        self.student.refresh_from_db()
+        self.assertFalse(self.student.photo)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            report = ingest_photo_zip(self.photo_zip(), workers=2)
+        self.assertEqual(len(report.attached), 2)
+        self.assertEqual(dict(report.unmatched)['student-9999.jpg'], 'no student #9999')
+        for person in (self.student, self.teacher):
+            person.refresh_from_db()
+            with Image.open(person.photo.path) as photo:
+                self.assertEqual((photo.size, photo.format), (ID_PHOTO_SIZE, 'JPEG'))
+
+    def test_reimport_replaces_the_old_file(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_photo_zip(self.photo_zip(), workers=0)
+        self.student.refresh_from_db()
+        old_path = self.student.photo.path
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_photo_zip(self.photo_zip(), workers=0)
+        self.student.refresh_from_db()
+        self.assertNotEqual(self.student.photo.path, old_path)
+        self.assertFalse(os.path.exists(old_path))
+
+
+class IdCardSheetTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.school_class = make_class()
+        self.students = [make_student(self.school_class, f'Student {i:02d}') for i in range(10)]
+        make_student(make_class('Class 2'), 'Other Class')
+        self.students[0].photo = png_upload('big.png', size=(1600, 1200))
+        self.students[0].save()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_sheets_hold_nine_cards_with_thumbnails(self):
+        with override_settings(IMAGE_DERIVATIVE_WORKERS=0), self.captureOnCommitCallbacks(execute=True):
+            self.students[0].save()
+        thumbnail = id_card_thumbnail_name(self.students[0].photo.name)
+        with Image.open(os.path.join(self.media_root, thumbnail)) as image:
+            self.assertEqual(image.size, (240, 280))
+        with self.assertNumQueries(1):
+            students = list(id_card_students(self.school_class.id))
+        with self.assertNumQueries(0):
+            document = ''.join(stream_id_card_sheets(students))
+        self.assertEqual(document.count('class="sheet"'), 2)
+        self.assertEqual(document.count('class="id-card"'), 10)
+        self.assertIn('Sheet 2 of 2', document)
+        self.assertEqual(document.count('data:image/jpeg;base64,'), 1)
+        self.assertIn(f'Academic Year {AcademicYear(start_year=academic_year()).label}', document)
+
+    def test_missing_thumbnail_prints_a_placeholder_without_building_it(self):
+        document = ''.join(stream_id_card_sheets(id_card_students(self.school_class.id)))
+        self.assertNotIn('data:image', document)
+        self.assertEqual(document.count('class="photo-placeholder"'), 10)
+        thumbnail = id_card_thumbnail_name(self.students[0].photo.name)
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, thumbnail)))
+        call_command('print_id_cards', os.path.join(self.media_root, 'cards.html'), workers=0, stdout=io.StringIO())
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, thumbnail)))
+
+    def test_migration_backfills_thumbnails_for_existing_photos(self):
+        migration = import_module('core.migrations.0019_id_card_thumbnails')
+        migration.build_id_card_thumbnails(django_apps, None)
+        thumbnail = id_card_thumbnail_name(self.students[0].photo.name)
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, thumbnail)))
+        document = ''.join(stream_id_card_sheets(id_card_students(self.school_class.id)))
+        self.assertEqual(document.count('data:image/jpeg;base64,'), 1)
+
+    def test_view_streams_the_class_sheets(self):
+        login(self.client, 'admin', admin_id=1)
+        response = self.client.get('/admin/students/id-cards/', {'class': self.school_class.id})
+        document = b''.join(response.streaming_content).decode()
+        self.assertIn('ID Cards - Class 1', document)
+        self.assertNotIn('Other Class', document)
+
+
+class PromotionTests(TestCase):
+    def setUp(self):
+        self.class_1, self.class_2, self.class_3 = (make_class(f'Class {n}') for n in (1, 2, 3))
+        make_class('Nursery')
+        self.first = make_student(self.class_1, 'First')
+        self.repeat = make_student(self.class_1, 'Repeat')
+        self.second = make_student(self.class_2, 'Second')
+        self.leaver = make_student(self.class_3, 'Leaver')
+        self.left_earlier = make_student(self.class_1, 'Left Earlier', is_active=False)
+        self.mapping = {self.class_1.id: self.class_2.id, self.class_2.id: self.class_3.id, self.class_3.id: GRADUATE}
+        reconcile_counters()
+
+    def class_of(self, student):
+        student.refresh_from_db()
+        return student.student_class_id
+
+    def test_suggested_mapping_follows_class_numbers(self):
+        self.assertEqual(suggest_mapping(), self.mapping)
+
+    def test_preview_counts(self):
+        with self.assertNumQueries(2):
+            preview = preview_promotion(self.mapping, held_back=[self.repeat.id])
+        self.assertEqual([(row.students, row.held_back) for row in preview.rows], [(2, 1), (1, 0), (1, 0)])
+        self.assertEqual(preview.summary(), '2 promoted, 1 graduated, 1 held back')
+
+    def test_apply_moves_chained_classes_in_one_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            batch = apply_promotion(self.mapping, held_back=[self.repeat.id], label='Session 2027')
+        student_updates = [q for q in queries if q['sql'].startswith('UPDATE "core_student"')]
+        self.assertEqual(len(student_updates), 2)
+        self.assertEqual((batch.promoted, batch.graduated, batch.held_back), (2, 1, 1))
+        self.assertEqual(self.class_of(self.first), self.class_2.id)
+        self.assertEqual(self.class_of(self.second), self.class_3.id)
+        self.assertEqual(self.class_of(self.repeat), self.class_1.id)
+        self.assertEqual(self.class_of(self.left_earlier), self.class_1.id)
+        self.leaver.refresh_from_db()
+        self.assertFalse(self.leaver.is_active)
+        self.assertEqual(self.leaver.student_class_id, self.class_3.id)
+        self.assertEqual(PromotionRecord.objects.filter(batch=batch).count(), 4)
+        self.assertEqual(dashboard_counters()['total_students'], 3)
+        self.assertEqual(reconcile_counters(), {})
+
+    def test_graduates_drop_off_the_defaulters_list(self):
+        refresh_balances()
+        self.assertIn(self.leaver.id, [balance.student_id for balance in defaulters(1)])
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_promotion(self.mapping)
+        self.assertFalse(StudentBalance.objects.filter(student=self.leaver).exists())
+        self.assertNotIn(self.leaver.id, [balance.student_id for balance in defaulters(1)])
+        self.assertIn(self.first.id, [balance.student_id for balance in defaulters(1)])
+
+    def test_rollback_restores_the_latest_batch_only(self):
+        earlier = apply_promotion({self.class_3.id: GRADUATE})
+        batch = apply_promotion(self.mapping)
+        with self.assertRaises(PromotionError):
+            rollback_promotion(earlier)
+        with self.captureOnCommitCallbacks(execute=True):
+            rollback_promotion(batch)
+        self.assertEqual(self.class_of(self.first), self.class_1.id)
+        self.assertEqual(self.class_of(self.second), self.class_2.id)
+        self.assertEqual(self.class_of(self.leaver), self.class_3.id)
+        self.assertEqual(reconcile_counters(), {})
+        with self.captureOnCommitCallbacks(execute=True):
+            rollback_promotion(earlier)
+        self.leaver.refresh_from_db()
+        self.assertTrue(self.leaver.is_active)
+        self.assertTrue(StudentBalance.objects.filter(student=self.leaver).exists())
+        self.assertEqual(reconcile_counters(), {})
+
+    def test_view_previews_then_applies(self):
+        login(self.client, 'admin', admin_id=1)
+        data = {f'target_{class_id}': target for class_id, target in self.mapping.items()}
+        response = self.client.post('/admin/classes/promote/', {**data, 'action': 'preview'})
+        self.assertEqual(response.context['preview'].promoted, 3)
+        response = self.client.post(
+            '/admin/classes/promote/', {**data, 'action': 'apply', 'held_back': [self.repeat.id]}
+        )
+        self.assertRedirects(response, '/admin/classes/promote/')
+        self.assertEqual(self.class_of(self.repeat), self.class_1.id)
+        self.assertEqual(self.class_of(self.first), self.class_2.id)
+
+
+class AcademicYearArchiveTests(TestCase):
+    def setUp(self):
+        self.student = make_student(make_class())
+        teacher = make_teacher()
+        pay = dict(student=self.student, paid_amount=500, month='June', year=2025)
+        self.old_fee = StudentPayment.objects.create(payment_date=date(2025, 6, 1), status='Paid', **pay)
+        self.pending_fee = StudentPayment.objects.create(payment_date=date(2025, 7, 1), status='Pending', **pay)
+        self.new_fee = StudentPayment.objects.create(
+            student=self.student, paid_amount=500, payment_date=date(2026, 5, 1), status='Paid', month='May', year=2026,
+        )
+        TeacherPayment.objects.create(
+            teacher=teacher, paid_amount=900, payment_date=date(2025, 6, 30), status='Paid', month='June', year=2025,
+        )
+        TeacherAttendance.objects.create(teacher=teacher, date=date(2025, 6, 2), status='Present')
+        StudentAttendance.objects.create(student=self.student, date=date(2025, 6, 2), status='Absent')
+        StudentAttendance.objects.create(student=self.student, date=date(2026, 6, 2), status='Present')
+        for name, status in [('Maths', 'Verified'), ('Hindi', 'Verified'), ('English', 'Pending')]:
+            Result.objects.create(
+                student=self.student, subject=Subject.objects.create(subject_name=name, subject_code=name),
+                exam_name='Annual', marks_obtained=Decimal('60'), total_marks=Decimal('100'),
+                exam_date=date(2026, 3, 10), verification_status=status,
+            )
+        rebuild_exam_summaries()
+        refresh_balances()
+        reconcile_counters()
+
+    def test_academic_year_bounds(self):
+        self.assertEqual(academic_year(date(2026, 3, 31)), 2025)
+        self.assertEqual(academic_year(date(2026, 4, 1)), 2026)
+        self.assertEqual(academic_year_range(2025), (date(2025, 4, 1), date(2026, 3, 31)))
+        with self.assertRaises(ArchiveError):
+            archive_academic_year(academic_year())
+
+    def test_archive_moves_settled_rows_and_keeps_totals(self):
+        paid_before = StudentBalance.objects.get(student=self.student).total_paid
+        report = archive_academic_year(2025)
+
+        self.assertEqual(
+            set(StudentPayment.objects.values_list('id', flat=True)), {self.pending_fee.id, self.new_fee.id}
+        )
+        self.assertEqual(list(ArchivedStudentPayment.objects.values_list('id', flat=True)), [self.old_fee.id])
+        self.assertEqual(Result.objects.get().verification_status, 'Pending')
+        self.assertEqual(ArchivedResult.objects.filter(academic_year=2025).count(), 2)
+        self.assertFalse(TeacherPayment.objects.exists() or TeacherAttendance.objects.exists())
+        self.assertEqual(list(StudentAttendance.objects.values_list('date', flat=True)), [date(2026, 6, 2)])
+        self.assertTrue(StudentAttendanceMonth.objects.filter(year=2025, month=6).exists())
+        self.assertEqual(AcademicYear.objects.get(start_year=2025).archived_rows, report.moved)
+
+        self.assertEqual(reconcile_counters(), {})
+        refresh_balances()
+        self.assertEqual(StudentBalance.objects.get(student=self.student).total_paid, paid_before)
+        rebuild_exam_summaries()
+        self.assertEqual(ExamSummary.objects.get(student=self.student).total_subjects, 2)
+        self.assertFalse(any(archive_academic_year(2025).moved.values()))
+
+    def test_partial_payments_stay_live(self):
+        partial = StudentPayment.objects.create(
+            student=self.student, paid_amount=200, due_amount=300, payment_date=date(2025, 8, 1), status='Partial',
+            month='August', year=2025,
+        )
+        archive_academic_year(2025)
+        self.assertTrue(StudentPayment.objects.filter(pk=partial.pk).exists())
+        self.assertFalse(ArchivedStudentPayment.objects.filter(pk=partial.pk).exists())
+
+    def test_archived_exams_leave_the_result_pickers(self):
+        self.assertEqual(result_pickers()['exam_names'], ['Annual'])
+        archive_academic_year(2025)
+        self.assertEqual(result_pickers(), {'exam_names': [], 'students': []})
+
+    def test_archive_in_small_batches_skips_delete_signals(self):
+        with patch('core.signals.refresh_balances') as refresh:
+            report = archive_academic_year(2025, batch_size=1)
+        refresh.assert_not_called()
+        self.assertEqual(report.moved['Results'], 2)
+        self.assertEqual(ArchivedStudentPayment.objects.get().id, self.old_fee.id)
+        self.assertEqual(Result.objects.count(), 1)
+        self.assertEqual(reconcile_counters(), {})
+
+    def test_history_and_report_cards_union_the_archive(self):
+        archive_academic_year(2025)
+        login(self.client, 'student', student_id=self.student.id)
+        response = self.client.get('/student/payments/')
+        self.assertEqual([payment['id'] for payment in response.context['payments']], [
+            self.new_fee.id, self.pending_fee.id, self.old_fee.id,
+        ])
+        response = self.client.get(f'/results/pdf/{self.student.id}/', {'exam': 'Annual'})
+        self.assertEqual(len(response.context['results']), 2)
+
+        login(self.client, 'admin')
+        rows = lambda query: list(csv.reader(io.StringIO(
+            b''.join(self.client.get(f'/admin/fees/export/?{query}').streaming_content).decode('utf-8-sig')
+        )))[1:]
+        self.assertEqual(len(rows('year=2025')), 1)
+        self.assertEqual(
+            [row[0] for row in rows('year=2025&archived=1')], [str(self.pending_fee.id), str(self.old_fee.id)]
+        )
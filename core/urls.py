@@ -15,23 +15,34 @@ urlpatterns = [
     # Student Management (Admin)
     path('admin/students/', views.student_list, name='student_list'),
     path('admin/students/add/', views.student_add, name='student_add'),
+    path('admin/students/import/', views.student_import, name='student_import'),
+    path('admin/photos/import/', views.photo_import, name='photo_import'),
     path('admin/students/<int:pk>/edit/', views.student_edit, name='student_edit'),
     path('admin/students/<int:pk>/delete/', views.student_delete, name='student_delete'),
     path('admin/students/<int:pk>/id-card/', views.student_id_card, name='student_id_card'),
+    path('admin/students/id-cards/', views.student_id_cards, name='student_id_cards'),
     
     # Teacher Management (Admin)
     path('admin/teachers/', views.teacher_list, name='teacher_list'),
     path('admin/teachers/add/', views.teacher_add, name='teacher_add'),
+    path('admin/teachers/import/', views.teacher_import, name='teacher_import'),
     path('admin/teachers/<int:pk>/edit/', views.teacher_edit, name='teacher_edit'),
     path('admin/teachers/<int:pk>/delete/', views.teacher_delete, name='teacher_delete'),
     
     # Fee Management (Admin)
     path('admin/fees/', views.fee_collection, name='fee_collection'),
     path('admin/fees/add/', views.fee_add, name='fee_add'),
+    path('admin/fees/receipts/', views.fee_receipts, name='fee_receipts'),
+    path('admin/fees/export/', views.fee_export, name='fee_export'),
+    path('admin/fees/generate/', views.fee_generate, name='fee_generate'),
+    path('admin/fees/defaulters/', views.fee_defaulters, name='fee_defaulters'),
     path('admin/fees/<int:pk>/edit/', views.fee_edit, name='fee_edit'),
     
     # Salary Management (Admin)
     path('admin/salaries/', views.salary_management, name='salary_management'),
+    path('admin/salaries/payroll/', views.salary_payroll, name='salary_payroll'),
+    path('admin/salaries/slips/', views.salary_slips, name='salary_slips'),
+    path('admin/salaries/export/', views.salary_export, name='salary_export'),
     path('admin/salaries/add/', views.salary_add, name='salary_add'),
     path('admin/salaries/<int:pk>/edit/', views.salary_edit, name='salary_edit'),
     
@@ -44,8 +55,12 @@ urlpatterns = [
     path('admin/classes/', views.class_list, name='class_list'),
     path('admin/classes/add/', views.class_add, name='class_add'),
     path('admin/classes/<int:pk>/delete/', views.class_delete, name='class_delete'),
+    path('admin/classes/promote/', views.class_promotion, name='class_promotion'),
+    path('admin/classes/promote/<int:pk>/rollback/', views.class_promotion_rollback, name='class_promotion_rollback'),
     
     # Teacher Attendance Management (Admin)
+    path('admin/attendance/board/', views.attendance_board, name='attendance_board'),
+    path('admin/attendance/shortfall/', views.attendance_shortfall_list, name='attendance_shortfall'),
     path('admin/teacher-attendance/', views.teacher_attendance_list, name='teacher_attendance_list'),
     path('admin/teacher-attendance/mark/', views.teacher_attendance_mark, name='teacher_attendance_mark'),
     
@@ -60,14 +75,17 @@ urlpatterns = [
     path('teacher/students/', views.teacher_students, name='teacher_students'),
     path('teacher/profile/', views.teacher_profile, name='teacher_profile'),
     path('teacher/student-attendance/', views.student_attendance_list, name='student_attendance_list'),
+    path('teacher/student-attendance/register/', views.student_attendance_register, name='student_attendance_register'),
     path('teacher/student-attendance/mark/', views.student_attendance_mark, name='student_attendance_mark'),
     
     # Results Management
     path('results/', views.result_list, name='result_list'),
     path('results/pdf/<int:student_id>/', views.result_pdf, name='result_pdf'),
     path('teacher/results/submit/', views.result_submit, name='result_submit'),
+    path('teacher/results/grid/', views.result_grid, name='result_grid'),
     path('teacher/results/<int:pk>/edit/', views.result_edit, name='result_edit'),
     path('admin/results/verify/', views.result_verify, name='result_verify'),
+    path('admin/results/bulk/', views.result_bulk_verify, name='result_bulk_verify'),
     path('admin/results/<int:pk>/approve/', views.result_approve, name='result_approve'),
     path('admin/results/<int:pk>/reject/', views.result_reject, name='result_reject'),
     path('admin/results/<int:pk>/delete/', views.result_delete, name='result_delete'),
@@ -75,6 +93,9 @@ urlpatterns = [
     # Result PDF Download (Teacher Portal)
     path('teacher/results/download/', views.result_download, name='result_download'),
     path('teacher/results/pdf/<int:student_id>/', views.result_pdf, name='teacher_result_pdf'),
+    path('results/export/', views.result_export, name='result_export'),
+    path('results/export/<str:token>/progress/', views.result_export_progress, name='result_export_progress'),
+    path('results/export/<str:token>/cancel/', views.result_export_cancel, name='result_export_cancel'),
     
     # Gallery Management
     path('admin/gallery/', views.gallery_list, name='gallery_list'),
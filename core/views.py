@@ -1,21 +1,60 @@
+import csv
+import re
+import uuid
+import zipfile
+from collections import Counter
+
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib import messages
 from django.db.models import Sum, Count
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.text import slugify
 from decimal import Decimal
 from .models import (
     Admin, Teacher, Student, SchoolClass, Subject,
-    TeacherPayment, StudentPayment, TeacherAttendance, StudentAttendance,
-    Notice, Event, Exam, SchoolInfo, GalleryImage, Result
+    TeacherPayment, StudentPayment, TeacherAttendance,
+    Notice, Event, Exam, SchoolInfo, GalleryImage, Result, ExamSummary, PromotionBatch, ArchivedResult,
+    MONTH_NAMES, parse_month
 )
 from .forms import (
     LoginForm, TeacherForm, StudentForm, TeacherPaymentForm, 
     StudentPaymentForm, NoticeForm, ClassForm, SubjectForm
 )
+from .academic_years import PAYMENT_HISTORY_FIELDS, total_with_archive, with_archive
+from .counters import dashboard_counters, recent_payments
+from .documents import (
+    fee_receipt_rows, id_card_students, rendered_documents, salary_slip_rows, stream_documents_zip,
+    stream_id_card_sheets, stream_print_document
+)
+from .fees import defaulters, generate_fee_invoices, student_balance
+from .images import PHOTO_EXTENSIONS, discard_gallery_derivatives, ingest_photo_zip, queue_gallery_derivatives
+from .imports import IMPORT_KINDS, UNREADABLE_FILE_ERRORS, import_people, read_rows
+from .ledgers import (
+    filter_payments, ledger_page, ledger_rows, ledger_totals, stream_csv, stream_xlsx
+)
+from .page_cache import public_page
+from .promotions import (
+    GRADUATE, PromotionError, apply_promotion, latest_batch, preview_promotion, read_mapping, rollback_promotion,
+    suggest_mapping
+)
+from .payroll import DEDUCTIBLE_STATUSES, default_deductions, run_payroll
+from .results import (
+    ExportProgress, MarksGrid, bulk_verify, pending_results_matching,
+    refresh_exam_summaries, report_card_context, result_pickers, stream_report_cards_zip,
+    submitted_cells, verified_results_page
+)
+from .attendance import (
+    STATUS_CODES, RegisterError, attendance_shortfall, attendance_threshold, daily_board, iter_student_statuses,
+    monthly_register, open_absence_alerts, read_register, save_student_register, save_teacher_register, term_start,
+    with_term_attendance
+)
 
 
 # ===================== HOME & AUTH =====================
 
+@public_page
 def home(request):
     """Landing page with portfolio, login options, and results"""
     # Get or create school info
@@ -135,25 +174,14 @@ def admin_dashboard(request):
     if request.session.get('user_type') != 'admin':
         return redirect('admin_login')
     
-    # Financial calculations
-    total_revenue = StudentPayment.objects.filter(status='Paid').aggregate(
-        total=Sum('paid_amount'))['total'] or Decimal('0')
-    total_spend = TeacherPayment.objects.filter(status='Paid').aggregate(
-        total=Sum('paid_amount'))['total'] or Decimal('0')
+    # Running totals maintained by core.counters (one query)
+    counters = dashboard_counters()
+    total_revenue = counters['total_revenue']
+    total_spend = counters['total_spend']
     net_income = total_revenue - total_spend
     
-    # Counts
-    total_students = Student.objects.filter(is_active=True).count()
-    total_teachers = Teacher.objects.filter(is_active=True).count()
-    total_classes = SchoolClass.objects.count()
-    
-    # Recent payments
-    recent_fee_payments = StudentPayment.objects.order_by('-payment_date')[:5]
-    recent_salary_payments = TeacherPayment.objects.order_by('-payment_date')[:5]
-    
-    # Pending payments
-    pending_fees = StudentPayment.objects.filter(status='Pending').count()
-    pending_salaries = TeacherPayment.objects.filter(status='Pending').count()
+    # Recent payments (cached between changes)
+    recent_fee_payments, recent_salary_payments = recent_payments()
     
     # Recent notices
     recent_notices = Notice.objects.filter(is_active=True)[:5]
@@ -162,13 +190,13 @@ def admin_dashboard(request):
         'total_revenue': total_revenue,
         'total_spend': total_spend,
         'net_income': net_income,
-        'total_students': total_students,
-        'total_teachers': total_teachers,
-        'total_classes': total_classes,
+        'total_students': int(counters['total_students']),
+        'total_teachers': int(counters['total_teachers']),
+        'total_classes': int(counters['total_classes']),
         'recent_fee_payments': recent_fee_payments,
         'recent_salary_payments': recent_salary_payments,
-        'pending_fees': pending_fees,
-        'pending_salaries': pending_salaries,
+        'pending_fees': int(counters['pending_fees']),
+        'pending_salaries': int(counters['pending_salaries']),
         'recent_notices': recent_notices,
     }
     return render(request, 'admin_portal/dashboard.html', context)
@@ -223,6 +251,69 @@ def student_add(request):
     return render(request, 'admin_portal/student_form.html', {'form': form, 'title': 'Add Student'})
 
 
+def _people_import(request, kind, list_url):
+    """Upload a CSV/XLSX of people, preview it as a dry run, then import it"""
+    if request.session.get('user_type') != 'admin':
+        return redirect('admin_login')
+    
+    report = None
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        if not upload or not upload.name.lower().endswith(('.csv', '.xlsx')):
+            messages.error(request, 'Choose a .csv or .xlsx file')
+        else:
+            dry_run = request.POST.get('action') != 'import'
+            try:
+                report = import_people(kind, read_rows(upload), dry_run=dry_run)
+            except UNREADABLE_FILE_ERRORS:
+                messages.error(request, 'The file could not be read as CSV (UTF-8) or XLSX')
+            else:
+                if not dry_run and report.created:
+                    messages.success(request, report.summary())
+                    if not report.errors:
+                        return redirect(list_url)
+    
+    context = {
+        'kind': kind,
+        'title': f'Import {kind.title()}s',
+        'columns': IMPORT_KINDS[kind]['columns'],
+        'report': report,
+        'list_url': list_url,
+    }
+    return render(request, 'admin_portal/people_import.html', context)
+
+
+def photo_import(request):
+    """Attach student and teacher ID photos from a ZIP named by the student-<id>/teacher-<id> convention"""
+    if request.session.get('user_type') != 'admin':
+        return redirect('admin_login')
+    
+    report = None
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        if not upload or not upload.name.lower().endswith('.zip'):
+            messages.error(request, 'Choose a .zip file of photos')
+        else:
+            try:
+                report = ingest_photo_zip(upload, dry_run=request.POST.get('action') != 'import')
+            except zipfile.BadZipFile:
+                messages.error(request, 'The file is not a valid ZIP archive')
+            else:
+                if report.attached and not report.dry_run:
+                    messages.success(request, report.summary())
+    
+    context = {
+        'report': report,
+        'extensions': sorted(PHOTO_EXTENSIONS),
+    }
+    return render(request, 'admin_portal/photo_import.html', context)
+
+
+def student_import(request):
+    """Bulk-create students from a spreadsheet"""
+    return _people_import(request, 'student', 'student_list')
+
+
 def student_edit(request, pk):
     """Edit student"""
     if request.session.get('user_type') != 'admin':
@@ -266,6 +357,18 @@ def student_id_card(request, pk):
     return render(request, 'admin_portal/student_id_card.html', {'student': student})
 
 
+def student_id_cards(request):
+    """Printable A4 sheets of ID cards for a class, or the whole school"""
+    if request.session.get('user_type') != 'admin':
+        return redirect('admin_login')
+    
+    class_id = request.GET.get('class', '')
+    school_class = SchoolClass.objects.filter(pk=class_id).first() if class_id.isdigit() else None
+    title = f'ID Cards - {school_class}' if school_class else 'ID Cards - All Students'
+    students = id_card_students(school_class.id if school_class else None)
+    return StreamingHttpResponse(stream_id_card_sheets(students, title), content_type='text/html; charset=utf-8')
+
+
 # ===================== TEACHER MANAGEMENT =====================
 
 def teacher_list(request):
@@ -304,6 +407,11 @@ def teacher_add(request):
     return render(request, 'admin_portal/teacher_form.html', {'form': form, 'title': 'Add Teacher'})
 
 
+def teacher_import(request):
+    """Bulk-create teachers from a spreadsheet"""
+    return _people_import(request, 'teacher', 'teacher_list')
+
+
 def teacher_edit(request, pk):
     """Edit teacher"""
     if request.session.get('user_type') != 'admin':
@@ -346,20 +454,123 @@ def fee_collection(request):
     if request.session.get('user_type') != 'admin':
         return redirect('admin_login')
     
-    payments = StudentPayment.objects.all().select_related('student')
-    
-    # Filter by status
-    status = request.GET.get('status')
-    if status:
-        payments = payments.filter(status=status)
+    payments, filters = filter_payments('fees', request.GET)
+    totals, status_totals = ledger_totals(payments)
+    page = ledger_page(payments.select_related('student'), request.GET.get('page'), totals['count'])
+    query = request.GET.copy()
+    query.pop('page', None)
     
+    today = timezone.localdate()
     context = {
-        'payments': payments,
-        'selected_status': status
+        'payments': page,
+        'page_obj': page,
+        'page_query': query.urlencode(),
+        'totals': totals,
+        'status_totals': status_totals,
+        'payment_modes': [mode for mode, _ in StudentPayment.PAYMENT_MODE_CHOICES],
+        'selected_status': filters.get('status'),
+        'filters': filters,
+        'classes': SchoolClass.objects.all(),
+        'month_names': MONTH_NAMES,
+        'current_month': MONTH_NAMES[today.month - 1],
+        'current_year': today.year,
     }
     return render(request, 'admin_portal/fee_collection.html', context)
 
 
+def fee_export(request):
+    """Download the filtered fee ledger as CSV or XLSX"""
+    if request.session.get('user_type') != 'admin':
+        return redirect('admin_login')
+    
+    return _ledger_export(request, 'fees', 'Fee Payments')
+
+
+def fee_receipts(request):
+    """Printable fee receipts for every collection in a date range"""
+    if request.session.get('user_type') != 'admin':
+        return redirect('admin_login')
+    
+    date_from = parse_date(request.GET.get('date_from') or '')
+    date_to = parse_date(request.GET.get('date_to') or '') or date_from
+    if not date_from:
+        messages.error(request, 'Select the date range to print receipts for')
+        return redirect('fee_collection')
+    
+    title = f'Fee Receipts {date_from} to {date_to}'
+    return _documents_response(request, 'receipt', fee_receipt_rows(date_from, date_to), title)
+
+
+def _documents_response(request, kind, rows, title):
+    documents = rendered_documents(kind, rows.iterator())
+    if request.GET.get('format') == 'zip':
+        response = StreamingHttpResponse(stream_documents_zip(title, documents), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="{slugify(title)}.zip"'
+        return response
+    return StreamingHttpResponse(stream_print_document(title, documents), content_type='text/html; charset=utf-8')
+
+
+def _ledger_export(request, ledger, title):
+    payments, filters = filter_payments(ledger, request.GET)
+    archived = None
+    if request.GET.get('archived'):
+        archived, _ = filter_payments(ledger, request.GET, archived=True)
+    header, rows = ledger_rows(ledger, payments, archived)
+    filename = slugify(' '.join([title] + [str(value) for value in filters.values()]))
+    
+    if request.GET.get('format') == 'xlsx':
+        response = StreamingHttpResponse(
+            stream_xlsx(header, rows, title=title),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}.xlsx"'
+    else:
+        response = StreamingHttpResponse(stream_csv(header, rows), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def fee_generate(request):
+    """Generate the month's Pending fee rows for all active students"""
+    if request.session.get('user_type') != 'admin':
+        return redirect('admin_login')
+    
+    if request.method == 'POST':
+        month_number = parse_month(request.POST.get('month'))
+        try:
+            year = int(request.POST.get('year'))
+        except (TypeError, ValueError):
+            year = None
+        if not month_number or not year:
+            messages.error(request, 'Select a valid month and year')
+        else:
+            report = generate_fee_invoices(month_number, year)
+            if report.already_completed:
+                messages.warning(request, report.summary())
+            else:
+                messages.success(request, report.summary())
+    return redirect('fee_collection')
+
+
+def fee_defaulters(request):
+    """Students owing more than N months of fees, read from StudentBalance"""
+    if request.session.get('user_type') != 'admin':
+        return redirect('admin_login')
+    
+    try:
+        min_months = max(int(request.GET.get('months', 2)), 0)
+    except ValueError:
+        min_months = 2
+    
+    balances = defaulters(min_months)
+    context = {
+        'balances': balances,
+        'min_months': min_months,
+        'total_outstanding': balances.aggregate(total=Sum('outstanding'))['total'] or Decimal('0'),
+    }
+    return render(request, 'admin_portal/fee_defaulters.html', context)
+
+
 def fee_add(request):
     """Add new fee payment"""
     if request.session.get('user_type') != 'admin':
@@ -403,20 +614,95 @@ def salary_management(request):
     if request.session.get('user_type') != 'admin':
         return redirect('admin_login')
     
-    payments = TeacherPayment.objects.all().select_related('teacher')
-    
-    # Filter by status
-    status = request.GET.get('status')
-    if status:
-        payments = payments.filter(status=status)
+    payments, filters = filter_payments('salaries', request.GET)
+    totals, status_totals = ledger_totals(payments)
+    page = ledger_page(payments.select_related('teacher'), request.GET.get('page'), totals['count'])
+    query = request.GET.copy()
+    query.pop('page', None)
     
     context = {
-        'payments': payments,
-        'selected_status': status
+        'payments': page,
+        'page_obj': page,
+        'page_query': query.urlencode(),
+        'totals': totals,
+        'status_totals': status_totals,
+        'payment_modes': [mode for mode, _ in TeacherPayment.PAYMENT_MODE_CHOICES],
+        'selected_status': filters.get('status'),
+        'filters': filters,
+        'classes': SchoolClass.objects.all(),
+        'month_names': MONTH_NAMES,
+        'current_month_number': timezone.localdate().month,
     }
     return render(request, 'admin_portal/salary_management.html', context)
 
 
+def salary_export(request):
+    """Download the filtered salary ledger as CSV or XLSX"""
+    if request.session.get('user_type') != 'admin':
+        return redirect('admin_login')
+    
+    return _ledger_export(request, 'salaries', 'Salary Payments')
+
+
+def salary_payroll(request):
+    """Preview and run the monthly payroll from teacher attendance"""
+    if request.session.get('user_type') != 'admin':
+        return redirect('admin_login')
+    
+    today = timezone.localdate()
+    deductions = default_deductions()
+    month_number, year, report = today.month, today.year, None
+    
+    if request.method == 'POST':
+        month_number = parse_month(request.POST.get('month'))
+        try:
+            year = int(request.POST.get('year'))
+            for status in DEDUCTIBLE_STATUSES:
+                deductions[status] = Decimal(request.POST.get(f'deduct_{status}') or '0')
+        except (TypeError, ValueError, ArithmeticError):
+            year = None
+        deductions = {status: days for status, days in deductions.items() if days}
+        if not month_number or not year:
+            messages.error(request, 'Select a valid month, year and deductions')
+            month_number, year = today.month, today.year
+        elif request.POST.get('action') == 'run':
+            report = run_payroll(month_number, year, deductions)
+            if report.already_completed:
+                messages.warning(request, report.summary())
+            else:
+                messages.success(request, report.summary())
+            return redirect('salary_management')
+        else:
+            report = run_payroll(month_number, year, deductions, dry_run=True)
+    
+    context = {
+        'report': report,
+        'month_names': MONTH_NAMES,
+        'selected_month': MONTH_NAMES[month_number - 1],
+        'selected_year': year,
+        'deductions': [(status, deductions.get(status, 0)) for status in DEDUCTIBLE_STATUSES],
+    }
+    return render(request, 'admin_portal/payroll.html', context)
+
+
+def salary_slips(request):
+    """Printable salary slips for a payroll month"""
+    if request.session.get('user_type') != 'admin':
+        return redirect('admin_login')
+    
+    month_number = parse_month(request.GET.get('month'))
+    try:
+        year = int(request.GET.get('year'))
+    except (TypeError, ValueError):
+        year = None
+    if not month_number or not year:
+        messages.error(request, 'Select the payroll month to print slips for')
+        return redirect('salary_management')
+    
+    title = f'Salary Slips {MONTH_NAMES[month_number - 1]} {year}'
+    return _documents_response(request, 'slip', salary_slip_rows(month_number, year), title)
+
+
 def salary_add(request):
     """Add new salary payment"""
     if request.session.get('user_type') != 'admin':
@@ -521,17 +807,14 @@ def teacher_attendance_mark(request):
         except (ValueError, TypeError):
             attendance_date = date.today()
         
-        # Process attendance for each teacher
-        teachers = Teacher.objects.filter(is_active=True)
-        for teacher in teachers:
-            status = request.POST.get(f'status_{teacher.id}')
-            if status and status in ['Present', 'Absent', 'Leave', 'Half Day']:
-                # Update or create attendance record
-                TeacherAttendance.objects.update_or_create(
-                    teacher=teacher,
-                    date=attendance_date,
-                    defaults={'status': status}
-                )
+        # Validate the whole register, then write it in one statement
+        teacher_ids = Teacher.objects.filter(is_active=True).values_list('id', flat=True)
+        try:
+            register = read_register(request.POST, teacher_ids)
+        except RegisterError as e:
+            messages.error(request, f'Attendance not saved: {e}')
+            return redirect(f'/admin/teacher-attendance/?date={attendance_date}')
+        save_teacher_register(attendance_date, register)
         
         messages.success(request, f'Attendance marked successfully for {attendance_date}')
         return redirect(f'/admin/teacher-attendance/?date={attendance_date}')
@@ -539,6 +822,48 @@ def teacher_attendance_mark(request):
     return redirect('teacher_attendance_list')
 
 
+def attendance_board(request):
+    """School-wide student attendance counts per class for a date"""
+    if request.session.get('user_type') != 'admin':
+        return redirect('admin_login')
+    
+    from datetime import date
+    
+    try:
+        selected_date = date.fromisoformat(request.GET.get('date', ''))
+    except ValueError:
+        selected_date = date.today()
+    
+    context = {
+        'selected_date': selected_date,
+        'board': daily_board(selected_date),
+    }
+    return render(request, 'admin_portal/attendance_board.html', context)
+
+
+def attendance_shortfall_list(request):
+    """Students whose term-to-date attendance is below the threshold"""
+    if request.session.get('user_type') != 'admin':
+        return redirect('admin_login')
+    
+    try:
+        threshold = min(max(float(request.GET.get('threshold', attendance_threshold())), 0), 100)
+    except ValueError:
+        threshold = attendance_threshold()
+    class_id = request.GET.get('class', '')
+    if not class_id.isdigit():
+        class_id = ''
+    
+    context = {
+        'students': attendance_shortfall(threshold, class_id or None),
+        'threshold': threshold,
+        'term_start': term_start(),
+        'classes': SchoolClass.objects.all(),
+        'selected_class': class_id,
+    }
+    return render(request, 'admin_portal/attendance_shortfall.html', context)
+
+
 # ===================== NOTICE MANAGEMENT =====================
 
 def notice_list(request):
@@ -617,6 +942,65 @@ def class_delete(request, pk):
     return redirect('class_list')
 
 
+def class_promotion(request):
+    """Map classes to next year's classes, preview the counts and apply the promotion"""
+    if request.session.get('user_type') != 'admin':
+        return redirect('admin_login')
+    
+    classes = list(SchoolClass.objects.all())
+    mapping = suggest_mapping(classes)
+    preview = None
+    students = []
+    held_back = set()
+    if request.method == 'POST':
+        held_back = {int(pk) for pk in request.POST.getlist('held_back') if pk.isdigit()}
+        try:
+            mapping = read_mapping(request.POST, classes)
+            if request.POST.get('action') == 'apply':
+                batch = apply_promotion(mapping, held_back, request.POST.get('label', '').strip())
+                messages.success(
+                    request,
+                    f'{batch.label}: {batch.promoted} promoted, {batch.graduated} graduated, '
+                    f'{batch.held_back} held back',
+                )
+                return redirect('class_promotion')
+        except PromotionError as e:
+            for error in e.errors:
+                messages.error(request, error)
+        else:
+            preview = preview_promotion(mapping, held_back)
+            students = Student.objects.filter(is_active=True, student_class_id__in=list(mapping)).select_related(
+                'student_class'
+            ).order_by('student_class__class_name', 'student_class__section', 'name')
+    
+    context = {
+        'classes': [(school_class, str(mapping.get(school_class.pk, ''))) for school_class in classes],
+        'graduate': GRADUATE,
+        'preview': preview,
+        'students': students,
+        'held_back': held_back,
+        'label': request.POST.get('label', ''),
+        'batches': PromotionBatch.objects.all()[:10],
+        'latest': latest_batch(),
+    }
+    return render(request, 'admin_portal/class_promotion.html', context)
+
+
+def class_promotion_rollback(request, pk):
+    """Undo the latest promotion batch"""
+    if request.session.get('user_type') != 'admin':
+        return redirect('admin_login')
+    
+    if request.method == 'POST':
+        batch = get_object_or_404(PromotionBatch, pk=pk)
+        try:
+            rollback_promotion(batch)
+            messages.success(request, f'{batch.label} rolled back')
+        except PromotionError as e:
+            messages.error(request, str(e))
+    return redirect('class_promotion')
+
+
 # ===================== STUDENT PORTAL =====================
 
 def student_dashboard(request):
@@ -629,8 +1013,9 @@ def student_dashboard(request):
     
     # Get payment summary
     payments = StudentPayment.objects.filter(student=student)
-    total_paid = payments.filter(status='Paid').aggregate(total=Sum('paid_amount'))['total'] or Decimal('0')
-    total_due = payments.filter(status='Pending').aggregate(total=Sum('due_amount'))['total'] or Decimal('0')
+    balance = student_balance(student)
+    total_paid = balance.total_paid if balance else Decimal('0')
+    total_due = max(balance.outstanding, Decimal('0')) if balance else Decimal('0')
     
     # Recent payments
     recent_payments = payments[:5]
@@ -640,13 +1025,22 @@ def student_dashboard(request):
     
     # Get student's verified results
     results = Result.objects.filter(student=student, verification_status='Verified').select_related('subject').order_by('-exam_date')
+    exam_summaries = ExamSummary.objects.filter(student=student)
+    
+    # Term-to-date attendance from the monthly summaries
+    term_attendance = with_term_attendance(Student.objects.filter(pk=student.pk)).values(
+        'term_marked', 'term_attended', 'term_percentage'
+    ).first()
     
     context = {
         'student': student,
+        'term_attendance': term_attendance,
+        'attendance_threshold': attendance_threshold(),
         'total_paid': total_paid,
         'total_due': total_due,
         'recent_payments': recent_payments,
         'results': results,
+        'exam_summaries': exam_summaries,
         'notices': notices,
         'school_info': {
             'name': 'Mid Point School',
@@ -664,7 +1058,9 @@ def student_payment_history(request):
         return redirect('student_login')
     
     student_id = request.session.get('student_id')
-    payments = StudentPayment.objects.filter(student_id=student_id)
+    payments = with_archive(StudentPayment, PAYMENT_HISTORY_FIELDS, student_id=student_id).order_by(
+        '-payment_date', '-id'
+    )
     
     return render(request, 'student/payment_history.html', {'payments': payments})
 
@@ -701,7 +1097,7 @@ def teacher_dashboard(request):
     
     # Get payment summary
     payments = TeacherPayment.objects.filter(teacher=teacher)
-    total_received = payments.filter(status='Paid').aggregate(total=Sum('paid_amount'))['total'] or Decimal('0')
+    total_received = total_with_archive(TeacherPayment, 'paid_amount', teacher=teacher, status='Paid')
     pending_salary = payments.filter(status='Pending').aggregate(total=Sum('due_amount'))['total'] or Decimal('0')
     
     # Recent payments
@@ -709,14 +1105,25 @@ def teacher_dashboard(request):
     
     # Students in teacher's class
     students = []
+    class_attendance = None
+    absence_alerts = []
     if teacher.class_section:
-        students = Student.objects.filter(student_class=teacher.class_section, is_active=True)
+        absence_alerts = open_absence_alerts(teacher.class_section_id)
+        students = list(with_term_attendance(
+            Student.objects.filter(student_class=teacher.class_section, is_active=True)
+        ))
+        marked = sum(student.term_marked for student in students)
+        if marked:
+            class_attendance = sum(student.term_attended for student in students) * 100 / marked
     
     # Active notices for teachers
     notices = Notice.objects.filter(is_active=True, audience__in=['All', 'Teachers'])[:5]
     
     context = {
         'teacher': teacher,
+        'class_attendance': class_attendance,
+        'absence_alerts': absence_alerts,
+        'attendance_threshold': attendance_threshold(),
         'total_received': total_received,
         'pending_salary': pending_salary,
         'recent_payments': recent_payments,
@@ -732,7 +1139,9 @@ def teacher_salary_history(request):
         return redirect('teacher_login')
     
     teacher_id = request.session.get('teacher_id')
-    payments = TeacherPayment.objects.filter(teacher_id=teacher_id)
+    payments = with_archive(TeacherPayment, PAYMENT_HISTORY_FIELDS, teacher_id=teacher_id).order_by(
+        '-payment_date', '-id'
+    )
     
     return render(request, 'teacher/salary_history.html', {'payments': payments})
 
@@ -800,28 +1209,21 @@ def student_attendance_list(request):
         is_active=True
     ).order_by('name')
     
-    # Get attendance records for the selected date
-    attendance_records = StudentAttendance.objects.filter(
-        date=selected_date,
-        student__student_class=teacher.class_section
-    )
-    attendance_dict = {record.student_id: record for record in attendance_records}
-    
-    # Build student list with attendance status
-    students_with_attendance = []
-    for student in students:
-        attendance = attendance_dict.get(student.id)
-        students_with_attendance.append({
-            'student': student,
-            'attendance': attendance,
-            'status': attendance.status if attendance else None
-        })
+    # Statuses for the selected date, whether stored as rows or packed into the month
+    statuses = {
+        student_id: status
+        for student_id, _, status in iter_student_statuses(selected_date, selected_date, students)
+    }
+    students_with_attendance = [
+        {'student': student, 'status': statuses.get(student.id)} for student in students
+    ]
     
     # Calculate summary
-    present_count = attendance_records.filter(status='Present').count()
-    absent_count = attendance_records.filter(status='Absent').count()
-    leave_count = attendance_records.filter(status='Leave').count()
-    halfday_count = attendance_records.filter(status='Half Day').count()
+    counts = Counter(statuses.values())
+    present_count = counts['Present']
+    absent_count = counts['Absent']
+    leave_count = counts['Leave']
+    halfday_count = counts['Half Day']
     
     context = {
         'teacher': teacher,
@@ -857,21 +1259,17 @@ def student_attendance_mark(request):
         except (ValueError, TypeError):
             attendance_date = date.today()
         
-        # Process attendance for each student in teacher's class
-        students = Student.objects.filter(
+        # Validate the register for the teacher's class, then write it in one statement
+        student_ids = Student.objects.filter(
             student_class=teacher.class_section,
             is_active=True
-        )
-        
-        for student in students:
-            status = request.POST.get(f'status_{student.id}')
-            if status and status in ['Present', 'Absent', 'Leave', 'Half Day']:
-                # Update or create attendance record
-                StudentAttendance.objects.update_or_create(
-                    student=student,
-                    date=attendance_date,
-                    defaults={'status': status}
-                )
+        ).values_list('id', flat=True)
+        try:
+            register = read_register(request.POST, student_ids)
+        except RegisterError as e:
+            messages.error(request, f'Attendance not saved: {e}')
+            return redirect(f'/teacher/student-attendance/?date={attendance_date}')
+        save_student_register(attendance_date, register)
         
         messages.success(request, f'Student attendance marked successfully for {attendance_date}')
         return redirect(f'/teacher/student-attendance/?date={attendance_date}')
@@ -879,44 +1277,85 @@ def student_attendance_mark(request):
     return redirect('student_attendance_list')
 
 
+def student_attendance_register(request):
+    """Monthly register (students x days) for the teacher's class, with CSV and print versions"""
+    if request.session.get('user_type') != 'teacher':
+        return redirect('teacher_login')
+    
+    teacher = get_object_or_404(Teacher, pk=request.session.get('teacher_id'))
+    if not teacher.class_section:
+        messages.warning(request, 'You are not assigned to any class')
+        return redirect('student_attendance_list')
+    
+    from datetime import date
+    
+    today = date.today()
+    try:
+        year, month = (int(part) for part in request.GET.get('month', '').split('-'))
+        date(year, month, 1)
+    except ValueError:
+        year, month = today.year, today.month
+    
+    register = monthly_register(teacher.class_section_id, year, month)
+    filename = slugify(f'attendance {teacher.class_section} {register.title}')
+    
+    if request.GET.get('format') == 'csv':
+        response = HttpResponse(content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+        csv.writer(response).writerows(register.csv_rows())
+        return response
+    
+    context = {
+        'teacher': teacher,
+        'school_class': teacher.class_section,
+        'register': register,
+        'selected_month': f'{year}-{month:02d}',
+        'status_codes': STATUS_CODES,
+    }
+    if request.GET.get('format') == 'print':
+        return render(request, 'teacher/attendance_register_print.html', context)
+    return render(request, 'teacher/attendance_register.html', context)
+
+
 # ===================== RESULTS MANAGEMENT =====================
 
+@public_page
 def result_list(request):
     """Public view of all verified results"""
-    results = Result.objects.filter(verification_status='Verified').select_related(
-        'student', 'subject', 'student__student_class', 'submitted_by'
-    ).order_by('-exam_date', 'student__student_class', 'student__name')
-    
     # Filter by class
     class_id = request.GET.get('class')
     selected_class_id = None
     if class_id:
         try:
             selected_class_id = int(class_id)
-            results = results.filter(student__student_class_id=selected_class_id)
         except (ValueError, TypeError):
             pass
     
     # Filter by exam
     exam_name = request.GET.get('exam')
-    if exam_name:
-        results = results.filter(exam_name__icontains=exam_name)
     
-    classes = SchoolClass.objects.all()
-    exam_names = Result.objects.filter(verification_status='Verified').values_list('exam_name', flat=True).distinct()
+    # Keyset pagination: each page seeks past the last row of the previous one
+    results, next_cursor = verified_results_page(
+        class_id=selected_class_id, exam_name=exam_name, cursor=request.GET.get('after')
+    )
+    next_page_query = None
+    if next_cursor:
+        params = request.GET.copy()
+        params['after'] = next_cursor
+        next_page_query = params.urlencode()
     
-    # Get students who have verified results (for PDF download section)
-    students_with_results = Student.objects.filter(
-        results__verification_status='Verified'
-    ).distinct().order_by('student_class__class_name', 'name')
+    classes = SchoolClass.objects.all()
+    pickers = result_pickers()
     
     context = {
         'results': results,
         'classes': classes,
-        'exam_names': exam_names,
+        'exam_names': pickers['exam_names'],
         'selected_class': selected_class_id,
         'selected_exam': exam_name,
-        'students_with_results': students_with_results,
+        'students_with_results': pickers['students'],
+        'next_page_query': next_page_query,
+        'is_first_page': not request.GET.get('after'),
     }
     return render(request, 'result_list.html', context)
 
@@ -981,6 +1420,55 @@ def result_submit(request):
     return render(request, 'teacher/result_submit.html', context)
 
 
+def result_grid(request):
+    """Teacher view to enter a whole class's marks for one exam at once"""
+    if request.session.get('user_type') != 'teacher':
+        return redirect('teacher_login')
+    
+    teacher_id = request.session.get('teacher_id')
+    teacher = get_object_or_404(Teacher, pk=teacher_id)
+    params = request.POST if request.method == 'POST' else request.GET
+    
+    # Teachers enter marks for their own class; unassigned teachers pick one
+    school_class = teacher.class_section
+    classes = SchoolClass.objects.all().order_by('class_name', 'section')
+    if not school_class and params.get('class'):
+        school_class = SchoolClass.objects.filter(pk=params.get('class')).first()
+    
+    subjects = Subject.objects.all().order_by('subject_name')
+    subject_ids = params.getlist('subjects')
+    if subject_ids:
+        subjects = subjects.filter(pk__in=subject_ids)
+    
+    students = []
+    if school_class:
+        students = Student.objects.filter(student_class=school_class, is_active=True).order_by('name')
+    
+    grid = MarksGrid(students, subjects, params if request.method == 'POST' else None)
+    
+    if request.method == 'POST' and school_class:
+        existing = submitted_cells(
+            grid.exam_name, [s.id for s in grid.students], [s.id for s in grid.subjects]
+        )
+        if grid.is_valid(existing):
+            created = grid.save(teacher)
+            messages.success(request, f'{len(created)} results submitted for {school_class}. Pending admin verification.')
+            return redirect('result_submit')
+        messages.error(request, 'Nothing was saved. Please fix the highlighted cells.')
+    
+    context = {
+        'teacher': teacher,
+        'school_class': school_class,
+        'classes': classes,
+        'all_subjects': Subject.objects.all().order_by('subject_name'),
+        'selected_subjects': [s.id for s in grid.subjects],
+        'grid': grid,
+        'columns': grid.columns(),
+        'rows': grid.rows(),
+    }
+    return render(request, 'teacher/result_grid.html', context)
+
+
 def result_edit(request, pk):
     """Teacher view to edit pending results"""
     if request.session.get('user_type') != 'teacher':
@@ -994,12 +1482,16 @@ def result_edit(request, pk):
         return redirect('result_submit')
     
     if request.method == 'POST':
+        old_exam_name = result.exam_name
         result.exam_name = request.POST.get('exam_name')
         result.marks_obtained = Decimal(request.POST.get('marks_obtained'))
         result.total_marks = Decimal(request.POST.get('total_marks'))
         result.exam_date = request.POST.get('exam_date')
         result.remarks = request.POST.get('remarks', '')
         result.save()
+        refresh_exam_summaries([
+            (result.student_id, old_exam_name), (result.student_id, result.exam_name)
+        ])
         
         messages.success(request, 'Result updated successfully')
         return redirect('result_submit')
@@ -1012,10 +1504,13 @@ def result_verify(request):
     if request.session.get('user_type') != 'admin':
         return redirect('admin_login')
     
-    admin_id = request.session.get('admin_id')
-    
-    # Get pending results
-    pending_results = Result.objects.filter(verification_status='Pending').select_related(
+    # Get pending results, optionally narrowed for bulk actions
+    filters = {
+        'class_id': request.GET.get('class', ''),
+        'exam_name': request.GET.get('exam', ''),
+        'teacher_id': request.GET.get('teacher', ''),
+    }
+    pending_results = pending_results_matching(**filters).select_related(
         'student', 'subject', 'submitted_by', 'student__student_class'
     ).order_by('-submission_date')
     
@@ -1029,6 +1524,10 @@ def result_verify(request):
     context = {
         'pending_results': pending_results,
         'recent_results': recent_results,
+        'filters': filters,
+        'classes': SchoolClass.objects.all().order_by('class_name', 'section'),
+        'teachers': Teacher.objects.filter(submitted_results__verification_status='Pending').distinct().order_by('name'),
+        'exam_names': Result.objects.filter(verification_status='Pending').order_by('exam_name').values_list('exam_name', flat=True).distinct(),
     }
     return render(request, 'admin_portal/result_verify.html', context)
 
@@ -1038,17 +1537,12 @@ def result_approve(request, pk):
     if request.session.get('user_type') != 'admin':
         return redirect('admin_login')
     
-    admin_id = request.session.get('admin_id')
-    admin = get_object_or_404(Admin, pk=admin_id)
-    result = get_object_or_404(Result, pk=pk)
-    
-    result.verification_status = 'Verified'
-    result.verified_by = admin
-    result.verification_date = timezone.now()
-    result.verification_remarks = request.POST.get('remarks', '')
-    result.save()
-    
-    messages.success(request, f'Result for {result.student.name} - {result.exam_name} approved')
+    result = get_object_or_404(Result.objects.select_related('student'), pk=pk)
+    if bulk_verify(Result.objects.filter(pk=pk), 'Verified', request.session.get('admin_id'),
+                   request.POST.get('remarks', '')):
+        messages.success(request, f'Result for {result.student.name} - {result.exam_name} approved')
+    else:
+        messages.warning(request, f'Result for {result.student.name} - {result.exam_name} was already processed')
     return redirect('result_verify')
 
 
@@ -1057,17 +1551,48 @@ def result_reject(request, pk):
     if request.session.get('user_type') != 'admin':
         return redirect('admin_login')
     
-    admin_id = request.session.get('admin_id')
-    admin = get_object_or_404(Admin, pk=admin_id)
-    result = get_object_or_404(Result, pk=pk)
+    result = get_object_or_404(Result.objects.select_related('student'), pk=pk)
+    if bulk_verify(Result.objects.filter(pk=pk), 'Rejected', request.session.get('admin_id'),
+                   request.POST.get('remarks', 'Rejected by admin')):
+        messages.warning(request, f'Result for {result.student.name} - {result.exam_name} rejected')
+    else:
+        messages.warning(request, f'Result for {result.student.name} - {result.exam_name} was already processed')
+    return redirect('result_verify')
+
+
+def result_bulk_verify(request):
+    """Admin approve or reject selected results, or everything matching a class/exam/teacher"""
+    if request.session.get('user_type') != 'admin':
+        return redirect('admin_login')
     
-    result.verification_status = 'Rejected'
-    result.verified_by = admin
-    result.verification_date = timezone.now()
-    result.verification_remarks = request.POST.get('remarks', 'Rejected by admin')
-    result.save()
+    if request.method != 'POST':
+        return redirect('result_verify')
     
-    messages.warning(request, f'Result for {result.student.name} - {result.exam_name} rejected')
+    action = request.POST.get('action')
+    if action not in ('approve', 'reject'):
+        messages.error(request, 'Unknown action')
+        return redirect('result_verify')
+    
+    if request.POST.get('scope') == 'matching':
+        results = pending_results_matching(
+            class_id=request.POST.get('class'),
+            exam_name=request.POST.get('exam'),
+            teacher_id=request.POST.get('teacher'),
+        )
+    else:
+        ids = [pk for pk in request.POST.getlist('result_ids') if pk.isdigit()]
+        if not ids:
+            messages.error(request, 'No results selected')
+            return redirect('result_verify')
+        results = Result.objects.filter(pk__in=ids)
+    
+    if action == 'approve':
+        count = bulk_verify(results, 'Verified', request.session.get('admin_id'), request.POST.get('remarks', ''))
+        messages.success(request, f'{count} results approved')
+    else:
+        count = bulk_verify(results, 'Rejected', request.session.get('admin_id'),
+                            request.POST.get('remarks') or 'Rejected by admin')
+        messages.warning(request, f'{count} results rejected')
     return redirect('result_verify')
 
 
@@ -1078,7 +1603,9 @@ def result_delete(request, pk):
     
     result = get_object_or_404(Result, pk=pk)
     student_name = result.student.name
+    summary_key = (result.student_id, result.exam_name)
     result.delete()
+    refresh_exam_summaries([summary_key])
     
     messages.success(request, f'Result for {student_name} deleted')
     return redirect('result_verify')
@@ -1101,9 +1628,7 @@ def result_download(request):
         students = Student.objects.filter(is_active=True)
     
     # Get distinct exam names from verified results
-    exam_names = Result.objects.filter(
-        verification_status='Verified'
-    ).values_list('exam_name', flat=True).distinct()
+    exam_names = result_pickers()['exam_names']
     
     # Get actual SchoolClass objects for better filtering
     classes = SchoolClass.objects.all().order_by('class_name', 'section')
@@ -1117,57 +1642,75 @@ def result_download(request):
     return render(request, 'teacher/result_download.html', context)
 
 
+@public_page
 def result_pdf(request, student_id):
     """Generate printable result PDF for a student - public access"""
     student = get_object_or_404(Student, pk=student_id)
     
     exam_name = request.GET.get('exam', '')
     
-    # Get all verified results for this student and exam
-    results = Result.objects.filter(
-        student=student,
-        exam_name=exam_name,
-        verification_status='Verified'
-    ).select_related('subject').order_by('subject__subject_name')
-    
-    # Calculate overall totals
-    total_marks_obtained = sum(r.marks_obtained for r in results)
-    total_marks_total = sum(r.total_marks for r in results)
-    overall_percentage = (total_marks_obtained / total_marks_total * 100) if total_marks_total > 0 else 0
-    
-    # Calculate overall grade
-    if overall_percentage >= 90:
-        overall_grade = 'A+'
-    elif overall_percentage >= 80:
-        overall_grade = 'A'
-    elif overall_percentage >= 70:
-        overall_grade = 'B+'
-    elif overall_percentage >= 60:
-        overall_grade = 'B'
-    elif overall_percentage >= 50:
-        overall_grade = 'C'
-    elif overall_percentage >= 40:
-        overall_grade = 'D'
-    else:
-        overall_grade = 'F'
-    
-    # Determine pass/fail status
-    result_status = 'PASS' if overall_percentage >= 40 else 'FAIL'
-    
-    context = {
-        'student': student,
-        'exam_name': exam_name,
-        'results': results,
-        'total_marks_obtained': total_marks_obtained,
-        'total_marks_total': total_marks_total,
-        'overall_percentage': overall_percentage,
-        'overall_grade': overall_grade,
-        'result_status': result_status,
-        'total_subjects': results.count(),
-    }
+    # Get all verified results for this student and exam, from the archive once its year is closed
+    for model in (Result, ArchivedResult):
+        results = list(model.objects.filter(
+            student=student,
+            exam_name=exam_name,
+            verification_status='Verified'
+        ).select_related('subject').order_by('subject__subject_name'))
+        if results:
+            break
+    
+    summary = ExamSummary.objects.filter(student=student, exam_name=exam_name).first()
+    context = report_card_context(student, exam_name, results, summary)
     return render(request, 'teacher/student_result_pdf.html', context)
 
 
+def result_export(request):
+    """Stream every verified report card of a class/exam as a ZIP"""
+    if request.session.get('user_type') not in ('teacher', 'admin'):
+        return redirect('teacher_login')
+    
+    class_id = request.GET.get('class')
+    exam_name = request.GET.get('exam', '')
+    school_class = SchoolClass.objects.filter(pk=class_id).first() if class_id and class_id.isdigit() else None
+    if not school_class or not exam_name:
+        messages.error(request, 'Select a class and an exam to export')
+        return redirect('result_download')
+    
+    # The page polls progress with a token it generated before starting the download
+    token = request.GET.get('token', '')
+    if not re.fullmatch(r'[0-9a-f]{32}', token):
+        token = uuid.uuid4().hex
+    
+    total = Result.objects.filter(
+        verification_status='Verified', exam_name=exam_name, student__student_class=school_class
+    ).values('student_id').distinct().count()
+    
+    response = StreamingHttpResponse(
+        stream_report_cards_zip(school_class.id, exam_name, ExportProgress(token), total),
+        content_type='application/zip',
+    )
+    filename = slugify(f'results {school_class} {exam_name}')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.zip"'
+    response['X-Export-Token'] = token
+    return response
+
+
+def result_export_progress(request, token):
+    """JSON progress for a running batch export"""
+    if request.session.get('user_type') not in ('teacher', 'admin'):
+        return JsonResponse({'error': 'login required'}, status=403)
+    return JsonResponse(ExportProgress(token).get())
+
+
+def result_export_cancel(request, token):
+    """Stop a running batch export after the card being rendered"""
+    if request.session.get('user_type') not in ('teacher', 'admin'):
+        return JsonResponse({'error': 'login required'}, status=403)
+    if request.method == 'POST':
+        ExportProgress(token).cancel()
+    return JsonResponse(ExportProgress(token).get())
+
+
 # ===================== GALLERY MANAGEMENT =====================
 
 def gallery_list(request):
@@ -1196,13 +1739,15 @@ def gallery_add(request):
         display_order = request.POST.get('display_order', 0)
         
         if title and image:
-            GalleryImage.objects.create(
+            gallery_image = GalleryImage.objects.create(
                 title=title,
                 category=category,
                 description=description,
                 image=image,
                 display_order=int(display_order)
             )
+            # Resized WebP/JPEG copies are built in the background
+            queue_gallery_derivatives(gallery_image.id)
             messages.success(request, 'Gallery image added successfully')
         else:
             messages.error(request, 'Title and image are required')
@@ -1219,6 +1764,7 @@ def gallery_delete(request, pk):
     
     image = get_object_or_404(GalleryImage, pk=pk)
     image.delete()
+    discard_gallery_derivatives(image.derivatives)
     
     messages.success(request, 'Gallery image deleted')
     return redirect('gallery_list')
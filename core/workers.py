@@ -0,0 +1,20 @@
+"""Process pools for the batch jobs (report cards, documents, ID photos, people imports)"""
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+
+
+def init_worker():
+    """Pool initializer: set Django up once in each worker process"""
+    django.setup()
+
+
+def worker_count(setting, workers=None):
+    """`workers` when given, otherwise the pool size from the named setting (0 runs in-process)"""
+    return getattr(settings, setting, 0) if workers is None else workers
+
+
+def process_pool(workers):
+    """A process pool whose workers can use the ORM and templates"""
+    return ProcessPoolExecutor(max_workers=workers, initializer=init_worker)
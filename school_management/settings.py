@@ -5,7 +5,7 @@ Mid Point School - School Management System
 
 from pathlib import Path
 import os
-import sys
+import tempfile
 # Import dj_database_url conditionally is better for local dev if not installed
 try:
     import dj_database_url
@@ -88,6 +88,17 @@ else:
 
 
 
+# Cache shared by every process and every serverless instance (public page
+# cache, export progress), so it lives in the database rather than in a
+# per-host /tmp; the table is created by migration 0018_cache_table
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'core_cache',
+    }
+}
+
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -118,3 +129,40 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 SESSION_ENGINE = 'django.contrib.sessions.backends.db'
 SESSION_COOKIE_AGE = 86400  # 24 hours
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles_build', 'static')
+
+# Worker processes for each batch job (core.workers); 0 runs the job
+# in-process, which serverless hosts without multiprocessing need
+WORKER_PROCESSES = 0 if IS_VERCEL else min(4, os.cpu_count() or 1)
+RESULT_EXPORT_WORKERS = WORKER_PROCESSES     # report card ZIP exports
+DOCUMENT_RENDER_WORKERS = WORKER_PROCESSES   # fee receipts and salary slips
+PHOTO_IMPORT_WORKERS = WORKER_PROCESSES      # ID photo ZIPs and print_id_cards thumbnails
+PEOPLE_IMPORT_WORKERS = WORKER_PROCESSES     # password hashing during bulk imports
+
+# Rendered fee receipts and salary slips (core.documents) are kept on disk,
+# keyed by payment and content, so reprints are free
+DOCUMENT_CACHE_DIR = os.environ.get(
+    'DOCUMENT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'midpoint_school_documents')
+)
+
+# Background threads that build resized gallery/photo derivatives (0 builds
+# them inline once the upload is committed)
+IMAGE_DERIVATIVE_WORKERS = 0 if IS_VERCEL else 2
+
+# Days of pay deducted for each day of a given attendance status in the
+# monthly payroll run (core.payroll); statuses not listed are paid in full
+PAYROLL_DEDUCTIONS = {'Absent': 1, 'Half Day': 0.5}
+
+# Student attendance percentages (core.attendance) are reported term to
+# date, the term being the academic year (ACADEMIC_YEAR_START_MONTH below);
+# students below the threshold percentage are listed on the attendance
+# shortfall page
+ATTENDANCE_THRESHOLD = 75
+
+# Consecutive school-day absences (Sundays and Holidays skipped) that raise
+# an alert for the class teacher; run `manage.py detect_absences` nightly
+ABSENCE_ALERT_DAYS = 3
+
+# Academic years run from the 1st of this month; `manage.py archive_year`
+# moves a closed year's settled results, attendance and payments out of the
+# live tables (core.academic_years)
+ACADEMIC_YEAR_START_MONTH = 4